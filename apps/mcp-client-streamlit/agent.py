@@ -0,0 +1,694 @@
+"""Agent-loop helpers that do not depend on Streamlit.
+
+Streamed model output is routed through ThinkStreamSplitter so ``<think>``
+content and the visible reply can be shown as tokens arrive.
+
+The model asks for tools in one of two ways. In native mode the catalog's
+input schemas are bound to the model as structured tool definitions and the
+calls come back as ``tool_call_chunks`` in the stream; their results go back
+as tool messages. The text protocol, ``TOOL_CALL: name {json}`` lines, is
+the fallback for models without tool calling. Calls whose arguments cannot be
+decoded, or that fail client-side schema validation, are answered locally
+with an error instead of being sent. All other calls from one model turn are
+executed concurrently on a bounded thread pool (or, with the MCP transport,
+sent together as one JSON-RPC batch) and their results are returned in the
+order the model wrote them. On the thread pool, ``SpeculativeToolCalls`` can
+start each call as soon as the stream has produced it, so tool latency
+overlaps the rest of the generation.
+"""
+
+import contextvars
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from threading import Event
+from typing import Optional, Dict, Any, List, Callable, Tuple, FrozenSet
+
+from gateway_client import GatewayClient
+from mcp_transport import McpTransport, RpcResult
+from result_cache import MISS, ToolResultCache
+from tool_index import ToolIndex
+
+
+TOOL_CALL_PREFIX = "TOOL_CALL:"
+TOOL_MODES = ("native", "text")
+DEFAULT_TOOL_CONCURRENCY = 4
+DEFAULT_MODEL = "qwen/qwen3-32b"
+
+# Static instructions come first and the tool list last, so every request
+# for the same catalog shares a byte-identical prompt prefix that provider-side
+# prompt caching can reuse.
+SYSTEM_PROMPT_HEADER = """You are a helpful AI assistant with access to tools.
+
+When you need to use a tool, respond with:
+TOOL_CALL: {tool_name} {json_params}
+
+For example:
+TOOL_CALL: sum {"a": 5, "b": 3}
+TOOL_CALL: hello {"name": "World"}
+
+After receiving tool results, provide a natural language answer to the user.
+
+You can use the following tools to help answer user questions:
+"""
+
+# Native mode: the tools travel as structured definitions, not in the prompt
+NATIVE_SYSTEM_PROMPT = """You are a helpful AI assistant with access to tools.
+
+Call the provided tools when they help answer the user's question. You can
+call several tools at once when they do not depend on each other. After
+receiving tool results, provide a natural language answer to the user.
+"""
+
+
+@dataclass
+class ToolCall:
+    """One tool call requested by the model.
+
+    ``line`` is the raw ``TOOL_CALL:`` line (text mode) or argument string
+    (native mode); ``id`` is the provider's tool call id (native mode only).
+    ``error`` is set when the arguments could not be decoded.
+    """
+
+    name: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    line: str = ""
+    id: str = ""
+    error: Optional[str] = None
+
+
+def _decode_params(raw: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    if not raw.strip():
+        return {}, None
+    try:
+        params = json.loads(raw)
+    except json.JSONDecodeError as e:
+        return {}, f"invalid JSON arguments ({e.msg} at position {e.pos})"
+    if not isinstance(params, dict):
+        return {}, "arguments must be a JSON object"
+    return params, None
+
+
+def parse_tool_calls(text: str) -> List[ToolCall]:
+    """Extract TOOL_CALL lines from a model response, in order"""
+    calls = []
+    for line in text.split("\n"):
+        if not line.strip().startswith(TOOL_CALL_PREFIX):
+            continue
+        parts = line.replace(TOOL_CALL_PREFIX, "").strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        params, error = _decode_params(parts[1] if len(parts) > 1 else "")
+        calls.append(ToolCall(name=parts[0], params=params, line=line.strip(), error=error))
+    return calls
+
+
+def assemble_tool_calls(chunks: List[Dict[str, Any]]) -> List[ToolCall]:
+    """Rebuild native tool calls from streamed ``tool_call_chunks``, in order.
+
+    Chunks with the same ``index`` are fragments of one call: name, id and
+    argument strings are concatenated before the arguments are decoded.
+    """
+    parts: "OrderedDict[Any, Dict[str, str]]" = OrderedDict()
+    _merge_tool_call_chunks(parts, chunks)
+    return [_native_tool_call(part) for part in parts.values()]
+
+
+def _merge_tool_call_chunks(parts: "OrderedDict[Any, Dict[str, str]]", chunks: List[Dict[str, Any]]) -> None:
+    for chunk in chunks:
+        index = chunk.get("index")
+        # A chunk without an index is a whole call of its own
+        part = parts.setdefault(("chunk", len(parts)) if index is None else index, {"name": "", "args": "", "id": ""})
+        for key in part:
+            part[key] += chunk.get(key) or ""
+
+
+def _native_tool_call(part: Dict[str, str]) -> ToolCall:
+    params, error = _decode_params(part["args"])
+    if not part["name"]:
+        error = "tool call without a tool name"
+    return ToolCall(name=part["name"], params=params, line=part["args"], id=part["id"], error=error)
+
+
+def tool_definitions(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Catalog entries as OpenAI-style function definitions for ``bind_tools``"""
+    definitions = []
+    for tool in sorted(tools, key=lambda t: t.get("name", "")):
+        params = tool.get("inputSchema") or tool.get("parameters")
+        if not isinstance(params, dict):
+            params = {"type": "object", "properties": {}}
+        definitions.append(
+            {
+                "type": "function",
+                "function": {"name": tool["name"], "description": tool.get("description", ""), "parameters": params},
+            }
+        )
+    return definitions
+
+
+def tool_call_message_kwargs(calls: List[ToolCall]) -> Dict[str, Any]:
+    """``tool_calls``/``invalid_tool_calls`` for the assistant message of a native turn"""
+    return {
+        "tool_calls": [
+            {"name": c.name, "args": c.params, "id": c.id, "type": "tool_call"} for c in calls if c.error is None
+        ],
+        "invalid_tool_calls": [
+            {"name": c.name, "args": c.line, "id": c.id, "error": c.error, "type": "invalid_tool_call"}
+            for c in calls
+            if c.error is not None
+        ],
+    }
+
+
+def execute_tool_calls(
+    calls: List[ToolCall],
+    run: Callable[[List[ToolCall]], List[str]],
+    validate: Optional[Callable[[str, Dict[str, Any]], Optional[str]]] = None,
+) -> List[str]:
+    """Send the well-formed calls through ``run``; answer the rest locally.
+
+    Results are in call order. A call whose arguments could not be decoded,
+    or that ``validate`` (tool name, arguments -> error or None) rejects, gets
+    an error the model can correct, without a gateway round trip.
+    """
+    results: List[Optional[str]] = [None] * len(calls)
+    valid = []
+    for idx, call in enumerate(calls):
+        error = call.error
+        if error is None and validate is not None:
+            error = validate(call.name, call.params)
+        if error is not None:
+            results[idx] = f"Error: {error}"
+        else:
+            valid.append(idx)
+    if valid:
+        for idx, result in zip(valid, run([calls[idx] for idx in valid])):
+            results[idx] = result
+    return [r if r is not None else "" for r in results]
+
+
+def strip_tool_calls(text: str) -> str:
+    """Remove TOOL_CALL lines, leaving the natural-language part of a response"""
+    return "\n".join(
+        line for line in text.split("\n") if not line.strip().startswith(TOOL_CALL_PREFIX)
+    ).strip()
+
+
+def split_thinking_and_reply(text: str) -> Dict[str, str]:
+    """Split model output into hidden-think content and visible reply."""
+    if not text:
+        return {"thinking": "", "reply": ""}
+
+    thinking_blocks = re.findall(r"<think>(.*?)</think>", text, flags=re.DOTALL | re.IGNORECASE)
+    thinking = "\n\n".join(block.strip() for block in thinking_blocks if block.strip())
+
+    reply = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL | re.IGNORECASE).strip()
+    reply = reply.replace("<think>", "").replace("</think>", "").strip()
+
+    if not reply and not thinking:
+        reply = text.strip()
+
+    return {"thinking": thinking, "reply": reply}
+
+
+class ThinkStreamSplitter:
+    """Incremental ``<think>...</think>`` splitter for streamed model output.
+
+    Each ``feed`` only looks at the new chunk (plus at most a partial tag held
+    back from the previous one), so routing a token stream costs O(chunk)
+    rather than re-scanning the accumulated text. Tags are case-insensitive
+    and stray opening/closing tags are dropped, like split_thinking_and_reply.
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self.in_think = False
+        self._pending = ""
+        self.thinking_parts: List[str] = []
+        self.reply_parts: List[str] = []
+
+    def _emit(self, out: List[Tuple[str, str]], text: str) -> None:
+        if not text:
+            return
+        kind = "thinking" if self.in_think else "reply"
+        (self.thinking_parts if self.in_think else self.reply_parts).append(text)
+        if out and out[-1][0] == kind:
+            out[-1] = (kind, out[-1][1] + text)
+        else:
+            out.append((kind, text))
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk; return ``[(kind, text), ...]`` with kind "thinking" or "reply"."""
+        text = self._pending + (chunk or "")
+        self._pending = ""
+        out: List[Tuple[str, str]] = []
+        pos = 0
+        while True:
+            lt = text.find("<", pos)
+            if lt == -1:
+                self._emit(out, text[pos:])
+                break
+            self._emit(out, text[pos:lt])
+            rest = text[lt:lt + len(self.CLOSE)].lower()
+            if rest.startswith(self.OPEN):
+                if not self.in_think and self.thinking_parts:
+                    self.thinking_parts.append("\n\n")
+                self.in_think = True
+                pos = lt + len(self.OPEN)
+            elif rest.startswith(self.CLOSE):
+                self.in_think = False
+                pos = lt + len(self.CLOSE)
+            elif len(rest) < len(self.CLOSE) and (
+                self.OPEN.startswith(rest) or self.CLOSE.startswith(rest)
+            ):
+                # Possibly a tag split across chunks: wait for more input
+                self._pending = text[lt:]
+                break
+            else:
+                self._emit(out, "<")
+                pos = lt + 1
+        return out
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """Flush a held-back partial tag as literal text"""
+        out: List[Tuple[str, str]] = []
+        self._emit(out, self._pending)
+        self._pending = ""
+        return out
+
+    @property
+    def thinking(self) -> str:
+        return "".join(self.thinking_parts).strip()
+
+    @property
+    def reply(self) -> str:
+        return "".join(self.reply_parts).strip()
+
+
+def call_tool_for_agent(
+    client: GatewayClient,
+    base_url: str,
+    call: ToolCall,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    cache: Optional[ToolResultCache] = None,
+    tool_meta: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Call one tool and format the outcome as text for the model.
+
+    The body is read under the client's response size cap; a larger result is
+    reported to the model as an error instead of being loaded.
+    """
+    if cache is not None:
+        cached = cache.get(base_url, call.name, call.params, headers, tool_meta)
+        if cached is not MISS:
+            return json.dumps(cached)
+    try:
+        resp = client.call_tool(base_url, call.name, call.params, headers=headers, timeout=timeout, stream=True)
+        body = client.read_body(resp)
+        if body.truncated:
+            return f"Error: result too large (over {client.max_response_bytes} bytes)"
+        if resp.status_code == 200:
+            data = body.json()
+            if data.get("ok"):
+                if cache is not None:
+                    cache.put(base_url, call.name, call.params, headers, data.get("data", {}), tool_meta, body.size)
+                return json.dumps(data.get("data", {}))
+            return f"Error: {data.get('error', {}).get('message', 'Unknown error')}"
+        return f"HTTP {resp.status_code}: {body.text(200)}"
+    except Exception as e:
+        return f"Exception: {str(e)}"
+
+
+def run_tool_calls(
+    calls: List[ToolCall],
+    invoke: Callable[[ToolCall], str],
+    executor: Executor,
+    max_concurrency: int = DEFAULT_TOOL_CONCURRENCY,
+    timeout: Optional[float] = None,
+    cancel: Optional[Event] = None,
+) -> List[str]:
+    """Run ``invoke`` for every call concurrently and return results in call order.
+
+    At most ``max_concurrency`` calls from this turn are in flight at once.
+    Each call gets its own ``timeout`` (seconds, measured from when it is submitted);
+    a call that overruns is reported as timed out and its result discarded.
+    Setting ``cancel`` stops calls that have not started yet.
+    """
+    results: List[Optional[str]] = [None] * len(calls)
+    pending = list(range(len(calls)))
+    pending.reverse()
+    in_flight: Dict[Future, int] = {}
+    deadlines: Dict[Future, float] = {}
+
+    while pending or in_flight:
+        while pending and len(in_flight) < max(1, max_concurrency):
+            if cancel is not None and cancel.is_set():
+                break
+            idx = pending.pop()
+            # Carry the caller's trace context into the worker thread
+            future = executor.submit(contextvars.copy_context().run, invoke, calls[idx])
+            in_flight[future] = idx
+            if timeout is not None:
+                deadlines[future] = time.monotonic() + timeout
+
+        if cancel is not None and cancel.is_set():
+            for future, idx in in_flight.items():
+                future.cancel()
+                results[idx] = f"Cancelled: {calls[idx].name}"
+            for idx in pending:
+                results[idx] = f"Cancelled: {calls[idx].name}"
+            break
+
+        wait_for = None
+        if deadlines:
+            wait_for = max(0.0, min(deadlines.values()) - time.monotonic())
+        done, _ = wait(list(in_flight), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            idx = in_flight.pop(future)
+            deadlines.pop(future, None)
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                results[idx] = f"Exception: {str(e)}"
+
+        now = time.monotonic()
+        for future in [f for f, d in deadlines.items() if d <= now and f in in_flight]:
+            idx = in_flight.pop(future)
+            deadlines.pop(future)
+            future.cancel()
+            results[idx] = f"Timeout: {calls[idx].name} did not finish within {timeout:g}s"
+
+    return [r if r is not None else "" for r in results]
+
+
+def _call_key(call: ToolCall) -> Tuple[str, str]:
+    return call.name, json.dumps(call.params, sort_keys=True)
+
+
+class SpeculativeToolCalls:
+    """Starts one model turn's tool calls while the model is still streaming.
+
+    The stream is fed to both ``feed_text`` and ``feed_tool_call_chunks``;
+    only the one matching the tool mode is used. In text mode a call starts
+    once its ``TOOL_CALL:`` line is complete: ended by a newline, or with
+    arguments that already decode to a JSON object. In native mode it starts
+    once its arguments decode or the next call's chunks begin. ``TOOL_CALL:``
+    lines inside ``<think>`` blocks are reasoning, not calls, and are skipped.
+    Only calls that ``validate`` accepts and ``tools`` lists (``*`` for all)
+    are started, at most ``max_calls`` per turn, on the shared tool executor.
+    A started call cannot be recalled, so list only tools that are safe to
+    run when the model ends up not calling them.
+
+    When the stream has finished, ``run`` answers the calls the output
+    confirms from the speculative ones (same tool and arguments) and sends
+    the rest through ``run_rest``. Speculative calls the output does not
+    confirm are discarded: their results are never shown to the model.
+    ``saved_ms`` estimates the tool wall time the overlap with generation
+    saved, against starting every call when the stream ended.
+    """
+
+    def __init__(
+        self,
+        invoke: Callable[[ToolCall], str],
+        executor: Executor,
+        validate: Optional[Callable[[str, Dict[str, Any]], Optional[str]]] = None,
+        tools: FrozenSet[str] = frozenset(),
+        native: bool = False,
+        max_calls: int = DEFAULT_TOOL_CONCURRENCY,
+        timeout: Optional[float] = None,
+    ):
+        self.invoke = invoke
+        self.executor = executor
+        self.validate = validate
+        self.tools = tools
+        self.native = native
+        self.max_calls = max_calls
+        self.timeout = timeout
+        self.started = 0
+        self.confirmed = 0
+        self.discarded = 0
+        self.saved_ms = 0.0
+        self._think = ThinkStreamSplitter()
+        self._line = ""
+        self._line_started = False
+        self._parts: "OrderedDict[Any, Dict[str, str]]" = OrderedDict()
+        self._parts_started: set = set()
+        self._futures: Dict[Tuple[str, str], List[Future]] = {}
+        self._deadlines: Dict[Future, float] = {}
+
+    def _timed(self, call: ToolCall) -> Tuple[str, float]:
+        started = time.perf_counter()
+        return self.invoke(call), (time.perf_counter() - started) * 1000
+
+    def _start(self, call: ToolCall) -> bool:
+        if call.error is not None or self.started >= self.max_calls:
+            return False
+        if "*" not in self.tools and call.name not in self.tools:
+            return False
+        if self.validate is not None and self.validate(call.name, call.params) is not None:
+            return False
+        # Carry the caller's trace context into the worker thread
+        future = self.executor.submit(contextvars.copy_context().run, self._timed, call)
+        self._futures.setdefault(_call_key(call), []).append(future)
+        if self.timeout is not None:
+            self._deadlines[future] = time.monotonic() + self.timeout
+        self.started += 1
+        return True
+
+    def _start_line(self, line: str) -> bool:
+        calls = parse_tool_calls(line)
+        return bool(calls) and calls[0].error is None and self._start(calls[0])
+
+    def feed_text(self, text: str) -> None:
+        """Feed streamed model text"""
+        if self.native or not text:
+            return
+        for kind, part in self._think.feed(text):
+            if kind == "reply":
+                self._feed_reply(part)
+
+    def _feed_reply(self, text: str) -> None:
+        lines = (self._line + text).split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            if not self._line_started:
+                self._start_line(line)
+            self._line_started = False
+        # Usually the last line has no newline yet; its closing brace is enough
+        if not self._line_started and self._line.rstrip().endswith("}"):
+            self._line_started = self._start_line(self._line)
+
+    def feed_tool_call_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        """Feed streamed ``tool_call_chunks``"""
+        if not self.native or not chunks:
+            return
+        _merge_tool_call_chunks(self._parts, chunks)
+        keys = list(self._parts)
+        for n, key in enumerate(keys):
+            if key in self._parts_started:
+                continue
+            call = _native_tool_call(self._parts[key])
+            if n < len(keys) - 1 or (call.error is None and call.line.strip()):
+                self._parts_started.add(key)
+                self._start(call)
+
+    def run(self, calls: List[ToolCall], run_rest: Callable[[List[ToolCall]], List[str]]) -> List[str]:
+        """Results for the calls of the finished output, in call order"""
+        started = time.perf_counter()
+        matched: Dict[int, Future] = {}
+        for idx, call in enumerate(calls):
+            futures = self._futures.get(_call_key(call))
+            if futures:
+                matched[idx] = futures.pop(0)
+        self.discard()
+
+        results: List[Optional[str]] = [None] * len(calls)
+        rest = [idx for idx in range(len(calls)) if idx not in matched]
+        if rest:
+            for idx, result in zip(rest, run_rest([calls[idx] for idx in rest])):
+                results[idx] = result
+        rest_ms = (time.perf_counter() - started) * 1000
+
+        durations = []
+        for idx, future in matched.items():
+            deadline = self._deadlines.get(future)
+            try:
+                results[idx], ms = future.result(
+                    timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None
+                )
+                durations.append(ms)
+            except FutureTimeoutError:
+                future.cancel()
+                results[idx] = f"Timeout: {calls[idx].name} did not finish within {self.timeout:g}s"
+            except Exception as e:
+                results[idx] = f"Exception: {str(e)}"
+        self.confirmed += len(matched)
+
+        # Without speculation the confirmed calls would have started now, alongside the rest
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.saved_ms += max(0.0, max([rest_ms] + durations) - elapsed_ms)
+        return [r if r is not None else "" for r in results]
+
+    def discard(self) -> None:
+        """Drop the speculative calls not yet confirmed (e.g. the stream failed)"""
+        for futures in self._futures.values():
+            for future in futures:
+                future.cancel()
+                self.discarded += 1
+        self._futures.clear()
+
+
+def format_rpc_result(result: RpcResult) -> str:
+    """Format a JSON-RPC tools/call outcome as text for the model"""
+    if result.ok:
+        return json.dumps(result.tool_data())
+    if result.status_code is None:
+        return f"Exception: {result.error.get('message', 'Unknown error')}"
+    return f"Error: {result.error.get('message', 'Unknown error')}"
+
+
+def call_tools_batched(
+    transport: McpTransport,
+    calls: List[ToolCall],
+    cache: Optional[ToolResultCache] = None,
+    tools_meta: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[str]:
+    """Run a turn's tool calls as one JSON-RPC batch; results in call order.
+
+    Cached results are answered locally and only the misses go to ``/mcp``.
+    """
+    tools_meta = tools_meta or {}
+    results: List[Optional[str]] = [None] * len(calls)
+    misses = []
+    for idx, call in enumerate(calls):
+        if cache is not None:
+            cached = cache.get(transport.base_url, call.name, call.params, transport.headers, tools_meta.get(call.name))
+            if cached is not MISS:
+                results[idx] = json.dumps(cached)
+                continue
+        misses.append(idx)
+
+    replies = transport.call_tools([(calls[idx].name, calls[idx].params) for idx in misses])
+    for idx, reply in zip(misses, replies):
+        call = calls[idx]
+        if reply.ok and cache is not None:
+            cache.put(transport.base_url, call.name, call.params, transport.headers, reply.tool_data(), tools_meta.get(call.name))
+        results[idx] = format_rpc_result(reply)
+    return [r if r is not None else "" for r in results]
+
+
+def make_tool_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Process-wide pool that bounds agent tool calls across all sessions"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+
+
+def catalog_hash(tools: List[Dict[str, Any]]) -> str:
+    """Stable fingerprint of a tool catalog (order-insensitive)"""
+    canonical = json.dumps(
+        sorted(tools, key=lambda t: t.get("name", "")), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def compile_system_prompt(tools: List[Dict[str, Any]], native: bool = False) -> str:
+    """Render the system prompt for a catalog, deterministically"""
+    if native:
+        return NATIVE_SYSTEM_PROMPT
+    lines = [SYSTEM_PROMPT_HEADER]
+    for tool in sorted(tools, key=lambda t: t.get("name", "")):
+        lines.append(f"- **{tool['name']}**: {tool.get('description', '')}")
+        params = tool.get("inputSchema") or tool.get("parameters")
+        if isinstance(params, dict):
+            lines.append(f"  Parameters: {json.dumps(params, sort_keys=True, separators=(',', ':'))}")
+    return "\n".join(lines)
+
+
+class _LRU:
+    """Tiny thread-safe LRU map."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Any, create: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = create()
+        with self._lock:
+            value = self._data.setdefault(key, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class AgentEngine:
+    """State for the agent loop that outlives a single Streamlit rerun.
+
+    Holds model clients keyed by (API key, model, temperature), so their HTTP
+    connections are reused between messages, plus system prompts, tool-bound
+    clients and tool selection indexes built once per catalog hash. A tool
+    list seen before (the shared catalog, or one turn's selection passed to
+    several methods) finds its hash by identity instead of re-serializing.
+    """
+
+    def __init__(
+        self,
+        llm_factory: Callable[[str, str, float], Any],
+        max_clients: int = 32,
+        max_prompts: int = 16,
+    ):
+        self.llm_factory = llm_factory
+        self._clients = _LRU(max_clients)
+        self._bound = _LRU(max_clients)
+        self._prompts = _LRU(max_prompts)
+        self._indexes = _LRU(max_prompts)
+        self._hashes = _LRU(4 * max_prompts)
+
+    def catalog_key(self, tools: List[Dict[str, Any]]) -> str:
+        """``catalog_hash(tools)``, computed once per list object"""
+        # The entry keeps a reference to the list, so its id cannot be reused while cached
+        return self._hashes.get_or_create(id(tools), lambda: (tools, catalog_hash(tools)))[1]
+
+    def llm(self, api_key: str, model: str = DEFAULT_MODEL, temperature: float = 0) -> Any:
+        """Return a cached model client for these settings"""
+        key = (hashlib.sha256(api_key.encode("utf-8")).hexdigest(), model, temperature)
+        return self._clients.get_or_create(key, lambda: self.llm_factory(api_key, model, temperature))
+
+    def tool_llm(
+        self, api_key: str, tools: List[Dict[str, Any]], model: str = DEFAULT_MODEL, temperature: float = 0
+    ) -> Any:
+        """Return a cached model client with ``tools`` bound for native tool calling.
+
+        Raises NotImplementedError when the model does not support tool calling.
+        """
+        key = (hashlib.sha256(api_key.encode("utf-8")).hexdigest(), model, temperature, self.catalog_key(tools))
+        return self._bound.get_or_create(
+            key, lambda: self.llm(api_key, model, temperature).bind_tools(tool_definitions(tools))
+        )
+
+    def tool_index(self, tools: List[Dict[str, Any]]) -> ToolIndex:
+        """Return the scope/relevance index for ``tools``, building it on first use"""
+        return self._indexes.get_or_create(self.catalog_key(tools), lambda: ToolIndex(tools))
+
+    def system_prompt(self, tools: List[Dict[str, Any]], native: bool = False) -> str:
+        """Return the system prompt for ``tools``, compiling it on first use"""
+        return self._prompts.get_or_create(
+            (self.catalog_key(tools), native), lambda: compile_system_prompt(tools, native)
+        )
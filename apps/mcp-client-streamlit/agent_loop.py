@@ -0,0 +1,368 @@
+"""The agent loop, independent of Streamlit.
+
+``AgentLoop.run`` answers one user message. It offers the model the tools
+the caller's scopes allow that are most relevant to the message, streams a
+model call, runs the tool calls it asks for and feeds the results back, until
+the model answers without calling a tool or ``max_iterations`` model calls
+have been made. Tool calls go over REST (concurrently, and started while the
+model is still streaming for the tools that allow it) or as one JSON-RPC
+batch per model call.
+
+The AI Agent tab runs it with a ``StreamObserver`` that renders tokens as
+they arrive; agent_eval.py runs scenario files through it headlessly. The
+numbers of each turn come back as a ``TurnResult`` and, inside a trace, are
+set on the current span.
+"""
+
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, List, Iterable, FrozenSet
+
+from agent import (
+    DEFAULT_MODEL,
+    DEFAULT_TOOL_CONCURRENCY,
+    TOOL_MODES,
+    AgentEngine,
+    SpeculativeToolCalls,
+    ToolCall,
+    assemble_tool_calls,
+    call_tool_for_agent,
+    call_tools_batched,
+    execute_tool_calls,
+    parse_tool_calls,
+    run_tool_calls,
+    strip_tool_calls,
+)
+from context import ConversationContext, estimate_tokens
+from gateway_client import GatewayClient
+from gateway_pool import GatewayPool
+from mcp_transport import McpTransport
+from result_cache import ToolResultCache
+from telemetry import current_span, span
+from tool_index import DEFAULT_TOP_K
+from validation import ValidatorCache
+
+
+DEFAULT_MAX_ITERATIONS = 5
+TRANSPORTS = ("rest", "mcp")
+
+
+class StreamObserver:
+    """Receives each model call's text as it streams (does nothing by default)."""
+
+    def start(self) -> None:
+        """A model call is about to stream"""
+
+    def feed(self, text: str) -> None:
+        """Next piece of streamed text"""
+
+    def finish(self) -> None:
+        """The model call has finished streaming"""
+
+
+@dataclass
+class Completion:
+    """Text, native tool calls and token counts of one streamed model call."""
+
+    text: str
+    native_calls: List[ToolCall]
+    prompt_tokens: int
+    completion_tokens: int
+    tokens_estimated: bool
+
+
+@dataclass
+class TurnResult:
+    """Outcome and cost of answering one user message."""
+
+    answer: str
+    tool_mode: str
+    tools_catalog: int = 0
+    tools_offered: int = 0
+    iterations: int = 0
+    tool_calls: int = 0
+    tools_called: List[str] = field(default_factory=list)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    speculation_saved_ms: float = 0.0
+    native_unsupported: bool = False
+
+    def attributes(self) -> Dict[str, Any]:
+        """The turn's trace attributes"""
+        return {
+            "agent.tools_catalog": self.tools_catalog,
+            "agent.tools_offered": self.tools_offered,
+            "agent.tool_mode": self.tool_mode,
+            "agent.iterations": self.iterations,
+            "agent.tool_calls": self.tool_calls,
+            "agent.speculation_saved_ms": round(self.speculation_saved_ms, 3),
+            "llm.prompt_tokens": self.prompt_tokens,
+            "llm.completion_tokens": self.completion_tokens,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def stream_completion(
+    llm: Any,
+    messages: List[Any],
+    model: str = DEFAULT_MODEL,
+    observer: Optional[StreamObserver] = None,
+    speculation: Optional[SpeculativeToolCalls] = None,
+) -> Completion:
+    """Stream one model call, feeding its text to ``observer`` and ``speculation``.
+
+    Recorded as an ``llm.stream`` span with time to first token and token
+    counts (provider-reported usage when the stream includes it, else estimates).
+    """
+    observer = observer or StreamObserver()
+    observer.start()
+    chunks = []
+    tool_call_chunks = []
+    with span("llm.stream", model=model) as s:
+        started = time.perf_counter()
+        usage = None
+        for chunk in llm.stream(messages):
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            new_tool_call_chunks = getattr(chunk, "tool_call_chunks", None) or []
+            tool_call_chunks.extend(new_tool_call_chunks)
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if speculation is not None:
+                speculation.feed_tool_call_chunks(new_tool_call_chunks)
+                speculation.feed_text(text)
+            if not text:
+                continue
+            if not chunks:
+                s.set(**{"llm.ttft_ms": round((time.perf_counter() - started) * 1000, 3)})
+            chunks.append(text)
+            observer.feed(text)
+
+        text = "".join(chunks)
+        completion = Completion(
+            text=text,
+            native_calls=assemble_tool_calls(tool_call_chunks),
+            prompt_tokens=(usage or {}).get("input_tokens") or sum(estimate_tokens(str(m.content)) for m in messages),
+            completion_tokens=(usage or {}).get("output_tokens") or estimate_tokens(text),
+            tokens_estimated=not usage,
+        )
+        s.set(
+            **{
+                "llm.prompt_tokens": completion.prompt_tokens,
+                "llm.completion_tokens": completion.completion_tokens,
+                "llm.tokens_estimated": completion.tokens_estimated,
+            }
+        )
+    observer.finish()
+    return completion
+
+
+class AgentLoop:
+    """Model, gateway and tool settings for answering agent messages.
+
+    ``client`` sends JSON-RPC batches and, without a ``pool``, REST calls;
+    with a ``pool`` REST calls are routed across its gateways and each batch
+    goes to the gateway that exposes all of its tools. ``validator_cache``
+    enables client-side argument validation. ``speculative_tools`` lists the
+    tools that may be called while the model is still streaming (REST only);
+    none by default, since a call the model does not confirm has still run.
+    """
+
+    def __init__(
+        self,
+        engine: AgentEngine,
+        message_types: Dict[str, Any],
+        api_key: str,
+        client: GatewayClient,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        scopes: Iterable[str] = (),
+        pool: Optional[GatewayPool] = None,
+        executor: Optional[Executor] = None,
+        result_cache: Optional[ToolResultCache] = None,
+        validator_cache: Optional[ValidatorCache] = None,
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0,
+        tool_mode: str = "native",
+        transport: str = "rest",
+        top_k: int = DEFAULT_TOP_K,
+        max_iterations: int = DEFAULT_MAX_ITERATIONS,
+        tool_concurrency: int = DEFAULT_TOOL_CONCURRENCY,
+        speculative_tools: FrozenSet[str] = frozenset(),
+    ):
+        if tool_mode not in TOOL_MODES:
+            raise ValueError(f"Unknown tool mode {tool_mode!r} (expected one of {', '.join(TOOL_MODES)})")
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport {transport!r} (expected one of {', '.join(TRANSPORTS)})")
+        if transport == "rest" and executor is None:
+            raise ValueError("The REST transport needs an executor for tool calls")
+        self.engine = engine
+        self.message_types = message_types
+        self.api_key = api_key
+        self.client = client
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.scopes = tuple(scopes)
+        self.pool = pool
+        self.executor = executor
+        self.result_cache = result_cache
+        self.validator_cache = validator_cache
+        self.model = model
+        self.temperature = temperature
+        self.tool_mode = tool_mode
+        self.transport = transport
+        self.top_k = top_k
+        self.max_iterations = max_iterations
+        self.tool_concurrency = tool_concurrency
+        self.speculative_tools = speculative_tools
+
+    def run(
+        self,
+        context: ConversationContext,
+        user_input: str,
+        catalog_tools: List[Dict[str, Any]],
+        observer: Optional[StreamObserver] = None,
+    ) -> TurnResult:
+        """Answer ``user_input``, adding the finished turn to ``context``"""
+        engine = self.engine
+        # Only tools the scopes allow, ranked against this message (and the one before)
+        tool_index = engine.tool_index(catalog_tools)
+        query = " ".join([t.user for t in context.turns[-1:]] + [user_input])
+        agent_tools = tool_index.select(query, self.scopes, self.top_k)
+        result = TurnResult("", "text", tools_catalog=len(catalog_tools), tools_offered=len(agent_tools))
+
+        native = self.tool_mode == "native" and bool(agent_tools) and "tool" in self.message_types
+        if native:
+            try:
+                llm = engine.tool_llm(self.api_key, agent_tools, self.model, self.temperature)
+            except (NotImplementedError, AttributeError):
+                result.native_unsupported = True
+                native = False
+        if not native:
+            llm = engine.llm(self.api_key, self.model, self.temperature)
+        result.tool_mode = "native" if native else "text"
+        system_msg = engine.system_prompt(agent_tools, native)
+
+        # History + this turn's scratch, assembled under the token budget
+        context.start_turn()
+
+        tools_by_name = {t["name"]: t for t in catalog_tools}
+        # Rejected calls go straight back to the model, without a gateway round trip
+        validators = None
+        if self.validator_cache is not None and catalog_tools:
+            validators = self.validator_cache.for_catalog(catalog_tools)
+
+        def validate(name: str, params: Dict[str, Any]) -> Optional[str]:
+            error = tool_index.scope_error(name, self.scopes)
+            if error is None and validators is not None:
+                error = validators.check(name, params)
+            return error
+
+        router = self.pool or self.client
+
+        def invoke(call: ToolCall) -> str:
+            return call_tool_for_agent(
+                router,
+                self.base_url,
+                call,
+                headers=self.headers,
+                timeout=self.client.timeout,
+                cache=self.result_cache,
+                tool_meta=tools_by_name.get(call.name),
+            )
+
+        def run_calls(calls: List[ToolCall]) -> List[str]:
+            return run_tool_calls(
+                calls,
+                invoke,
+                self.executor,
+                max_concurrency=self.tool_concurrency,
+                timeout=self.client.timeout,
+            )
+
+        def run_batch(calls: List[ToolCall]) -> List[str]:
+            # One /mcp round trip for every call the model made this turn
+            transport = McpTransport(
+                self.client,
+                self.pool.route([c.name for c in calls]) if self.pool else self.base_url,
+                self.headers,
+                timeout=self.client.timeout,
+            )
+            return call_tools_batched(transport, calls, cache=self.result_cache, tools_meta=tools_by_name)
+
+        response_text = ""
+        speculation = None
+        finished = False
+        try:
+            for _ in range(self.max_iterations):
+                messages = [
+                    self.message_types[role](content=content, **extra)
+                    for role, content, extra in context.build_messages(system_msg, user_input)
+                ]
+                # REST calls can start while the model is still writing the rest of its output
+                speculation = None
+                if self.transport == "rest" and self.speculative_tools:
+                    speculation = SpeculativeToolCalls(
+                        invoke,
+                        self.executor,
+                        validate,
+                        self.speculative_tools,
+                        native=native,
+                        max_calls=self.tool_concurrency,
+                        timeout=self.client.timeout,
+                    )
+                completion = stream_completion(llm, messages, self.model, observer, speculation)
+                response_text = completion.text
+                result.iterations += 1
+                result.prompt_tokens += completion.prompt_tokens
+                result.completion_tokens += completion.completion_tokens
+
+                # Run every tool call from this turn concurrently
+                tool_calls = completion.native_calls if native else parse_tool_calls(response_text)
+                if not tool_calls:
+                    # No tool call, this is the final response
+                    if speculation is not None:
+                        speculation.discard()
+                    break
+                result.tool_calls += len(tool_calls)
+                result.tools_called.extend(c.name for c in tool_calls)
+
+                with span("tools", **{"tool.calls": len(tool_calls), "tool.transport": self.transport}) as tools_span:
+                    if self.transport == "mcp":
+                        tool_results = execute_tool_calls(tool_calls, run_batch, validate)
+                    elif speculation is not None:
+                        tool_results = execute_tool_calls(
+                            tool_calls, lambda calls: speculation.run(calls, run_calls), validate
+                        )
+                        speculation.discard()
+                        result.speculation_saved_ms += speculation.saved_ms
+                        tools_span.set(
+                            **{
+                                "tool.speculated": speculation.confirmed,
+                                "tool.speculation_discarded": speculation.discarded,
+                                "tool.speculation_saved_ms": round(speculation.saved_ms, 3),
+                            }
+                        )
+                    else:
+                        tool_results = execute_tool_calls(tool_calls, run_calls, validate)
+
+                # Add to conversation once, results in the order the model asked
+                context.add_model_output(response_text, completion.native_calls if native else None)
+                context.add_tool_results(tool_calls, tool_results)
+
+            # Extract final response (skip TOOL_CALL lines)
+            result.answer = strip_tool_calls(response_text) or response_text
+            context.finish_turn(user_input, result.answer)
+            finished = True
+        finally:
+            if not finished:
+                # A failed model or tool call: stop speculative calls and forget the half-finished turn
+                if speculation is not None:
+                    speculation.discard()
+                context.abort_turn()
+
+        s = current_span()
+        if s is not None:
+            s.set(**result.attributes())
+        return result
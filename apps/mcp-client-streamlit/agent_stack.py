@@ -0,0 +1,70 @@
+"""On-demand, background import of the LangChain/Groq agent stack.
+
+``langchain_groq`` pulls in langchain-core, pydantic models, the Groq SDK and
+httpx, which takes about a second. Only the AI Agent tab needs it, so
+``app.py`` does not import it at module load. The first time the agent is
+used, ``AgentStackLoader.start()`` begins the import on a background thread,
+and ``wait()`` blocks only when a message is actually sent. Import failures
+are captured rather than raised, so the app can keep reporting them the way
+it always has (``available``/``error``).
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Callable
+
+
+@dataclass
+class AgentStack:
+    """Outcome of importing the agent stack."""
+
+    available: bool
+    error: Optional[str] = None
+    chat_model: Any = None  # langchain_groq.ChatGroq
+    message_types: Dict[str, Any] = field(default_factory=dict)  # role -> message class
+
+
+def import_agent_stack() -> AgentStack:
+    try:
+        from langchain_groq import ChatGroq
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+    except Exception as e:
+        return AgentStack(False, error=str(e))
+    return AgentStack(
+        True,
+        chat_model=ChatGroq,
+        message_types={"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage, "tool": ToolMessage},
+    )
+
+
+class AgentStackLoader:
+    """Imports the agent stack once per process, off the request path."""
+
+    def __init__(self, importer: Callable[[], AgentStack] = import_agent_stack):
+        self._importer = importer
+        self._stack: Optional[AgentStack] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        self._stack = self._importer()
+
+    def start(self) -> "AgentStackLoader":
+        """Begin importing in the background (no-op once started)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="agent-stack-import", daemon=True)
+                self._thread.start()
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return self._stack is not None
+
+    def wait(self, timeout: Optional[float] = None) -> AgentStack:
+        """Start if needed and block until the import has finished"""
+        self.start()
+        self._thread.join(timeout)
+        if self._stack is None:
+            return AgentStack(False, error="Timed out importing LangChain")
+        return self._stack
@@ -1,37 +1,109 @@
 import os
 import json
-import re
 import html
+import contextlib
+import functools
+import math
+import time
 import streamlit as st
 import requests
-from typing import Optional, Dict, Any
-
-# Try to import LangChain packages
-LANGCHAIN_AVAILABLE = False
-LANGCHAIN_ERROR = None
-try:
-    from langchain_groq import ChatGroq
-    from langchain_core.messages import HumanMessage
-    LANGCHAIN_AVAILABLE = True
-except Exception as e:
-    LANGCHAIN_ERROR = str(e)
+from typing import Optional, Dict, Any, Tuple
+
+from agent import (
+    DEFAULT_MODEL,
+    DEFAULT_TOOL_CONCURRENCY,
+    TOOL_MODES,
+    AgentEngine,
+    ThinkStreamSplitter,
+    make_tool_executor,
+    split_thinking_and_reply,
+)
+from agent_loop import AgentLoop, StreamObserver
+from agent_stack import AgentStackLoader
+from batch import (
+    DEFAULT_RPC_BATCH_SIZE,
+    MAX_BATCH_CONCURRENCY,
+    BatchInputError,
+    BatchResultWriter,
+    parse_batch_input,
+    run_batch,
+    run_batch_rpc,
+)
+from cassette import Cassette
+from catalog_cache import CatalogEntry, ToolCatalogCache, CatalogFetchError
+from context import ConversationContext, latest_window
+from gateway_client import PREVIEW_BYTES, GatewayClient, ResponseBody, sweep_spilled_responses
+from flow_control import FlowControl
+from gateway_pool import GatewayPool, parse_hedge_tools
+from loadtest import ENDPOINT_MCP, ENDPOINT_REST, LoadTarget, LoadTestConfig, LoadTestRun
+from mcp_transport import McpTransport
+from result_cache import MISS, ToolResultCache, parse_cache_rules
+from tool_index import DEFAULT_TOP_K, missing_scopes
+from telemetry import Span, Tracer, phase_breakdown, to_otlp
+from validation import CatalogValidators, ValidatorCache
+
+# Per-turn cap on concurrent TOOL_CALLs, and the process-wide pool they share
+AGENT_TOOL_CONCURRENCY = int(os.getenv("MCP_AGENT_TOOL_CONCURRENCY", DEFAULT_TOOL_CONCURRENCY))
+AGENT_TOOL_POOL_SIZE = int(os.getenv("MCP_AGENT_TOOL_POOL_SIZE", "32"))
+
+# More gateway deployments to route tool calls across (comma-separated URLs),
+# seconds between their /health probes, and the tools safe to hedge (sent twice)
+GATEWAY_URLS = os.getenv("MCP_GATEWAY_URLS", "")
+GATEWAY_PROBE_INTERVAL = float(os.getenv("MCP_GATEWAY_PROBE_INTERVAL", "10"))
+HEDGE_TOOLS = parse_hedge_tools(os.getenv("MCP_HEDGE_TOOLS", "sum,normalize-text"))
+
+# Seconds between refreshes of the sidebar's flow control state (rate limits and AIMD limits)
+FLOW_REFRESH_INTERVAL = float(os.getenv("MCP_FLOW_REFRESH_INTERVAL", "2"))
+
+# Prompt token budget per model call, and chat messages rendered per page
+AGENT_CONTEXT_TOKENS = int(os.getenv("MCP_AGENT_CONTEXT_TOKENS", "6000"))
+AGENT_HISTORY_PAGE = int(os.getenv("MCP_AGENT_HISTORY_PAGE", "20"))
+
+# Most relevant tools offered to the model per message (0 offers every tool the scopes allow)
+AGENT_TOOL_TOP_K = int(os.getenv("MCP_AGENT_TOOL_TOP_K", DEFAULT_TOP_K))
+
+# Token budget for each tool result in the prompt (larger JSON results are summarized)
+AGENT_TOOL_RESULT_TOKENS = int(os.getenv("MCP_AGENT_TOOL_RESULT_TOKENS", "800"))
+
+# Responses larger than this many bytes are paged instead of rendered in full,
+# and list items shown per page
+RESULT_INLINE_BYTES = int(os.getenv("MCP_RESULT_INLINE_BYTES", "200000"))
+RESULT_PAGE_SIZE = int(os.getenv("MCP_RESULT_PAGE_SIZE", "50"))
+# Seconds a paged response file is kept on disk (files of ended sessions are swept after this)
+RESULT_FILE_TTL = float(os.getenv("MCP_RESULT_FILE_TTL", "3600"))
+# Largest file a download button serves in full; the button reads it into memory on every rerun,
+# so bigger files offer only their first this-many bytes
+RESULT_DOWNLOAD_MAX_BYTES = int(os.getenv("MCP_RESULT_DOWNLOAD_MAX_BYTES", "20000000"))
+
+# How the agent sends tool calls: "rest" (one POST per call) or "mcp" (one JSON-RPC batch per turn)
+AGENT_TOOL_TRANSPORT = os.getenv("MCP_AGENT_TOOL_TRANSPORT", "rest")
+
+# Tools the agent may call while the model is still streaming (REST transport; side-effect free only, "*" for all)
+AGENT_SPECULATIVE_TOOLS = parse_hedge_tools(os.getenv("MCP_AGENT_SPECULATIVE_TOOLS", "sum,normalize-text"))
+
+# How the model asks for tools: "native" (bound tool definitions) or "text" (TOOL_CALL lines)
+AGENT_TOOL_MODE = os.getenv("MCP_AGENT_TOOL_MODE", "native")
+
+# Minimum seconds between redraws of a streaming agent response
+STREAM_RENDER_INTERVAL = 0.05
+
+# Seconds between live refreshes of a running load test
+LOADTEST_REFRESH_INTERVAL = 0.5
+
+# Rows of the most recent batch results kept on screen while a batch runs
+BATCH_LIVE_ROWS = 20
+
+# Finished traces kept per session for the performance panel
+PERF_TRACE_HISTORY = int(os.getenv("MCP_PERF_TRACE_HISTORY", "50"))
+
+# Check tool arguments against the catalog's inputSchema before sending (default on)
+VALIDATE_ARGS = os.getenv("MCP_VALIDATE_ARGS", "true").lower() not in ("0", "false", "no", "off")
 
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
 
-def get_default_args(tool_name: str) -> Dict[str, Any]:
-    """Return default arguments for each tool"""
-    defaults = {
-        "hello": {"name": ""},
-        "list-top-customers": {"limit": 5},
-        "sum": {"a": 0, "b": 0},
-        "normalize-text": {"text": "", "mode": "lower"},
-    }
-    return defaults.get(tool_name, {})
-
-
 def get_gateway_base_url(mcp_url: str) -> str:
     """Extract base URL from MCP URL, removing /mcp endpoint"""
     url = mcp_url.rstrip("/")
@@ -40,21 +112,273 @@ def get_gateway_base_url(mcp_url: str) -> str:
     return url
 
 
-def split_thinking_and_reply(text: str) -> Dict[str, str]:
-    """Split model output into hidden-think content and visible reply."""
-    if not text:
-        return {"thinking": "", "reply": ""}
+@functools.lru_cache(maxsize=64)
+def parse_scopes(scopes_input: str) -> Tuple[str, ...]:
+    """Parse scopes (handle both comma-separated and line-separated formats)"""
+    scopes = []
+    for line in scopes_input.split("\n"):
+        line = line.strip()
+        if line:
+            scopes.extend([s.strip() for s in line.split(",")])
+    return tuple(scopes)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _read_readme_intro(readme_path: str, mtime: float) -> str:
+    with open(readme_path, "r", encoding="utf-8") as f:
+        return f.read().split("\n## ")[0]
+
+
+def load_readme_intro(readme_path: str) -> Optional[str]:
+    """Intro section of the project README (up to the first H2), re-read only when the file changes"""
+    try:
+        # The mtime is part of the cache key, so an edited README is picked up
+        return _read_readme_intro(readme_path, os.path.getmtime(readme_path))
+    except OSError:
+        return None
+
+
+@st.cache_resource
+def get_cassette() -> Optional[Cassette]:
+    """Process-wide record/replay cassette when MCP_CASSETTE is set"""
+    return Cassette.from_env()
+
+
+@st.cache_resource
+def get_flow_control() -> FlowControl:
+    """Process-wide rate limits and adaptive concurrency for gateway requests"""
+    return FlowControl.from_env()
+
+
+@st.cache_resource
+def get_gateway_client() -> GatewayClient:
+    """Process-wide pooled gateway client shared by every session"""
+    return GatewayClient.from_env(cassette=get_cassette(), flow=get_flow_control())
+
+
+@st.cache_resource(max_entries=4)
+def get_gateway_pool(base_urls: Tuple[str, ...]) -> GatewayPool:
+    """Process-wide router for one set of gateway deployments (probes /health in the background)"""
+    return GatewayPool(
+        get_gateway_client(),
+        list(base_urls),
+        probe_interval=GATEWAY_PROBE_INTERVAL,
+        hedge_tools=HEDGE_TOOLS,
+        hedge_workers=AGENT_TOOL_POOL_SIZE,
+    ).start()
+
+
+@st.cache_resource
+def get_tool_executor():
+    """Process-wide thread pool for agent tool calls"""
+    return make_tool_executor(AGENT_TOOL_POOL_SIZE)
+
+
+@st.cache_resource
+def get_agent_stack_loader() -> AgentStackLoader:
+    """Process-wide lazy importer for LangChain/Groq (only the agent needs them)"""
+    return AgentStackLoader()
+
+
+def make_chat_model(api_key: str, model: str, temperature: float) -> Any:
+    """A ChatGroq client, wrapped by the cassette when recording or replaying"""
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        return cassette.chat_model(None, model)
+    llm = get_agent_stack_loader().wait().chat_model(
+        groq_api_key=api_key,
+        model_name=model,
+        temperature=temperature,
+    )
+    return llm if cassette is None else cassette.chat_model(llm, model)
 
-    thinking_blocks = re.findall(r"<think>(.*?)</think>", text, flags=re.DOTALL | re.IGNORECASE)
-    thinking = "\n\n".join(block.strip() for block in thinking_blocks if block.strip())
 
-    reply = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL | re.IGNORECASE).strip()
-    reply = reply.replace("<think>", "").replace("</think>", "").strip()
+@st.cache_resource
+def get_agent_engine() -> AgentEngine:
+    """Process-wide cache of model clients and compiled system prompts"""
+    return AgentEngine(make_chat_model)
 
-    if not reply and not thinking:
-        reply = text.strip()
 
-    return {"thinking": thinking, "reply": reply}
+def fetch_catalog(force: bool = False) -> Tuple[CatalogEntry, str]:
+    """The tool catalog, merged across gateways when several are configured"""
+    if gateway_pool is not None:
+        return gateway_pool.catalog(catalog, headers, force)
+    return catalog.get(get_gateway_base_url(mcp_url), headers, force=force)
+
+
+@st.cache_resource
+def get_result_cache() -> ToolResultCache:
+    """Process-wide memoization cache for deterministic tool results"""
+    return ToolResultCache(
+        max_entries=int(os.getenv("MCP_TOOL_CACHE_SIZE", "1024")),
+        rules=parse_cache_rules(os.getenv("MCP_TOOL_CACHE_RULES", "sum=3600,normalize-text=3600")),
+        max_entry_bytes=int(os.getenv("MCP_TOOL_CACHE_MAX_ENTRY_BYTES", "65536")),
+    )
+
+
+@st.cache_resource
+def get_tracer() -> Tracer:
+    """Process-wide tracer; exports to MCP_TRACE_FILE when set"""
+    return Tracer.from_env()
+
+
+@contextlib.contextmanager
+def traced(name: str, **attributes: Any):
+    """Trace one user action and keep it for this session's performance panel"""
+    root = None
+    try:
+        with get_tracer().trace(name, **attributes) as root:
+            yield root
+    finally:
+        if root is not None:
+            history = st.session_state.setdefault("perf_traces", [])
+            history.append(root)
+            del history[:-PERF_TRACE_HISTORY]
+
+
+@st.cache_resource
+def get_validator_cache() -> ValidatorCache:
+    """Process-wide argument validators, compiled once per tool catalog"""
+    return ValidatorCache()
+
+
+def render_validation_issues(validators: CatalogValidators, tool_name: str, arguments: Any) -> bool:
+    """Show schema errors for a call; True when it may be sent"""
+    if not validate_args or arguments is None or tool_name not in validators:
+        return True
+    issues = validators.validate(tool_name, arguments)
+    if issues:
+        st.error(
+            "Arguments do not match the tool's input schema:\n"
+            + "\n".join(f"- `{issue.path}` {issue.message}" for issue in issues)
+        )
+    return not issues
+
+
+@st.cache_resource
+def get_catalog_cache() -> ToolCatalogCache:
+    """Process-wide `/tools` catalog cache keyed by gateway/tenant/scopes"""
+    return ToolCatalogCache(
+        get_gateway_client(),
+        ttl=float(os.getenv("MCP_CATALOG_TTL", "60")),
+        stale_ttl=float(os.getenv("MCP_CATALOG_STALE_TTL", "300")),
+    )
+
+
+def largest_list(value: Any, path: str = "$", depth: int = 3) -> Tuple[str, Optional[list]]:
+    """Path and items of the longest list in ``value`` (the part worth paging)"""
+    if isinstance(value, list):
+        return path, value
+    best: Tuple[str, Optional[list]] = (path, None)
+    if isinstance(value, dict) and depth > 0:
+        for key, item in value.items():
+            found = largest_list(item, f"{path}.{key}", depth - 1)
+            if found[1] is not None and (best[1] is None or len(found[1]) > len(best[1])):
+                best = found
+    return best
+
+
+def discard_large_result(key: str) -> None:
+    st.session_state.pop(f"{key}_page", None)
+    info = st.session_state.pop(key, None)
+    if info and os.path.exists(info["path"]):
+        os.remove(info["path"])
+
+
+def show_response(key: str, label: str, body: ResponseBody, value: Any = None) -> None:
+    """Render a response body: inline when small, else kept on disk and paged"""
+    if body.size <= RESULT_INLINE_BYTES:
+        if value is not None:
+            st.json(value)
+        else:
+            st.text(body.text())
+        return
+    if body.path is None and body.truncated:
+        # Cut off at the spill ceiling: no file was kept, so only the preview is left
+        discard_large_result(key)
+        st.caption(f"{label} · over {body.size:,} bytes")
+        st.warning(
+            "Larger than the limit for keeping responses on disk (MCP_HTTP_MAX_SPILL_BYTES), so reading stopped. "
+            f"Showing the first {PREVIEW_BYTES // 1024} KB."
+        )
+        st.code(body.text(), language="json")
+        return
+    # Only the file path stays in session state; pages are read back on demand
+    path = body.save()
+    previous = st.session_state.get(key)
+    if previous and previous["path"] != path:
+        discard_large_result(key)
+    st.session_state[key] = {"path": path, "size": body.size, "label": label, "parsed": not body.truncated}
+    # Files of sessions that ended without replacing their result
+    sweep_spilled_responses(RESULT_FILE_TTL)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_large_result_page(path: str, mtime: float, page: int) -> Dict[str, Any]:
+    """One page of a kept response, parsed once per file and page rather than on every rerun"""
+    with open(path, "rb") as f:
+        value = json.load(f)
+    list_path, items = largest_list(value)
+    if items is not None and len(items) > RESULT_PAGE_SIZE:
+        start = (page - 1) * RESULT_PAGE_SIZE
+        return {
+            "pages": math.ceil(len(items) / RESULT_PAGE_SIZE),
+            "list_path": list_path,
+            "total": len(items),
+            "start": start,
+            "items": items[start:start + RESULT_PAGE_SIZE],
+        }
+    text = json.dumps(value, indent=2)
+    start = (page - 1) * RESULT_INLINE_BYTES
+    return {"pages": math.ceil(len(text) / RESULT_INLINE_BYTES), "text": text[start:start + RESULT_INLINE_BYTES]}
+
+
+def download_file(label: str, path: str, file_name: str, mime: str, key: str) -> None:
+    """Download button for a file on disk, capped at RESULT_DOWNLOAD_MAX_BYTES"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size <= RESULT_DOWNLOAD_MAX_BYTES:
+            st.download_button(label, data=f, file_name=file_name, mime=mime, key=key)
+            return
+        st.caption(f"The full file ({size:,} bytes) is too large to download here; it is kept on the server at `{path}`.")
+        st.download_button(
+            f"⬇️ Download the first {RESULT_DOWNLOAD_MAX_BYTES:,} bytes",
+            data=f.read(RESULT_DOWNLOAD_MAX_BYTES),
+            file_name=file_name,
+            mime=mime,
+            key=key,
+        )
+
+
+def render_large_result(key: str) -> None:
+    """Paged view and full-body download for a response kept by show_response"""
+    info = st.session_state.get(key)
+    if not info or not os.path.exists(info["path"]):
+        return
+    st.caption(f"{info['label']} · {info['size']:,} bytes")
+    if info["parsed"]:
+        page_key = f"{key}_page"
+        page = int(st.session_state.get(page_key, 1))
+        result = load_large_result_page(info["path"], os.path.getmtime(info["path"]), page)
+        pages = result["pages"]
+        if pages > 1:
+            st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=page_key)
+        if "items" in result:
+            start = result["start"]
+            st.caption(
+                f"`{result['list_path']}`: items {start + 1}–{start + len(result['items'])} of {result['total']}"
+            )
+            st.json(result["items"])
+        else:
+            st.code(result["text"], language="json")
+    else:
+        st.warning(
+            f"Larger than the {gateway.max_response_bytes:,}-byte response cap, so it was not parsed. "
+            f"Showing the first {PREVIEW_BYTES // 1024} KB."
+        )
+        with open(info["path"], "rb") as f:
+            st.code(f.read(PREVIEW_BYTES).decode("utf-8", errors="replace"), language="json")
+    download_file("⬇️ Download full response", info["path"], f"{key}.json", "application/json", f"{key}_download")
 
 
 def render_agent_message(content: str) -> None:
@@ -72,6 +396,379 @@ def render_agent_message(content: str) -> None:
         )
 
 
+def render_batch_mode(
+    tool_name: str, validators: Optional[CatalogValidators] = None, input_schema: Optional[Dict[str, Any]] = None
+) -> None:
+    """Run one tool over many argument sets and stream results as they complete."""
+    st.markdown(
+        f"Run `{tool_name}` over many argument sets: JSONL (one JSON object per line) "
+        "or CSV (header row = argument names)."
+    )
+    batch_format = st.radio("Input format", ["jsonl", "csv"], horizontal=True, key="batch_format")
+    uploaded = st.file_uploader("Upload argument sets", type=["jsonl", "json", "csv", "txt"], key="batch_file")
+    pasted = st.text_area("...or paste them here", height=150, key="batch_text")
+
+    col1, col2 = st.columns(2)
+    concurrency = col1.slider("Concurrency", 1, MAX_BATCH_CONCURRENCY, 4, key="batch_concurrency")
+    rate = col2.number_input("Max requests/sec (0 = unlimited)", min_value=0.0, value=0.0, step=1.0, key="batch_rate")
+    use_rpc = st.checkbox(
+        "Group calls into JSON-RPC batches on /mcp",
+        value=False,
+        key="batch_use_rpc",
+        help="Many calls per HTTP request. Falls back to single requests if the gateway rejects batches.",
+    )
+    if use_rpc:
+        rpc_batch_size = st.number_input(
+            "Calls per JSON-RPC batch", min_value=1, max_value=500, value=DEFAULT_RPC_BATCH_SIZE, key="batch_rpc_size"
+        )
+
+    if st.button("▶️ Run Batch", key="run_batch"):
+        raw = uploaded.getvalue().decode("utf-8") if uploaded is not None else pasted
+        try:
+            arg_sets = parse_batch_input(raw, batch_format, input_schema)
+        except BatchInputError as e:
+            st.error(f"Invalid batch input: {e}")
+            return
+        if not arg_sets:
+            st.warning("No argument sets found")
+            return
+        if validate_args and validators is not None and tool_name in validators:
+            invalid = [(i, validators.check(tool_name, args)) for i, args in enumerate(arg_sets)]
+            invalid = [(i, error) for i, error in invalid if error]
+            if invalid:
+                st.error(
+                    f"{len(invalid)} of {len(arg_sets)} argument sets do not match the input schema:\n"
+                    + "\n".join(f"- row {i + 1}: {error}" for i, error in invalid[:10])
+                )
+                return
+
+        # Only the result file path survives the run; drop the previous file
+        previous = st.session_state.pop("batch_result_path", None)
+        if previous and os.path.exists(previous):
+            os.remove(previous)
+
+        base_url = get_gateway_base_url(mcp_url)
+        progress = st.progress(0.0, text=f"0 / {len(arg_sets)}")
+        live = st.empty()
+        recent = []
+        last_render = 0.0
+        if use_rpc:
+            results = run_batch_rpc(
+                McpTransport(gateway, base_url, headers),
+                tool_name,
+                arg_sets,
+                batch_size=int(rpc_batch_size),
+                concurrency=concurrency,
+                rate=rate,
+            )
+        else:
+            results = run_batch(
+                gateway, base_url, tool_name, arg_sets, headers=headers, concurrency=concurrency, rate=rate
+            )
+        with BatchResultWriter() as writer:
+            for result in results:
+                writer.write(result)
+                recent = (recent + [result])[-BATCH_LIVE_ROWS:]
+                now = time.monotonic()
+                if now - last_render > 0.2 or writer.total == len(arg_sets):
+                    last_render = now
+                    progress.progress(
+                        writer.total / len(arg_sets),
+                        text=f"{writer.total} / {len(arg_sets)} ({writer.succeeded} ok)",
+                    )
+                    live.dataframe(
+                        [
+                            {
+                                "#": r.index,
+                                "ok": r.ok,
+                                "status": r.status_code,
+                                "ms": round(r.latency_ms, 1),
+                                "result": json.dumps(r.data) if r.ok else r.error,
+                            }
+                            for r in reversed(recent)
+                        ],
+                        use_container_width=True,
+                    )
+        st.session_state.batch_result_path = writer.path
+        st.session_state.batch_summary = f"{writer.succeeded} / {writer.total} calls succeeded"
+
+    result_path = st.session_state.get("batch_result_path")
+    if result_path and os.path.exists(result_path):
+        st.success(st.session_state.get("batch_summary", ""))
+        download_file(
+            "⬇️ Download results (JSONL)",
+            result_path,
+            f"{tool_name}-batch-results.jsonl",
+            "application/jsonl",
+            "download_batch",
+        )
+
+
+class ChatStreamView(StreamObserver):
+    """Streams each model call into the ``slot`` placeholder.
+
+    Thinking tokens go to a caption and reply tokens to the main body as they
+    arrive; both areas are redrawn at most every STREAM_RENDER_INTERVAL seconds.
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def start(self) -> None:
+        with self.slot.container():
+            with st.chat_message("assistant"):
+                self.thinking_area = st.empty()
+                self.reply_area = st.empty()
+        self.splitter = ThinkStreamSplitter()
+        self.last_render = 0.0
+
+    def redraw(self) -> None:
+        if self.splitter.thinking:
+            self.thinking_area.caption(self.splitter.thinking)
+        if self.splitter.reply:
+            self.reply_area.markdown(
+                f"<div style='font-size: 1.15rem; line-height: 1.65;'>"
+                f"{html.escape(self.splitter.reply).replace(chr(10), '<br>')}</div>",
+                unsafe_allow_html=True,
+            )
+
+    def feed(self, text: str) -> None:
+        self.splitter.feed(text)
+        now = time.monotonic()
+        if now - self.last_render >= STREAM_RENDER_INTERVAL:
+            self.last_render = now
+            self.redraw()
+
+    def finish(self) -> None:
+        self.splitter.finish()
+        self.redraw()
+
+
+def trace_row(root: Span) -> Dict[str, Any]:
+    """One performance-panel row: total and per-phase milliseconds for a trace"""
+    phases = phase_breakdown(root)
+    return {
+        "action": root.name,
+        "total ms": round(root.duration_ms, 1),
+        "llm ms": round(phases["llm"], 1),
+        "gateway ms": round(phases["gateway"], 1),
+        "connect": round(phases["connect"], 1),
+        "ttfb": round(phases["ttfb"], 1),
+        "body": round(phases["body"], 1),
+        "decode": round(phases["json_decode"], 1),
+        "iterations": root.attributes.get("agent.iterations"),
+        "overlap saved ms": root.attributes.get("agent.speculation_saved_ms") or None,
+        "tokens": (root.attributes.get("llm.prompt_tokens") or 0) + (root.attributes.get("llm.completion_tokens") or 0)
+        or None,
+    }
+
+
+@st.fragment(run_every=FLOW_REFRESH_INTERVAL)
+def render_flow_control_panel() -> None:
+    """Sidebar panel: live rate limit buckets and per-gateway concurrency limits."""
+    flow = get_flow_control()
+    state = flow.snapshot()
+    throttled = sum(row["throttled"] for row in state["gateways"] + state["buckets"])
+    label = f"🚦 Flow control ({throttled} throttled)" if throttled else "🚦 Flow control"
+    with st.expander(label, expanded=False):
+        if state["gateways"]:
+            st.dataframe(state["gateways"], use_container_width=True, hide_index=True)
+        elif flow.adaptive:
+            st.caption("No gateway requests yet.")
+        if state["buckets"]:
+            st.dataframe(state["buckets"], use_container_width=True, hide_index=True)
+        elif not flow.rate_limits:
+            st.caption("No rate limits (set MCP_RATE_LIMITS).")
+        st.caption(
+            "Shared by every session. The concurrency limit grows while the gateway is healthy "
+            "and halves on 429/5xx, errors or latency spikes; Retry-After pauses it."
+        )
+
+
+@st.fragment
+def render_performance_panel() -> None:
+    """Sidebar panel: this session's recent traces and the spans of the latest one."""
+    with st.expander("⏱️ Performance", expanded=False):
+        st.button("🔄 Refresh", key="perf_refresh")
+        traces = st.session_state.get("perf_traces", [])
+        if not traces:
+            st.caption("No traced actions yet")
+            return
+
+        st.dataframe([trace_row(t) for t in reversed(traces)], use_container_width=True, hide_index=True)
+
+        latest = traces[-1]
+        st.caption(f"Latest: `{latest.name}` · trace `{latest.trace_id[:16]}…`")
+        st.dataframe(
+            [
+                {
+                    "span": s.name,
+                    "ms": round(s.duration_ms, 1),
+                    "status": str(s.attributes.get("http.status_code", "error" if s.error else "ok")),
+                    "x-request-id": s.attributes.get("http.request_id", ""),
+                    "gateway request_id": s.attributes.get("gateway.request_id", ""),
+                }
+                for s in latest.walk()
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+
+        st.download_button(
+            "⬇️ Export traces (OTLP JSON)",
+            data="\n".join(json.dumps(to_otlp(t)) for t in traces),
+            file_name="mcp-client-traces.jsonl",
+            mime="application/jsonl",
+            key="perf_export",
+        )
+
+
+def render_load_test_results(snapshot: Dict[str, Any], live: bool) -> None:
+    """Render a LoadTestStats snapshot: headline metrics, histogram, errors, per tool."""
+    summary = snapshot["summary"]
+    cols = st.columns(6)
+    cols[0].metric(
+        "Throughput (req/s)",
+        f"{summary.get('current_rps', summary['throughput_rps']) if live else summary['throughput_rps']:.1f}",
+    )
+    cols[1].metric("p50 (ms)", f"{summary['p50_ms']:.0f}")
+    cols[2].metric("p90 (ms)", f"{summary['p90_ms']:.0f}")
+    cols[3].metric("p99 (ms)", f"{summary['p99_ms']:.0f}")
+    cols[4].metric("max (ms)", f"{summary['max_ms']:.0f}")
+    cols[5].metric("Errors", f"{summary['errors']} / {summary['requests']}")
+    if "target_rps" in summary:
+        st.caption(
+            f"🎯 Target {summary['target_rps']:.1f} req/s, achieved {summary['throughput_rps']:.1f} req/s · "
+            f"{summary['scheduled']} scheduled, {summary['unsent']} unsent when the run ended · "
+            "latency counts from each request's scheduled send time"
+        )
+
+    left, right = st.columns(2)
+    with left:
+        st.markdown("**Latency histogram**")
+        st.bar_chart(snapshot["histogram"])
+    with right:
+        st.markdown("**Outcomes**")
+        st.dataframe(
+            [{"outcome": code, "count": n} for code, n in sorted(snapshot["outcomes"].items())],
+            use_container_width=True,
+        )
+
+    st.markdown("**Per tool**")
+    st.dataframe(
+        [
+            {
+                "target": target,
+                "requests": row["requests"],
+                "errors": row["errors"],
+                "req/s": round(row["throughput_rps"], 1),
+                "p50 ms": round(row["p50_ms"], 1),
+                "p90 ms": round(row["p90_ms"], 1),
+                "p99 ms": round(row["p99_ms"], 1),
+                "max ms": round(row["max_ms"], 1),
+            }
+            for target, row in sorted(snapshot["per_target"].items())
+        ],
+        use_container_width=True,
+    )
+
+
+@st.fragment
+def render_load_test_tab() -> None:
+    """Drive the gateway tool endpoints at a target rate/concurrency and profile latency."""
+    st.subheader("⏱️ Load Test")
+    st.markdown(
+        "Drive `/tools/{name}/call` and `/mcp` with the sidebar headers "
+        "(tenant, actor, scopes) and measure gateway latency."
+    )
+
+    base_url = get_gateway_base_url(mcp_url)
+    tools = st.session_state.get("tools")
+    if not tools:
+        try:
+            tools = catalog.get(base_url, headers)[0].tools
+        except Exception as e:
+            st.info(f"📋 Fetch the tools list first ({e})")
+            return
+
+    tool_names = [t["name"] for t in tools]
+    validators = get_validator_cache().for_catalog(tools)
+    selected = st.multiselect("Tools", tool_names, default=tool_names[:1], key="loadtest_tools")
+    endpoints = st.multiselect(
+        "Endpoints", [ENDPOINT_REST, ENDPOINT_MCP], default=[ENDPOINT_REST], key="loadtest_endpoints"
+    )
+    args_json = st.text_area(
+        "Arguments per tool (JSON object keyed by tool name)",
+        value=json.dumps({name: validators.defaults(name) for name in selected}, indent=2),
+        height=150,
+        key=f"loadtest_args_{'_'.join(selected)}",
+    )
+
+    col1, col2, col3 = st.columns(3)
+    mode = col1.radio("Mode", ["Target RPS", "Concurrency"], key="loadtest_mode")
+    if mode == "Target RPS":
+        rps = col2.number_input("Requests/sec", min_value=0.5, value=10.0, step=1.0, key="loadtest_rps")
+        concurrency = col2.number_input(
+            "Max in flight", min_value=1, max_value=256, value=32, key="loadtest_inflight"
+        )
+    else:
+        rps = 0.0
+        concurrency = col2.number_input(
+            "Concurrent workers", min_value=1, max_value=256, value=4, key="loadtest_workers"
+        )
+    duration = col3.number_input("Duration (s)", min_value=1, max_value=600, value=10, key="loadtest_duration")
+
+    run = st.session_state.get("loadtest_run")
+
+    start_col, stop_col = st.columns(2)
+    if start_col.button("🚀 Start", key="loadtest_start", disabled=bool(run and run.running)):
+        try:
+            per_tool_args = json.loads(args_json)
+        except json.JSONDecodeError:
+            st.error("Invalid JSON in arguments")
+            return
+        if not selected or not endpoints:
+            st.warning("Select at least one tool and one endpoint")
+            return
+        config = LoadTestConfig(
+            targets=[
+                LoadTarget(name, per_tool_args.get(name, {}), endpoint)
+                for name in selected
+                for endpoint in endpoints
+            ],
+            duration=float(duration),
+            rps=float(rps),
+            concurrency=int(concurrency),
+            timeout=gateway.timeout,
+        )
+        run = LoadTestRun(gateway, base_url, dict(headers), config).start()
+        st.session_state.loadtest_run = run
+    if stop_col.button("⏹️ Stop", key="loadtest_stop", disabled=not (run and run.running)):
+        run.stop()
+        run.join()
+
+    if run is None:
+        return
+
+    # Poll the background run; a widget interaction simply reruns and resumes polling
+    live = st.empty()
+    while run.running:
+        with live.container():
+            st.caption(f"Running… {run.stats.snapshot()['elapsed_s']:.0f}s / {run.config.duration:.0f}s")
+            render_load_test_results(run.stats.snapshot(window=2.0), live=True)
+        time.sleep(LOADTEST_REFRESH_INTERVAL)
+
+    with live.container():
+        render_load_test_results(run.stats.snapshot(), live=False)
+        st.download_button(
+            "⬇️ Export results (JSON)",
+            data=run.report_json(),
+            file_name="loadtest-results.json",
+            mime="application/json",
+            key="loadtest_export",
+        )
+
+
 # ============================================================================
 # Page configuration
 st.set_page_config(
@@ -103,6 +800,29 @@ mcp_url = st.sidebar.text_input(
     help="Full URL to MCP endpoint (usually ends with /mcp)",
 )
 
+extra_gateway_urls = st.sidebar.text_area(
+    "Additional gateway URLs",
+    value="\n".join(u.strip() for u in GATEWAY_URLS.split(",") if u.strip()),
+    help="One per line. Tool calls go to the fastest healthy gateway that exposes the tool.",
+    key="extra_gateway_urls",
+)
+gateway_urls = tuple(
+    dict.fromkeys(
+        get_gateway_base_url(u.strip())
+        for u in [mcp_url, *extra_gateway_urls.replace(",", "\n").splitlines()]
+        if u.strip()
+    )
+)
+
+cassette = get_cassette()
+if cassette is not None and cassette.replaying:
+    st.sidebar.caption(
+        f"📼 Replaying `{os.path.basename(cassette.path)}` ({cassette.latency} latency): "
+        f"{cassette.replayed} served, {cassette.misses} not recorded"
+    )
+elif cassette is not None:
+    st.sidebar.caption(f"📼 Recording to `{os.path.basename(cassette.path)}`: {cassette.recorded} exchanges")
+
 st.sidebar.divider()
 st.sidebar.subheader("Request Headers")
 
@@ -123,15 +843,11 @@ repo_url = "https://github.com/jamalla/mcp-server-rpc-tools"
 st.sidebar.markdown(f"**Project:** [mcp-server-rpc-tools]({repo_url})")
 
 with st.sidebar.expander("Project Summary", expanded=False):
-    try:
-        readme_path = os.path.join(os.path.dirname(__file__), "..", "..", "README.md")
-        with open(readme_path, "r", encoding="utf-8") as f:
-            readme = f.read()
-        # Show the intro section (up to first H2 '##')
-        intro = readme.split('\n## ')[0]
+    intro = load_readme_intro(os.path.join(os.path.dirname(__file__), "..", "..", "README.md"))
+    if intro is not None:
         st.markdown(intro)
         st.markdown(f"[Read full README]({repo_url})")
-    except Exception:
+    else:
         st.markdown("Project README not available.")
 
 scopes_input = st.sidebar.text_area(
@@ -141,14 +857,7 @@ scopes_input = st.sidebar.text_area(
     help="Comma-separated list of scopes. One per line is also supported.",
 )
 
-# Parse scopes (handle both formats)
-scopes_list = []
-for line in scopes_input.split("\n"):
-    line = line.strip()
-    if line:
-        # Handle both comma-separated and line-separated
-        scopes_list.extend([s.strip() for s in line.split(",")])
-
+scopes_list = parse_scopes(scopes_input)
 scopes_header = ",".join(scopes_list)
 
 # Build headers
@@ -166,60 +875,153 @@ st.sidebar.divider()
 if st.sidebar.checkbox("Show headers", value=False):
     st.sidebar.json(headers)
 
+gateway = get_gateway_client()
+catalog = get_catalog_cache()
+# Tool calls are routed across the gateways when there is more than one
+gateway_pool = get_gateway_pool(gateway_urls) if len(gateway_urls) > 1 else None
+router = gateway_pool or gateway
+if gateway_pool is not None:
+    with st.sidebar.expander(f"🌐 Gateways ({len(gateway_urls)})"):
+        st.dataframe(gateway_pool.snapshot(), use_container_width=True, hide_index=True)
+        st.caption("Updated on each rerun; /health is probed in the background.")
+if st.sidebar.button("🗑️ Clear tool catalog cache", key="clear_catalog_cache"):
+    for url in gateway_urls:
+        catalog.invalidate(url, headers)
+    st.session_state.pop("tools", None)
+    st.session_state.pop("agent_tools", None)
+validate_args = st.sidebar.checkbox(
+    "Validate arguments before sending",
+    value=VALIDATE_ARGS,
+    help="Check tool arguments against the catalog's input schema and reject invalid calls without a gateway round trip.",
+    key="validate_args",
+)
+
+st.sidebar.divider()
+st.sidebar.subheader("Tool Result Cache")
+bypass_result_cache = st.sidebar.checkbox(
+    "Bypass tool result cache",
+    value=False,
+    help="Always call the gateway, even for tools with a cache rule.",
+)
+result_cache = None if bypass_result_cache else get_result_cache()
+with st.sidebar.expander("Cache stats", expanded=False):
+    stats_cache = get_result_cache()
+    st.caption(
+        f"{len(stats_cache)} entries · cacheable tools: "
+        f"{', '.join(sorted(stats_cache.rules)) or 'none configured'}"
+    )
+    if stats_cache.counters:
+        st.dataframe(
+            [{"tool": name, **counts} for name, counts in sorted(stats_cache.counters.items())],
+            use_container_width=True,
+        )
+    if st.button("🗑️ Clear result cache", key="clear_result_cache"):
+        stats_cache.clear()
+
+# API Key input (fragments cannot write to the sidebar, so the agent's settings live here)
+groq_api_key = st.sidebar.text_input(
+    "GROQ API Key",
+    value=os.getenv("GROQ_API_KEY", ""),
+    type="password",
+    help="Get your API key from https://console.groq.com/",
+    key="groq_key_input",
+)
+if not groq_api_key and cassette is not None and cassette.replaying:
+    # Replayed model calls never reach Groq
+    groq_api_key = "cassette-replay"
+
+agent_rpc_transport = st.sidebar.radio(
+    "Agent tool transport",
+    ["rest", "mcp"],
+    index=1 if AGENT_TOOL_TRANSPORT == "mcp" else 0,
+    format_func=lambda t: "REST (one call per request)" if t == "rest" else "MCP JSON-RPC (one batch per turn)",
+    key="agent_tool_transport",
+) == "mcp"
+
+agent_tool_mode = st.sidebar.radio(
+    "Agent tool calling",
+    list(TOOL_MODES),
+    index=TOOL_MODES.index(AGENT_TOOL_MODE) if AGENT_TOOL_MODE in TOOL_MODES else 0,
+    format_func=lambda m: "Native (structured tool calls)" if m == "native" else "Text (TOOL_CALL lines)",
+    help="Native binds each tool's input schema to the model. Text is the fallback for models without tool calling.",
+    key="agent_tool_mode",
+)
+
 # ============================================================================
 # Main: Tools Discovery & Calling
 # ============================================================================
 
-tab1, tab2, tab3, tab4 = st.tabs(["Discover Tools", "Call Tool", "Raw Requests", "AI Agent"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ["Discover Tools", "Call Tool", "Raw Requests", "AI Agent", "Load Test"]
+)
 
-with tab1:
+@st.fragment
+def render_discover_tab() -> None:
+    """Tool discovery; reruns on its own unless the tool list changes."""
     st.subheader("Available Tools")
 
+    # Set just before a full-app rerun so the fetch result survives it
+    shown = st.session_state.pop("discover_result", None)
+
     if st.button("📋 Fetch Tools List", key="fetch_tools"):
-        with st.spinner("Fetching tools..."):
+        with st.spinner("Fetching tools..."), traced("discover_tools") as discover_trace:
             try:
                 # Use /tools REST endpoint for discovery
                 base_url = get_gateway_base_url(mcp_url)
                 rest_url = f"{base_url}/tools"
-                
+
                 # Show URL for debugging
-                st.info(f"📡 Calling: `{rest_url}`")
-                
-                response = requests.get(rest_url, headers=headers, timeout=10)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    tools = data.get("data", {}).get("tools", [])
-
-                    st.success(f"Found {len(tools)} tools")
-
-                    if tools:
-                        # Display tools as cards
-                        cols = st.columns(2)
-                        for idx, tool in enumerate(tools):
-                            with cols[idx % 2]:
-                                # `border` argument removed for compatibility across Streamlit versions
-                                with st.container():
-                                    st.markdown(f"### {tool['name']}")
-                                    st.markdown(tool["description"])
-                                    st.markdown(
-                                        f"**Domain:** `{tool['domain']}`"
-                                    )
-                                    st.markdown(
-                                        f"**Required Scopes:** {', '.join([f'`{s}`' for s in tool['requiredScopes']])}"
-                                    )
-                    st.session_state.tools = tools
+                if gateway_pool is not None:
+                    st.info(f"📡 Calling: `/tools` on {len(gateway_urls)} gateways")
                 else:
-                    st.error(f"Failed to fetch tools: {response.status_code}")
-                    st.code(response.text[:500], language="text")  # Show first 500 chars of response
+                    st.info(f"📡 Calling: `{rest_url}`")
+
+                entry, source = fetch_catalog()
+                discover_trace.set(**{"catalog.source": source, "catalog.tools": len(entry.tools)})
+                shown = {"url": rest_url, "source": source, "age": entry.age}
+                if entry.tools != st.session_state.get("tools"):
+                    # Call Tool and Load Test read this list: rerun the whole app once
+                    st.session_state.tools = entry.tools
+                    st.session_state.discover_result = shown
+                    st.rerun()
+            except CatalogFetchError as e:
+                st.error(f"Failed to fetch tools: {e.status_code}")
+                st.code(e.body, language="text")  # Show first 500 chars of response
             except requests.exceptions.RequestException as e:
                 st.error(f"Error connecting to MCP Gateway: {e}")
                 st.info("Make sure the gateway is running and the URL is correct.")
             except json.JSONDecodeError as e:
                 st.error(f"Invalid JSON response: {e}")
-                st.code(response.text[:500], language="text")
 
-with tab2:
+    if shown:
+        tools = st.session_state.get("tools", [])
+        st.success(f"Found {len(tools)} tools")
+        st.caption(f"Catalog cache: {shown['source']} (age {shown['age']:.0f}s)")
+
+        if tools:
+            # Display tools as cards
+            cols = st.columns(2)
+            for idx, tool in enumerate(tools):
+                with cols[idx % 2]:
+                    # `border` argument removed for compatibility across Streamlit versions
+                    with st.container():
+                        st.markdown(f"### {tool['name']}")
+                        st.markdown(tool["description"])
+                        st.markdown(
+                            f"**Domain:** `{tool['domain']}`"
+                        )
+                        st.markdown(
+                            f"**Required Scopes:** {', '.join([f'`{s}`' for s in tool['requiredScopes']])}"
+                        )
+
+
+with tab1:
+    render_discover_tab()
+
+
+@st.fragment
+def render_call_tool_tab() -> None:
+    """Call one tool (or a batch); interactions rerun only this tab."""
     st.subheader("Call a Tool")
 
     # Get available tools from session
@@ -248,11 +1050,12 @@ with tab2:
                 # Input schema editor
                 st.markdown("### Tool Arguments")
 
-                # Simple JSON editor for arguments
+                # JSON editor, pre-filled from the tool's input schema
+                validators = get_validator_cache().for_catalog(tools)
                 args_json = st.text_area(
                     "Tool Arguments (JSON)",
                     value=json.dumps(
-                        get_default_args(selected_tool_name), indent=2
+                        validators.defaults(selected_tool_name), indent=2
                     ),
                     height=200,
                     key=f"args_{selected_tool_name}",
@@ -260,113 +1063,213 @@ with tab2:
 
                 try:
                     arguments = json.loads(args_json)
-                except json.JSONDecodeError:
-                    st.error("Invalid JSON in arguments")
+                except json.JSONDecodeError as e:
+                    st.error(f"Invalid JSON in arguments: {e.msg} (line {e.lineno}, column {e.colno})")
                     arguments = None
+                args_valid = render_validation_issues(validators, selected_tool_name, arguments)
 
                 if st.button("▶️ Call Tool", key="call_tool"):
+                    discard_large_result("call_tool_result")
                     if arguments is None:
                         st.error("Please fix JSON errors first")
+                    elif not args_valid:
+                        st.error("Please fix the argument errors first (or turn off validation in the sidebar)")
                     else:
-                        with st.spinner(f"Calling {selected_tool_name}..."):
+                        with st.spinner(f"Calling {selected_tool_name}..."), traced("call_tool", tool=selected_tool_name):
                             try:
                                 # Call via REST endpoint
                                 base_url = get_gateway_base_url(mcp_url)
-                                response = requests.post(
-                                    f"{base_url}/tools/{selected_tool_name}/call",
-                                    json={"arguments": arguments},
-                                    headers=headers,
-                                    timeout=10,
+                                cached = (
+                                    MISS
+                                    if result_cache is None
+                                    else result_cache.get(
+                                        base_url, selected_tool_name, arguments, headers, selected_tool
+                                    )
                                 )
-
-                                st.divider()
-
-                                if response.status_code == 200:
-                                    result = response.json()
-                                    if result.get("ok"):
-                                        st.success("✅ Tool executed successfully")
-                                        st.json(result.get("data", {}))
-                                    else:
-                                        error = result.get("error", {})
-                                        st.error(
-                                            f"❌ Tool error: {error.get('message', 'Unknown error')}"
-                                        )
-                                        st.json(result)
+                                if cached is not MISS:
+                                    st.divider()
+                                    st.success("✅ Tool executed successfully (⚡ served from result cache)")
+                                    st.json(cached)
                                 else:
-                                    st.error(
-                                        f"❌ Request failed: {response.status_code}"
+                                    response = router.call_tool(
+                                        base_url,
+                                        selected_tool_name,
+                                        arguments,
+                                        headers=headers,
+                                        stream=True,
                                     )
+                                    # Read under the size cap; an oversized body goes to a temp file
+                                    body = router.read_body(response, spill=True)
                                     try:
-                                        st.json(response.json())
-                                    except:
-                                        st.text(response.text)
+                                        result = body.json()
+                                    except ValueError:
+                                        result = None
+                                    label = f"`{selected_tool_name}` response"
+                                    if gateway_pool is not None:
+                                        label += f" from `{response.gateway_endpoint}`"
+
+                                    st.divider()
+
+                                    if response.status_code == 200 and isinstance(result, dict):
+                                        if result.get("ok"):
+                                            if result_cache is not None:
+                                                result_cache.put(
+                                                    base_url,
+                                                    selected_tool_name,
+                                                    arguments,
+                                                    headers,
+                                                    result.get("data", {}),
+                                                    selected_tool,
+                                                    body.size,
+                                                )
+                                            st.success("✅ Tool executed successfully")
+                                            show_response("call_tool_result", label, body, result.get("data", {}))
+                                        else:
+                                            error = result.get("error", {})
+                                            st.error(
+                                                f"❌ Tool error: {error.get('message', 'Unknown error')}"
+                                            )
+                                            show_response("call_tool_result", label, body, result)
+                                    elif response.status_code == 200:
+                                        if not body.truncated:
+                                            st.warning("⚠️ Response could not be parsed")
+                                        show_response("call_tool_result", label, body)
+                                    else:
+                                        st.error(
+                                            f"❌ Request failed: {response.status_code}"
+                                        )
+                                        show_response("call_tool_result", label, body, result)
 
                             except requests.exceptions.RequestException as e:
                                 st.error(f"Error calling tool: {e}")
 
-with tab3:
+                render_large_result("call_tool_result")
+
+                with st.expander("📦 Batch mode", expanded=False):
+                    render_batch_mode(selected_tool_name, validators, selected_tool.get("inputSchema"))
+
+
+with tab2:
+    render_call_tool_tab()
+
+
+@st.fragment
+def render_raw_requests_tab() -> None:
+    """Hand-written JSON-RPC requests to /mcp."""
     st.subheader("Raw MCP Requests")
+    st.caption("JSON-RPC 2.0 over `POST /mcp`")
 
     request_type = st.radio(
         "Request Type",
-        ["tools/list", "tools/call"],
+        ["tools/list", "tools/call", "batch"],
+        horizontal=True,
+    )
+    transport = McpTransport(gateway, get_gateway_base_url(mcp_url), headers)
+    # Validate against whatever catalog is at hand; unknown tools are left to the gateway
+    known_entry = catalog.peek(transport.base_url, headers)
+    validators = get_validator_cache().for_catalog(
+        st.session_state.get("tools") or (known_entry.tools if known_entry else [])
     )
+    args_valid = True
 
     if request_type == "tools/list":
-        st.info("This will use the /tools endpoint (REST)")
-        if st.button("Send Request"):
-            with st.spinner("Sending request..."):
-                try:
-                    base_url = get_gateway_base_url(mcp_url)
-                    rest_url = f"{base_url}/tools"
-                    response = requests.get(
-                        rest_url, headers=headers, timeout=10
-                    )
-                    st.json(
-                        {
-                            "status_code": response.status_code,
-                            "response": response.json(),
-                        }
-                    )
-                except Exception as e:
-                    st.error(f"Error: {e}")
-
-    else:  # tools/call
-        st.markdown("Sending raw MCP tools/call request...")
-
+        rpc_request = transport.request("tools/list")
+    elif request_type == "tools/call":
         tool_name = st.text_input("Tool name")
         raw_args = st.text_area(
             "Tool arguments (JSON)",
             value="{}",
             height=150,
         )
-
-        if st.button("Send Request"):
-            with st.spinner("Sending request..."):
-                try:
-                    arguments = json.loads(raw_args)
-
-                    # Send via REST endpoint instead of MCP JSON-RPC
-                    base_url = get_gateway_base_url(mcp_url)
-                    response = requests.post(
-                        f"{base_url}/tools/{tool_name}/call",
-                        json={"arguments": arguments},
-                        headers=headers,
-                        timeout=10,
-                    )
-
+        try:
+            rpc_request = transport.request("tools/call", {"name": tool_name, "arguments": json.loads(raw_args)})
+            args_valid = render_validation_issues(validators, tool_name, rpc_request["params"]["arguments"])
+        except json.JSONDecodeError:
+            rpc_request = None
+            st.error("Invalid JSON in arguments")
+    else:  # batch
+        st.markdown(
+            "A JSON array of requests sent in one HTTP round trip. "
+            "Responses are matched back to requests by `id`."
+        )
+        raw_batch = st.text_area(
+            "Batch (JSON array)",
+            value=json.dumps(
+                [
+                    {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "sum", "arguments": {"a": 1, "b": 2}}},
+                    {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "sum", "arguments": {"a": 3, "b": 4}}},
+                ],
+                indent=2,
+            ),
+            height=250,
+        )
+        try:
+            rpc_request = json.loads(raw_batch)
+            if not isinstance(rpc_request, list) or not all(isinstance(m, dict) and "id" in m for m in rpc_request):
+                st.error("Expected a JSON array of request objects, each with an id")
+                rpc_request = None
+        except json.JSONDecodeError:
+            rpc_request = None
+            st.error("Invalid JSON in batch")
+        if rpc_request and validate_args:
+            errors = []
+            for message in rpc_request:
+                params = message.get("params") if isinstance(message.get("params"), dict) else {}
+                if message.get("method") == "tools/call" and params.get("name") in validators:
+                    error = validators.check(params["name"], params.get("arguments", {}))
+                    if error:
+                        errors.append(f"- id `{message['id']}`: {error}")
+            if errors:
+                st.error("Some calls do not match their tool's input schema:\n" + "\n".join(errors))
+                args_valid = False
+
+    if st.button("Send Request", disabled=rpc_request is None or not args_valid):
+        discard_large_result("raw_result")
+        with st.spinner("Sending request..."), traced("raw_request", method=request_type):
+            try:
+                if request_type == "batch":
+                    results = transport.send_batch(rpc_request)
                     st.json(
                         {
-                            "status_code": response.status_code,
-                            "response": response.json(),
+                            "batched": transport.batch_supported,
+                            "request": rpc_request,
+                            "responses": [
+                                {"id": r.id, "status_code": r.status_code, "result": r.result, "error": r.error}
+                                for r in results
+                            ],
                         }
                     )
-                except json.JSONDecodeError:
-                    st.error("Invalid JSON in arguments")
-                except Exception as e:
-                    st.error(f"Error: {e}")
+                else:
+                    response = gateway.mcp(transport.base_url, rpc_request, headers=headers, stream=True)
+                    raw = gateway.read_body(response, spill=True)
+                    try:
+                        body = raw.json()
+                    except ValueError:
+                        body = raw.text()
+                    if raw.size <= RESULT_INLINE_BYTES:
+                        st.json(
+                            {
+                                "status_code": response.status_code,
+                                "request": rpc_request,
+                                "response": body,
+                            }
+                        )
+                    else:
+                        st.json({"status_code": response.status_code, "request": rpc_request})
+                        show_response("raw_result", "Response", raw)
+            except Exception as e:
+                st.error(f"Error: {e}")
 
-with tab4:
+    render_large_result("raw_result")
+
+
+with tab3:
+    render_raw_requests_tab()
+
+
+@st.fragment
+def render_agent_tab() -> None:
+    """Agent chat; sending a message reruns only this tab."""
     st.subheader("🤖 AI Agent with MCP Tools")
     st.markdown(
         """
@@ -378,15 +1281,12 @@ The agent can access all available tools and decide which ones to use.
     # Initialize session state for chat history
     if "agent_messages" not in st.session_state:
         st.session_state.agent_messages = []
-
-    # API Key input
-    groq_api_key = st.sidebar.text_input(
-        "GROQ API Key",
-        value=os.getenv("GROQ_API_KEY", ""),
-        type="password",
-        help="Get your API key from https://console.groq.com/",
-        key="groq_key_input",
-    )
+    if "agent_context" not in st.session_state:
+        st.session_state.agent_context = ConversationContext(
+            AGENT_CONTEXT_TOKENS, tool_result_tokens=AGENT_TOOL_RESULT_TOKENS
+        )
+    if "agent_history_window" not in st.session_state:
+        st.session_state.agent_history_window = AGENT_HISTORY_PAGE
 
     if not groq_api_key:
         st.warning("⚠️ Please enter your GROQ API Key in the sidebar to use the AI Agent")
@@ -394,28 +1294,41 @@ The agent can access all available tools and decide which ones to use.
         # Load tools from cache or fetch fresh
         if st.button("🔄 Refresh Tools for Agent", key="refresh_tools_agent"):
             try:
-                base_url = get_gateway_base_url(mcp_url)
-                resp = requests.get(f"{base_url}/tools", headers=headers, timeout=10)
-                if resp.status_code == 200:
-                    st.session_state.agent_tools = resp.json().get("data", {}).get("tools", [])
-                    st.success(f"Loaded {len(st.session_state.agent_tools)} tools")
+                entry, _ = fetch_catalog(force=True)
+                st.session_state.agent_tools = entry.tools
+                st.success(f"Loaded {len(st.session_state.agent_tools)} tools")
             except Exception as e:
                 st.error(f"Failed to load tools: {e}")
 
         # Initialize tools if not in session
         if "agent_tools" not in st.session_state:
             try:
-                base_url = get_gateway_base_url(mcp_url)
-                resp = requests.get(f"{base_url}/tools", headers=headers, timeout=10)
-                if resp.status_code == 200:
-                    st.session_state.agent_tools = resp.json().get("data", {}).get("tools", [])
+                entry, _ = fetch_catalog()
+                st.session_state.agent_tools = entry.tools
+            except CatalogFetchError:
+                pass
             except Exception as e:
                 st.error(f"Failed to load tools: {e}")
                 st.session_state.agent_tools = []
 
+        catalog_tools = st.session_state.get("agent_tools", [])
+        usable = sum(1 for t in catalog_tools if not missing_scopes(t, scopes_list))
+        st.caption(
+            f"🧰 {usable} of {len(catalog_tools)} tools usable with the current x-scopes"
+            + (f"; the {AGENT_TOOL_TOP_K} most relevant are offered per message" if AGENT_TOOL_TOP_K > 0 else "")
+        )
+
         # Display chat history
         st.markdown("### Conversation")
-        for message in st.session_state.agent_messages:
+        hidden, visible = latest_window(
+            st.session_state.agent_messages, st.session_state.agent_history_window
+        )
+        if hidden and st.button(f"⬆️ Load older messages ({hidden} hidden)", key="load_older_messages"):
+            st.session_state.agent_history_window += AGENT_HISTORY_PAGE
+            hidden, visible = latest_window(
+                st.session_state.agent_messages, st.session_state.agent_history_window
+            )
+        for message in visible:
             with st.chat_message(message["role"]):
                 if message["role"] == "assistant":
                     render_agent_message(message["content"])
@@ -438,8 +1351,10 @@ The agent can access all available tools and decide which ones to use.
                 st.markdown(user_input)
 
             # Call AI Agent
-            with st.spinner("🤔 Agent is thinking..."):
-                if not LANGCHAIN_AVAILABLE:
+            with st.spinner("🤔 Agent is thinking..."), traced("agent.turn", model=DEFAULT_MODEL):
+                # Usually already imported in the background; otherwise this waits for it
+                agent_stack = get_agent_stack_loader().wait()
+                if not agent_stack.available:
                     st.error(
                         "⚠️ LangChain packages not installed.\n\n"
                         "Please run in your terminal:\n"
@@ -447,114 +1362,53 @@ The agent can access all available tools and decide which ones to use.
                         "cd apps/mcp-client-streamlit\n"
                         "py -m pip install langchain langchain-groq langchain-core\n"
                         "```\n\n"
-                        f"Error details: {LANGCHAIN_ERROR}"
+                        f"Error details: {agent_stack.error}"
                     )
                 else:
                     try:
-                        # Initialize GROQ LLM
-                        llm = ChatGroq(
-                            groq_api_key=groq_api_key,
-                            model_name="qwen/qwen3-32b",
-                            temperature=0,
+                        # Reuse the cached model client, compiled system prompt and tool index
+                        agent_loop = AgentLoop(
+                            get_agent_engine(),
+                            agent_stack.message_types,
+                            groq_api_key,
+                            gateway,
+                            get_gateway_base_url(mcp_url),
+                            headers,
+                            scopes_list,
+                            pool=gateway_pool,
+                            executor=get_tool_executor(),
+                            result_cache=result_cache,
+                            validator_cache=get_validator_cache() if validate_args else None,
+                            tool_mode=agent_tool_mode,
+                            transport="mcp" if agent_rpc_transport else "rest",
+                            top_k=AGENT_TOOL_TOP_K,
+                            tool_concurrency=AGENT_TOOL_CONCURRENCY,
+                            speculative_tools=AGENT_SPECULATIVE_TOOLS,
                         )
-
-                        # Build tool descriptions
-                        tools_info = ""
-                        if "agent_tools" in st.session_state:
-                            for tool in st.session_state.agent_tools:
-                                tools_info += f"\n- **{tool['name']}**: {tool['description']}\n"
-                                if "parameters" in tool:
-                                    params = tool["parameters"]
-                                    if isinstance(params, dict):
-                                        tools_info += f"  Parameters: {json.dumps(params)}\n"
-
-                        # Create initial system prompt
-                        system_msg = f"""You are a helpful AI assistant with access to tools. 
-You can use the following tools to help answer user questions:
-{tools_info}
-
-When you need to use a tool, respond with:
-TOOL_CALL: {{tool_name}} {{json_params}}
-
-For example:
-TOOL_CALL: sum {{"a": 5, "b": 3}}
-TOOL_CALL: hello {{"name": "World"}}
-
-After receiving tool results, provide a natural language answer to the user."""
-
-                        messages = [HumanMessage(content=system_msg)]
-                        messages.append(HumanMessage(content=user_input))
-
-                        # Simple agentic loop
-                        max_iterations = 5
-                        for iteration in range(max_iterations):
-                            # Call LLM
-                            response = llm.invoke(messages)
-                            response_text = response.content
-
-                            # Check if tool was called
-                            if "TOOL_CALL:" in response_text:
-                                # Parse tool call
-                                lines = response_text.split("\n")
-                                tool_calls_made = False
-                                for line in lines:
-                                    if line.strip().startswith("TOOL_CALL:"):
-                                        tool_calls_made = True
-                                        # Extract tool name and params
-                                        parts = line.replace("TOOL_CALL:", "").strip().split(" ", 1)
-                                        if len(parts) >= 1:
-                                            tool_name = parts[0]
-                                            try:
-                                                params = json.loads(parts[1]) if len(parts) > 1 else {}
-                                            except:
-                                                params = {}
-
-                                            # Call the tool
-                                            try:
-                                                base_url = get_gateway_base_url(mcp_url)
-                                                resp = requests.post(
-                                                    f"{base_url}/tools/{tool_name}/call",
-                                                    json={"input": params},
-                                                    headers=headers,
-                                                    timeout=10,
-                                                )
-                                                if resp.status_code == 200:
-                                                    data = resp.json()
-                                                    if data.get("ok"):
-                                                        tool_result = json.dumps(data.get("data", {}))
-                                                    else:
-                                                        tool_result = f"Error: {data.get('error', {}).get('message', 'Unknown error')}"
-                                                else:
-                                                    tool_result = f"HTTP {resp.status_code}: {resp.text[:200]}"
-                                            except Exception as e:
-                                                tool_result = f"Exception: {str(e)}"
-
-                                            # Add to conversation
-                                            messages.append(HumanMessage(content=response_text))
-                                            messages.append(HumanMessage(content=f"Tool result: {tool_result}"))
-
-                                if not tool_calls_made:
-                                    # No valid tool calls found, use response as is
-                                    break
-                            else:
-                                # No tool call, this is the final response
-                                break
-
-                        # Extract final response (skip TOOL_CALL lines)
-                        final_response = "\n".join(
-                            [line for line in response_text.split("\n") if not line.strip().startswith("TOOL_CALL:")]
-                        ).strip()
-
-                        if not final_response:
-                            final_response = response_text
+                        assistant_slot = st.empty()
+                        result = agent_loop.run(
+                            st.session_state.agent_context,
+                            user_input,
+                            st.session_state.get("agent_tools", []),
+                            ChatStreamView(assistant_slot),
+                        )
+                        if result.native_unsupported:
+                            st.caption("This model does not support native tool calling; using TOOL_CALL lines.")
+                        final_response = result.answer
 
                         # Add assistant message to history
                         st.session_state.agent_messages.append(
                             {"role": "assistant", "content": final_response}
                         )
 
-                        with st.chat_message("assistant"):
-                            render_agent_message(final_response)
+                        with assistant_slot.container():
+                            with st.chat_message("assistant"):
+                                render_agent_message(final_response)
+                                if result.speculation_saved_ms >= 1:
+                                    st.caption(
+                                        "⚡ Tool calls started while the model was still writing saved "
+                                        f"~{result.speculation_saved_ms:.0f} ms"
+                                    )
 
                     except Exception as e:
                         error_msg = f"Agent Error: {str(e)}"
@@ -563,6 +1417,13 @@ After receiving tool results, provide a natural language answer to the user."""
                             {"role": "assistant", "content": error_msg}
                         )
 
+
+with tab4:
+    render_agent_tab()
+
+with tab5:
+    render_load_test_tab()
+
 # ============================================================================
 # Footer
 # ============================================================================
@@ -576,3 +1437,12 @@ st.markdown(
 📚 [MCP Specification](https://spec.modelcontextprotocol.io/)
 """
 )
+
+with st.sidebar:
+    render_flow_control_panel()
+    render_performance_panel()
+
+# Start importing LangChain once the page is out, so the first agent message
+# does not pay for it and neither does the first render
+if groq_api_key:
+    get_agent_stack_loader().start()
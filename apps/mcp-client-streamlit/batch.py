@@ -0,0 +1,290 @@
+"""Batch tool invocation for the Call Tool tab.
+
+Argument sets come from JSONL (one JSON object per line) or CSV (header row
+names the arguments). They are sent to one tool with bounded concurrency and
+an optional request rate, either one REST call each or grouped into JSON-RPC
+batches on ``/mcp``, and results are yielded as they complete so the UI can
+stream them. Results are appended to a JSONL file on disk rather than
+kept in memory.
+"""
+
+import csv
+import io
+import itertools
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, List, Iterator, Iterable, Set, Tuple
+
+from gateway_client import GatewayClient
+from mcp_transport import McpTransport
+
+
+MAX_BATCH_CONCURRENCY = 32
+DEFAULT_RPC_BATCH_SIZE = 20
+
+
+class BatchInputError(ValueError):
+    """Raised when a batch input line cannot be parsed."""
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one call in a batch run."""
+
+    index: int
+    arguments: Dict[str, Any]
+    status_code: Optional[int]
+    ok: bool
+    latency_ms: float
+    data: Any = None
+    error: Optional[str] = None
+
+
+def _declared_types(prop: Any) -> Set[str]:
+    """JSON types an inputSchema property allows (empty when it does not say)"""
+    if not isinstance(prop, dict):
+        return set()
+    kind = prop.get("type")
+    if isinstance(kind, str):
+        return {kind}
+    if isinstance(kind, list):
+        return {k for k in kind if isinstance(k, str)}
+    values = prop.get("enum") if isinstance(prop.get("enum"), list) else [prop["const"]] if "const" in prop else []
+    if values and all(isinstance(v, str) for v in values):
+        return {"string"}
+    return set()
+
+
+def _coerce_csv_value(value: str, prop: Any = None) -> Any:
+    """CSV cells are strings; they are decoded as JSON unless the property takes a string"""
+    if "string" in _declared_types(prop):
+        return value  # "01234" is a zip code, "true" a word
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return value
+
+
+def parse_batch_input(
+    text: str, fmt: str = "jsonl", input_schema: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Parse pasted or uploaded argument sets (``fmt`` is ``"jsonl"`` or ``"csv"``).
+
+    CSV cells are typed by the tool's ``input_schema`` properties; columns the
+    schema does not type are decoded as JSON when they parse.
+    """
+    if fmt == "csv":
+        properties = (input_schema or {}).get("properties") or {}
+        reader = csv.DictReader(io.StringIO(text))
+        return [
+            {k: _coerce_csv_value(v, properties.get(k)) for k, v in row.items() if k and v != ""}
+            for row in reader
+        ]
+
+    arg_sets = []
+    for lineno, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            args = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchInputError(f"Line {lineno}: invalid JSON ({e.msg})") from e
+        if not isinstance(args, dict):
+            raise BatchInputError(f"Line {lineno}: expected a JSON object")
+        arg_sets.append(args)
+    return arg_sets
+
+
+class RatePacer:
+    """Spaces out request starts to at most ``rate`` per second (0 = unlimited)."""
+
+    def __init__(self, rate: float = 0):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _call_one(
+    client: GatewayClient,
+    base_url: str,
+    tool_name: str,
+    index: int,
+    arguments: Dict[str, Any],
+    headers: Optional[Dict[str, str]],
+    pacer: RatePacer,
+) -> BatchResult:
+    pacer.wait()
+    started = time.perf_counter()
+    try:
+        resp = client.call_tool(base_url, tool_name, arguments, headers=headers, stream=True)
+        raw = client.read_body(resp)
+        latency_ms = (time.perf_counter() - started) * 1000
+        if raw.truncated:
+            return BatchResult(
+                index,
+                arguments,
+                resp.status_code,
+                False,
+                latency_ms,
+                error=f"RESPONSE_TOO_LARGE: over {client.max_response_bytes} bytes",
+            )
+        try:
+            body = raw.json()
+        except ValueError:
+            return BatchResult(index, arguments, resp.status_code, False, latency_ms, error=raw.text(200))
+        if resp.status_code == 200 and body.get("ok"):
+            return BatchResult(index, arguments, resp.status_code, True, latency_ms, data=body.get("data"))
+        error = body.get("error", {}) if isinstance(body, dict) else {}
+        return BatchResult(
+            index,
+            arguments,
+            resp.status_code,
+            False,
+            latency_ms,
+            error=f"{error.get('code', 'HTTP_' + str(resp.status_code))}: {error.get('message', '')}",
+        )
+    except Exception as e:
+        return BatchResult(index, arguments, None, False, (time.perf_counter() - started) * 1000, error=str(e))
+
+
+def run_batch(
+    client: GatewayClient,
+    base_url: str,
+    tool_name: str,
+    arg_sets: Iterable[Dict[str, Any]],
+    headers: Optional[Dict[str, str]] = None,
+    concurrency: int = 4,
+    rate: float = 0,
+) -> Iterator[BatchResult]:
+    """Yield a BatchResult per argument set, in completion order"""
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+    pacer = RatePacer(rate)
+    items = iter(enumerate(arg_sets))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-call") as pool:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < concurrency:
+                try:
+                    index, args = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.add(
+                    pool.submit(_call_one, client, base_url, tool_name, index, args, headers, pacer)
+                )
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _call_rpc_chunk(
+    transport: McpTransport,
+    tool_name: str,
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    pacer: RatePacer,
+) -> List[BatchResult]:
+    pacer.wait()
+    started = time.perf_counter()
+    replies = transport.call_tools([(tool_name, args) for _, args in chunk])
+    # One round trip serves the whole chunk, so every item shares its latency
+    latency_ms = (time.perf_counter() - started) * 1000
+    results = []
+    for (index, args), reply in zip(chunk, replies):
+        if reply.ok:
+            results.append(BatchResult(index, args, reply.status_code, True, latency_ms, data=reply.tool_data()))
+        else:
+            results.append(
+                BatchResult(
+                    index,
+                    args,
+                    reply.status_code,
+                    False,
+                    latency_ms,
+                    error=f"{reply.error_code}: {reply.error.get('message', '')}",
+                )
+            )
+    return results
+
+
+def run_batch_rpc(
+    transport: McpTransport,
+    tool_name: str,
+    arg_sets: Iterable[Dict[str, Any]],
+    batch_size: int = DEFAULT_RPC_BATCH_SIZE,
+    concurrency: int = 4,
+    rate: float = 0,
+) -> Iterator[BatchResult]:
+    """Like run_batch, but ``batch_size`` calls travel in each JSON-RPC request.
+
+    ``rate`` limits HTTP requests (chunks) per second, not individual calls.
+    """
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+    batch_size = max(1, batch_size)
+    pacer = RatePacer(rate)
+    items = iter(enumerate(arg_sets))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-rpc") as pool:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < concurrency:
+                chunk = list(itertools.islice(items, batch_size))
+                if not chunk:
+                    exhausted = True
+                    break
+                in_flight.add(pool.submit(_call_rpc_chunk, transport, tool_name, chunk, pacer))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+class BatchResultWriter:
+    """Appends results to a JSONL temp file so they need not stay in memory."""
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            handle = tempfile.NamedTemporaryFile(
+                mode="w", suffix=".jsonl", prefix="mcp-batch-", delete=False, encoding="utf-8"
+            )
+            self.path = handle.name
+            self._file = handle
+        else:
+            self.path = path
+            self._file = open(path, "w", encoding="utf-8")
+        self.total = 0
+        self.succeeded = 0
+
+    def write(self, result: BatchResult) -> None:
+        self._file.write(json.dumps(asdict(result)) + "\n")
+        self.total += 1
+        if result.ok:
+            self.succeeded += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "BatchResultWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
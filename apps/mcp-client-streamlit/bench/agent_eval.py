@@ -0,0 +1,380 @@
+"""Headless agent evaluation: prompt scenarios through ``AgentLoop``, concurrently.
+
+A scenario file is JSONL, one scenario per line::
+
+    {"id": "add", "prompt": "What is 2 + 3?", "expect": {"contains": ["5"], "tools": ["sum"]}}
+
+``messages`` (a list) replaces ``prompt`` for a multi-message conversation;
+``scopes`` and ``tenant`` override the command-line headers. ``expect``
+checks the last reply (without ``<think>`` blocks): ``contains`` and
+``excludes`` (case-insensitive substrings), ``matches`` (a regular
+expression) and ``tools`` (tools the scenario must have called).
+
+Scenarios run concurrently, sharing one gateway client, agent engine and
+tool thread pool the way sessions of the app do. The report has each
+scenario's wall time, LLM round trips, tool calls, tokens and failed checks,
+plus totals: a table on stderr and JSON on stdout (or ``--output``). Every
+agent turn is traced (exported to MCP_TRACE_FILE when set), and MCP_HTTP_*,
+MCP_RATE_LIMITS, MCP_FLOW_* and MCP_CASSETTE* apply as in the app.
+
+Offline, ``--mock-gateway`` starts bench.mock_gateway in-process and
+``--fake-llm`` answers with bench.fake_llm. Otherwise the gateway comes from
+``--gateway`` or MCP_GATEWAY_URL and the model from Groq (GROQ_API_KEY).
+
+Usage (from apps/mcp-client-streamlit):
+
+    python -m bench.agent_eval bench/agent_scenarios.jsonl --mock-gateway --fake-llm --concurrency 8
+    python -m bench.agent_eval scenarios.jsonl --gateway http://localhost:8787 --repeat 3
+
+The exit status is 1 when any scenario failed a check or raised.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, List, Callable
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from agent import (  # noqa: E402
+    DEFAULT_MODEL,
+    DEFAULT_TOOL_CONCURRENCY,
+    TOOL_MODES,
+    AgentEngine,
+    make_tool_executor,
+    split_thinking_and_reply,
+)
+from agent_loop import DEFAULT_MAX_ITERATIONS, TRANSPORTS, AgentLoop  # noqa: E402
+from agent_stack import import_agent_stack  # noqa: E402
+from bench.fake_llm import install_fake_llm  # noqa: E402
+from bench.mock_gateway import MockGateway, MockGatewayConfig  # noqa: E402
+from cassette import Cassette  # noqa: E402
+from catalog_cache import ToolCatalogCache  # noqa: E402
+from context import ConversationContext  # noqa: E402
+from flow_control import FlowControl  # noqa: E402
+from gateway_client import GatewayClient  # noqa: E402
+from gateway_pool import parse_hedge_tools  # noqa: E402
+from result_cache import ToolResultCache, parse_cache_rules  # noqa: E402
+from telemetry import Tracer  # noqa: E402
+from tool_index import DEFAULT_TOP_K  # noqa: E402
+from validation import ValidatorCache  # noqa: E402
+
+DEFAULT_SCOPES = "read:greetings,customers:read,math:execute,text:transform"
+CONTEXT_TOKENS = int(os.getenv("MCP_AGENT_CONTEXT_TOKENS", "6000"))
+TOOL_RESULT_TOKENS = int(os.getenv("MCP_AGENT_TOOL_RESULT_TOKENS", "800"))
+
+
+class ScenarioFileError(ValueError):
+    """Raised when a scenario line cannot be parsed."""
+
+
+@dataclass
+class Scenario:
+    """Messages to send in order, with checks on the last answer."""
+
+    id: str
+    messages: List[str]
+    expect: Dict[str, Any] = field(default_factory=dict)
+    scopes: Optional[str] = None
+    tenant: Optional[str] = None
+
+
+@dataclass
+class ScenarioResult:
+    """Cost and outcome of one scenario run."""
+
+    id: str
+    ok: bool
+    wall_ms: float
+    llm_calls: int = 0
+    tool_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    speculation_saved_ms: float = 0.0
+    failed_checks: List[str] = field(default_factory=list)
+    answer: str = ""
+    error: Optional[str] = None
+
+
+def load_scenarios(path: str) -> List[Scenario]:
+    """Read a JSONL scenario file; raises ScenarioFileError on a bad line"""
+    scenarios = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError as e:
+                raise ScenarioFileError(f"Line {number}: invalid JSON ({e})") from e
+            if not isinstance(raw, dict):
+                raise ScenarioFileError(f"Line {number}: a scenario must be a JSON object")
+            messages = raw.get("messages") or ([raw["prompt"]] if raw.get("prompt") else [])
+            if not isinstance(messages, list) or not messages or not all(isinstance(m, str) for m in messages):
+                raise ScenarioFileError(f"Line {number}: a scenario needs a prompt or a list of messages")
+            if not isinstance(raw.get("expect") or {}, dict):
+                raise ScenarioFileError(f"Line {number}: expect must be an object")
+            scenarios.append(
+                Scenario(
+                    id=str(raw.get("id") or f"line-{number}"),
+                    messages=messages,
+                    expect=raw.get("expect") or {},
+                    scopes=raw.get("scopes"),
+                    tenant=raw.get("tenant"),
+                )
+            )
+    return scenarios
+
+
+def check_answer(expect: Dict[str, Any], answer: str, tools_called: List[str]) -> List[str]:
+    """One line per ``expect`` check the answer or the tool calls fail"""
+    failures = []
+    lowered = answer.lower()
+    for text in expect.get("contains", []):
+        if text.lower() not in lowered:
+            failures.append(f"answer does not contain {text!r}")
+    for text in expect.get("excludes", []):
+        if text.lower() in lowered:
+            failures.append(f"answer contains {text!r}")
+    if expect.get("matches") and not re.search(expect["matches"], answer):
+        failures.append(f"answer does not match /{expect['matches']}/")
+    for tool in expect.get("tools", []):
+        if tool not in tools_called:
+            failures.append(f"tool {tool!r} was not called")
+    return failures
+
+
+def run_scenario(
+    scenario: Scenario,
+    make_loop: Callable[[Dict[str, str], List[str]], AgentLoop],
+    catalog: ToolCatalogCache,
+    base_url: str,
+    headers: Dict[str, str],
+    scopes: str,
+    tracer: Tracer,
+) -> ScenarioResult:
+    """Send a scenario's messages in order through a fresh conversation"""
+    scope_list = [s.strip() for s in re.split(r"[,\n]", scenario.scopes or scopes) if s.strip()]
+    headers = {**headers, "x-scopes": ",".join(scope_list)}
+    if scenario.tenant:
+        headers["x-tenant-id"] = scenario.tenant
+    result = ScenarioResult(scenario.id, ok=False, wall_ms=0.0)
+    tools_called: List[str] = []
+    started = time.perf_counter()
+    try:
+        tools = catalog.get(base_url, headers)[0].tools
+        loop = make_loop(headers, scope_list)
+        context = ConversationContext(CONTEXT_TOKENS, tool_result_tokens=TOOL_RESULT_TOKENS)
+        for message in scenario.messages:
+            with tracer.trace("agent.turn", model=loop.model, scenario=scenario.id):
+                turn = loop.run(context, message, tools)
+            result.llm_calls += turn.iterations
+            result.tool_calls += turn.tool_calls
+            result.prompt_tokens += turn.prompt_tokens
+            result.completion_tokens += turn.completion_tokens
+            result.speculation_saved_ms += turn.speculation_saved_ms
+            tools_called.extend(turn.tools_called)
+            result.answer = split_thinking_and_reply(turn.answer)["reply"]
+        result.failed_checks = check_answer(scenario.expect, result.answer, tools_called)
+        result.ok = not result.failed_checks
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.wall_ms = (time.perf_counter() - started) * 1000
+    return result
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def totals(results: List[ScenarioResult], elapsed_ms: float) -> Dict[str, Any]:
+    walls = [r.wall_ms for r in results]
+    return {
+        "scenarios": len(results),
+        "passed": sum(r.ok for r in results),
+        "failed": sum(not r.ok and r.error is None for r in results),
+        "errors": sum(r.error is not None for r in results),
+        "elapsed_ms": round(elapsed_ms, 1),
+        "scenarios_per_s": round(len(results) / (elapsed_ms / 1000), 2) if elapsed_ms else 0.0,
+        "wall_p50_ms": round(statistics.median(walls), 1) if walls else 0.0,
+        "wall_p95_ms": round(_percentile(walls, 0.95), 1),
+        "wall_max_ms": round(max(walls), 1) if walls else 0.0,
+        "llm_calls": sum(r.llm_calls for r in results),
+        "tool_calls": sum(r.tool_calls for r in results),
+        "prompt_tokens": sum(r.prompt_tokens for r in results),
+        "completion_tokens": sum(r.completion_tokens for r in results),
+        "speculation_saved_ms": round(sum(r.speculation_saved_ms for r in results), 1),
+    }
+
+
+def _print_row(result: ScenarioResult) -> None:
+    status = "ok" if result.ok else ("ERROR" if result.error else "FAIL")
+    print(
+        f"  {result.id:<28} {status:<5} {result.wall_ms:9.1f} ms  llm {result.llm_calls:2d}  "
+        f"tools {result.tool_calls:2d}  tokens {result.prompt_tokens + result.completion_tokens:6d}",
+        file=sys.stderr,
+    )
+    for problem in result.failed_checks + ([result.error] if result.error else []):
+        print(f"      {problem}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run agent prompt scenarios headlessly and report their cost")
+    parser.add_argument("scenarios", help="JSONL scenario file")
+    parser.add_argument("--concurrency", type=int, default=4, help="Scenarios run at once")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each scenario")
+    parser.add_argument("--gateway", default=os.getenv("MCP_GATEWAY_URL", "http://localhost:8787"))
+    parser.add_argument("--scopes", default=DEFAULT_SCOPES, help="x-scopes unless a scenario sets its own")
+    parser.add_argument("--tenant", default="", help="x-tenant-id")
+    parser.add_argument("--actor", default="", help="x-actor-id")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--temperature", type=float, default=0)
+    parser.add_argument("--tool-mode", choices=TOOL_MODES, default=os.getenv("MCP_AGENT_TOOL_MODE", "native"))
+    parser.add_argument("--transport", choices=TRANSPORTS, default=os.getenv("MCP_AGENT_TOOL_TRANSPORT", "rest"))
+    parser.add_argument("--top-k", type=int, default=int(os.getenv("MCP_AGENT_TOOL_TOP_K", DEFAULT_TOP_K)), help="Tools offered per message (0 = all)")
+    parser.add_argument("--max-iterations", type=int, default=DEFAULT_MAX_ITERATIONS)
+    parser.add_argument(
+        "--tool-concurrency", type=int, default=int(os.getenv("MCP_AGENT_TOOL_CONCURRENCY", DEFAULT_TOOL_CONCURRENCY))
+    )
+    parser.add_argument("--speculative-tools", default=os.getenv("MCP_AGENT_SPECULATIVE_TOOLS", "sum,normalize-text"), help="Tools started while streaming ('' for none)")
+    parser.add_argument("--result-cache", action="store_true", help="Memoize results like the app (MCP_TOOL_CACHE_RULES)")
+    parser.add_argument("--no-validate", action="store_true", help="Skip client-side argument validation")
+    parser.add_argument("--mock-gateway", action="store_true", help="Start bench.mock_gateway in-process")
+    parser.add_argument("--mock-latency-ms", type=float, default=0.0)
+    parser.add_argument("--fake-llm", action="store_true", help="Answer with bench.fake_llm instead of Groq")
+    parser.add_argument("--fake-tool-calls", type=int, default=1, help="Fake model: tool calls per model call")
+    parser.add_argument("--fake-token-delay-ms", type=float, default=0.0, help="Fake model: delay per token")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        scenarios = load_scenarios(args.scenarios) * max(1, args.repeat)
+    except (OSError, ScenarioFileError) as e:
+        print(f"Cannot read scenarios: {e}", file=sys.stderr)
+        return 2
+
+    if args.fake_llm:
+        install_fake_llm(tool_calls_per_turn=args.fake_tool_calls, token_delay_ms=args.fake_token_delay_ms)
+    stack = import_agent_stack()
+    if not stack.available:
+        print(f"LangChain packages not installed: {stack.error}", file=sys.stderr)
+        return 2
+    cassette = Cassette.from_env()
+    api_key = os.getenv("GROQ_API_KEY", "")
+    if not api_key and (args.fake_llm or (cassette is not None and cassette.replaying)):
+        api_key = "offline"
+    if not api_key:
+        print("Set GROQ_API_KEY, or run with --fake-llm", file=sys.stderr)
+        return 2
+
+    def make_chat_model(key: str, model: str, temperature: float) -> Any:
+        if cassette is not None and cassette.replaying:
+            return cassette.chat_model(None, model)
+        llm = stack.chat_model(groq_api_key=key, model_name=model, temperature=temperature)
+        return llm if cassette is None else cassette.chat_model(llm, model)
+
+    with ExitStack() as resources:
+        base_url = args.gateway.rstrip("/")
+        if args.mock_gateway:
+            mock = resources.enter_context(MockGateway(config=MockGatewayConfig(latency_ms=args.mock_latency_ms)))
+            base_url = mock.base_url
+        elif base_url.endswith("/mcp"):
+            base_url = base_url[:-4]
+
+        client = GatewayClient.from_env(cassette=cassette, flow=FlowControl.from_env())
+        resources.callback(client.close)
+        executor = make_tool_executor(int(os.getenv("MCP_AGENT_TOOL_POOL_SIZE", "32")))
+        resources.callback(executor.shutdown)
+        engine = AgentEngine(make_chat_model)
+        catalog = ToolCatalogCache(client)
+        validator_cache = None if args.no_validate else ValidatorCache()
+        result_cache = None
+        if args.result_cache:
+            result_cache = ToolResultCache(
+                rules=parse_cache_rules(os.getenv("MCP_TOOL_CACHE_RULES", "sum=3600,normalize-text=3600")),
+                max_entry_bytes=int(os.getenv("MCP_TOOL_CACHE_MAX_ENTRY_BYTES", "65536")),
+            )
+        tracer = Tracer.from_env()
+        headers = {"Content-Type": "application/json"}
+        if args.tenant:
+            headers["x-tenant-id"] = args.tenant
+        if args.actor:
+            headers["x-actor-id"] = args.actor
+
+        def make_loop(scenario_headers: Dict[str, str], scopes: List[str]) -> AgentLoop:
+            return AgentLoop(
+                engine,
+                stack.message_types,
+                api_key,
+                client,
+                base_url,
+                scenario_headers,
+                scopes,
+                executor=executor,
+                result_cache=result_cache,
+                validator_cache=validator_cache,
+                model=args.model,
+                temperature=args.temperature,
+                tool_mode=args.tool_mode,
+                transport=args.transport,
+                top_k=args.top_k,
+                max_iterations=args.max_iterations,
+                tool_concurrency=args.tool_concurrency,
+                speculative_tools=parse_hedge_tools(args.speculative_tools),
+            )
+
+        print(f"{len(scenarios)} scenarios against {base_url}, {args.concurrency} at a time:", file=sys.stderr)
+        started = time.perf_counter()
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="agent-eval") as pool:
+            futures = [
+                pool.submit(run_scenario, s, make_loop, catalog, base_url, headers, args.scopes, tracer)
+                for s in scenarios
+            ]
+            for future in futures:
+                results.append(future.result())
+                _print_row(results[-1])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+    summary = totals(results, elapsed_ms)
+    print(
+        f"  {summary['passed']}/{summary['scenarios']} passed in {summary['elapsed_ms']:.0f} ms "
+        f"(p50 {summary['wall_p50_ms']:.0f} ms, p95 {summary['wall_p95_ms']:.0f} ms), "
+        f"{summary['llm_calls']} LLM calls, {summary['tool_calls']} tool calls, "
+        f"{summary['prompt_tokens'] + summary['completion_tokens']} tokens",
+        file=sys.stderr,
+    )
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "gateway": base_url,
+            "model": "fake" if args.fake_llm else args.model,
+            "tool_mode": args.tool_mode,
+            "transport": args.transport,
+            "concurrency": args.concurrency,
+            "repeat": args.repeat,
+        },
+        "totals": summary,
+        "scenarios": [asdict(r) for r in results],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0 if summary["passed"] == summary["scenarios"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Deterministic stand-in for ``ChatGroq``.
+
+The fake follows the app's text protocol: until the conversation contains a
+tool result it answers with a ``<think>`` block and ``TOOL_CALL:`` lines,
+then with a final natural-language answer. After ``bind_tools`` it answers
+with native ``tool_call_chunks`` instead (split mid-arguments, as providers
+stream them) and counts tool messages as results. Output size and token
+pacing are configurable so streaming and prompt-handling paths can be
+benchmarked; ``trailing_chars`` of text after the tool calls keep the stream
+going once they are written, as when tools are speculated.
+
+``install_fake_llm()`` swaps it in for ``langchain_groq.ChatGroq`` (and
+provides a minimal ``langchain_core.messages`` when LangChain is not
+installed), so ``app.py`` picks it up without changes.
+"""
+
+import copy
+import json
+import sys
+import time
+import types
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Iterator
+
+
+try:
+    from langchain_core.messages import AIMessage, AIMessageChunk
+except Exception:  # LangChain not installed: minimal message types
+
+    @dataclass
+    class AIMessage:
+        content: str = ""
+        tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+        invalid_tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+
+    @dataclass
+    class AIMessageChunk:
+        content: str = ""
+        tool_call_chunks: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _content(message: Any) -> str:
+    content = getattr(message, "content", message)
+    return content if isinstance(content, str) else str(content)
+
+
+class FakeChatModel:
+    """Scripted chat model with ChatGroq's ``invoke``/``stream`` surface."""
+
+    def __init__(
+        self,
+        tool_calls_per_turn: int = 1,
+        tool_turns: int = 1,
+        think_chars: int = 200,
+        answer_chars: int = 200,
+        token_chars: int = 4,
+        token_delay_ms: float = 0.0,
+        trailing_chars: int = 0,
+        **_: Any,  # accepts ChatGroq's constructor arguments
+    ):
+        self.tool_calls_per_turn = tool_calls_per_turn
+        self.tool_turns = tool_turns
+        self.think_chars = think_chars
+        self.answer_chars = answer_chars
+        self.token_chars = max(1, token_chars)
+        self.token_delay_ms = token_delay_ms
+        self.trailing_chars = trailing_chars
+        self.calls = 0
+        self.prompt_chars: List[int] = []
+        self.bound_tools: List[Dict[str, Any]] = []
+
+    def bind_tools(self, tools: List[Dict[str, Any]], **_: Any) -> "FakeChatModel":
+        """A copy that answers with native tool calls (the counters stay shared)"""
+        bound = copy.copy(self)
+        bound.bound_tools = list(tools)
+        return bound
+
+    def _respond(self, messages: List[Any]) -> Any:
+        """``(text, [(name, args), ...])`` for the next reply"""
+        self.calls += 1
+        self.prompt_chars.append(sum(len(_content(m)) for m in messages))
+        results = sum(
+            1 for m in messages if getattr(m, "tool_call_id", None) or _content(m).startswith("Tool result")
+        )
+        tool_rounds = results // max(1, self.tool_calls_per_turn)
+
+        thinking = "<think>" + ("Let me reason about this. " * (self.think_chars // 25 + 1))[: self.think_chars] + "</think>\n"
+        if tool_rounds < self.tool_turns and self.tool_calls_per_turn > 0:
+            calls = [("sum", {"a": tool_rounds, "b": i}) for i in range(self.tool_calls_per_turn)]
+            if self.bound_tools:
+                return thinking, calls
+            lines = [f"TOOL_CALL: {name} {json.dumps(args)}" for name, args in calls]
+            if self.trailing_chars:
+                lines.append(("Waiting for the tool results. " * (self.trailing_chars // 30 + 1))[: self.trailing_chars])
+            return thinking + "\n".join(lines), []
+        answer = ("Here is the answer based on the tool results. " * (self.answer_chars // 46 + 1))[: self.answer_chars]
+        return thinking + answer, []
+
+    def invoke(self, messages: List[Any], **_: Any) -> AIMessage:
+        text, calls = self._respond(messages)
+        if self.token_delay_ms:
+            time.sleep(self.token_delay_ms * len(text) / self.token_chars / 1000.0)
+        return AIMessage(
+            content=text,
+            tool_calls=[
+                {"name": name, "args": args, "id": f"call_{self.calls}_{i}", "type": "tool_call"}
+                for i, (name, args) in enumerate(calls)
+            ],
+        )
+
+    def stream(self, messages: List[Any], **_: Any) -> Iterator[AIMessageChunk]:
+        text, calls = self._respond(messages)
+        for i in range(0, len(text), self.token_chars):
+            if self.token_delay_ms:
+                time.sleep(self.token_delay_ms / 1000.0)
+            yield AIMessageChunk(content=text[i:i + self.token_chars])
+        for index, (name, args) in enumerate(calls):
+            raw = json.dumps(args)
+            head, tail = raw[: len(raw) // 2], raw[len(raw) // 2:]
+            call_id = f"call_{self.calls}_{index}"
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": name, "args": head, "id": call_id, "index": index, "type": "tool_call_chunk"}],
+            )
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": None, "args": tail, "id": None, "index": index, "type": "tool_call_chunk"}],
+            )
+        if calls and self.trailing_chars:
+            trailing = ("Waiting for the tool results. " * (self.trailing_chars // 30 + 1))[: self.trailing_chars]
+            for i in range(0, len(trailing), self.token_chars):
+                if self.token_delay_ms:
+                    time.sleep(self.token_delay_ms / 1000.0)
+                yield AIMessageChunk(content=trailing[i:i + self.token_chars])
+
+
+def install_fake_llm(**defaults: Any) -> None:
+    """Make ``from langchain_groq import ChatGroq`` return FakeChatModel"""
+
+    def ChatGroq(**kwargs: Any) -> FakeChatModel:
+        return FakeChatModel(**{**kwargs, **defaults})
+
+    groq = types.ModuleType("langchain_groq")
+    groq.ChatGroq = ChatGroq
+    sys.modules["langchain_groq"] = groq
+
+    try:
+        import langchain_core.messages  # noqa: F401
+    except Exception:
+        @dataclass
+        class HumanMessage:
+            content: str = ""
+
+        @dataclass
+        class SystemMessage:
+            content: str = ""
+
+        @dataclass
+        class ToolMessage:
+            content: str = ""
+            tool_call_id: str = ""
+
+        core = types.ModuleType("langchain_core")
+        messages = types.ModuleType("langchain_core.messages")
+        messages.HumanMessage = HumanMessage
+        messages.SystemMessage = SystemMessage
+        messages.AIMessage = AIMessage
+        messages.AIMessageChunk = AIMessageChunk
+        messages.ToolMessage = ToolMessage
+        core.messages = messages
+        sys.modules["langchain_core"] = core
+        sys.modules["langchain_core.messages"] = messages
+
@@ -0,0 +1,199 @@
+"""Drive a real ``streamlit run`` server over its websocket.
+
+AppTest always re-executes the whole script, so it cannot see what
+``st.fragment`` saves. This module starts ``app.py`` in a Streamlit server
+subprocess (with bench.fake_llm installed by default), speaks the browser's protobuf
+websocket protocol and times each rerun from the moment the widget change is
+sent until the server reports the script (or fragment) run finished.
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SERVER_BOOT = (
+    "import sys; sys.path.insert(0, {app_dir!r});"
+    "{fake_llm}"
+    "from streamlit.web.cli import main; sys.argv = ['streamlit', 'run', 'app.py'] + sys.argv[1:]; main()"
+)
+_FAKE_LLM = "from bench.fake_llm import install_fake_llm; install_fake_llm();"
+
+_FINISHED = {
+    ForwardMsg.FINISHED_SUCCESSFULLY,
+    ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+}
+
+
+@dataclass
+class Widget:
+    kind: str
+    id: str
+    label: str
+    fragment_id: str
+
+
+@dataclass
+class RunResult:
+    elapsed_ms: float
+    deltas: int
+    widgets: List[Widget] = field(default_factory=list)
+    fragment_run: bool = False
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LiveApp:
+    """One Streamlit server process and one browser-like session."""
+
+    def __init__(self, env: Optional[Dict[str, str]] = None, port: Optional[int] = None, fake_llm: bool = True):
+        self.port = port or _free_port()
+        # Startup benchmarks pass False: the fake imports langchain_core before the app does
+        self.fake_llm = fake_llm
+        self.env = {**os.environ, **(env or {})}
+        self.process: Optional[subprocess.Popen] = None
+        self.loop = asyncio.new_event_loop()
+        self.conn = None
+        self.main_script_hash = ""
+        self.widgets: Dict[str, Widget] = {}
+        self.values: Dict[str, WidgetState] = {}
+        self.startup_ms = 0.0
+
+    def start(self, timeout: float = 60) -> "LiveApp":
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                _SERVER_BOOT.format(app_dir=APP_DIR, fake_llm=_FAKE_LLM if self.fake_llm else ""),
+                "--server.headless", "true",
+                "--server.port", str(self.port),
+                "--server.fileWatcherType", "none",
+                "--browser.gatherUsageStats", "false",
+            ],
+            cwd=APP_DIR,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.05)
+        else:
+            self.stop()
+            raise RuntimeError("Streamlit server did not start")
+        self.startup_ms = (time.perf_counter() - started) * 1000
+        self.conn = self.loop.run_until_complete(self._connect())
+        return self
+
+    async def _connect(self):
+        return await websocket_connect(f"ws://127.0.0.1:{self.port}/_stcore/stream", max_message_size=1 << 30)
+
+    def stop(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+            self.process = None
+
+    def __enter__(self) -> "LiveApp":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+        self.loop.close()
+
+    # ------------------------------------------------------------------
+    # Reruns
+    # ------------------------------------------------------------------
+
+    async def _rerun(self, states: List[WidgetState], fragment_id: str) -> RunResult:
+        msg = BackMsg()
+        rerun = msg.rerun_script
+        rerun.query_string = ""
+        rerun.page_script_hash = self.main_script_hash
+        rerun.fragment_id = fragment_id
+        rerun.widget_states.widgets.extend(states)
+
+        started = time.perf_counter()
+        await self.conn.write_message(msg.SerializeToString(), binary=True)
+        deltas = 0
+        widgets: List[Widget] = []
+        while True:
+            raw = await self.conn.read_message()
+            if raw is None:
+                raise RuntimeError("Streamlit server closed the connection")
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                self.main_script_hash = forward.new_session.main_script_hash
+            elif kind == "delta":
+                deltas += 1
+                element = forward.delta.new_element if forward.delta.HasField("new_element") else None
+                if element is not None:
+                    etype = element.WhichOneof("type")
+                    proto = getattr(element, etype, None) if etype else None
+                    if proto is not None and hasattr(proto, "id") and hasattr(proto, "label") and proto.id:
+                        widgets.append(Widget(etype, proto.id, proto.label, forward.delta.fragment_id))
+            elif kind == "script_finished" and forward.script_finished in _FINISHED:
+                elapsed = (time.perf_counter() - started) * 1000
+                for widget in widgets:
+                    self.widgets[widget.id] = widget
+                return RunResult(
+                    elapsed,
+                    deltas,
+                    widgets,
+                    forward.script_finished == ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+                )
+
+    def run(self, *triggers: WidgetState, fragment_id: str = "") -> RunResult:
+        """Rerun with every value set so far plus ``triggers`` (as a browser does)"""
+        states = list(self.values.values()) + list(triggers)
+        return self.loop.run_until_complete(self._rerun(states, fragment_id))
+
+    def find(self, label: str, kind: Optional[str] = None) -> Widget:
+        """The most recently rendered widget with this label"""
+        for widget in reversed(list(self.widgets.values())):
+            if widget.label == label and (kind is None or widget.kind == kind):
+                return widget
+        raise KeyError(label)
+
+    # ------------------------------------------------------------------
+    # Interactions, as the browser sends them
+    # ------------------------------------------------------------------
+
+    def click(self, label: str) -> RunResult:
+        widget = self.find(label, "button")
+        return self.run(WidgetState(id=widget.id, trigger_value=True), fragment_id=widget.fragment_id)
+
+    def set_text(self, label: str, value: str, rerun: bool = True) -> Optional[RunResult]:
+        """Type into a text widget; ``rerun=False`` for widgets inside a form"""
+        widget = self.find(label)
+        self.values[widget.id] = WidgetState(id=widget.id, string_value=value)
+        if not rerun:
+            return None
+        return self.run(fragment_id=widget.fragment_id)
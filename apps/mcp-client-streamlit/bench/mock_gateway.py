@@ -0,0 +1,367 @@
+"""Local stand-in for the MCP Gateway Worker.
+
+Implements the endpoints the client uses — ``GET /tools``,
+``POST /tools/:name/call``, ``POST /mcp`` (``tools/list`` / ``tools/call``)
+and ``GET /health`` — with the same response shapes and scope checks as
+``apps/mcp-gateway-worker``, plus knobs for latency, payload size and catalog
+size so client code paths can be measured offline.
+
+Run standalone:
+
+    python -m bench.mock_gateway --port 8000 --latency-ms 20 --extra-tools 100
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple
+
+
+# Same registry as apps/mcp-gateway-worker/src/registry.ts
+BASE_TOOLS: List[Dict[str, Any]] = [
+    {
+        "name": "hello",
+        "description": "Generates a greeting message. Accepts an optional name parameter.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "description": "Name to greet (optional, defaults to 'World')"},
+            },
+        },
+        "requiredScopes": ["read:greetings"],
+        "domain": "A",
+    },
+    {
+        "name": "list-top-customers",
+        "description": "Returns top customers by spending. Requires customer read scope.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Number of customers to return (1-50, default 5)",
+                    "minimum": 1,
+                    "maximum": 50,
+                },
+            },
+        },
+        "requiredScopes": ["customers:read"],
+        "domain": "A",
+    },
+    {
+        "name": "sum",
+        "description": "Calculates the sum of two numbers.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "a": {"type": "number", "description": "First number"},
+                "b": {"type": "number", "description": "Second number"},
+            },
+            "required": ["a", "b"],
+        },
+        "requiredScopes": ["math:execute"],
+        "domain": "B",
+    },
+    {
+        "name": "normalize-text",
+        "description": "Normalizes text to lower, upper, or title case.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {"type": "string", "description": "Text to normalize"},
+                "mode": {"type": "string", "enum": ["lower", "upper", "title"], "description": "Normalization mode"},
+            },
+            "required": ["text", "mode"],
+        },
+        "requiredScopes": ["text:transform"],
+        "domain": "B",
+    },
+]
+
+CUSTOMERS = [
+    {"id": "cust_001", "name": "Acme Corp", "total_spent": 125000},
+    {"id": "cust_002", "name": "TechStart Inc", "total_spent": 87500},
+    {"id": "cust_003", "name": "Global Solutions", "total_spent": 234000},
+    {"id": "cust_004", "name": "CloudFirst Ltd", "total_spent": 156000},
+    {"id": "cust_005", "name": "DataPro Systems", "total_spent": 198500},
+    {"id": "cust_006", "name": "NextGen AI", "total_spent": 267000},
+]
+
+
+def synthetic_tool(index: int) -> Dict[str, Any]:
+    """A filler tool that echoes its input, for catalog-size experiments"""
+    return {
+        "name": f"echo-{index:04d}",
+        "description": f"Echoes its input back (synthetic tool #{index} for benchmarking).",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "value": {"type": "string", "description": "Value to echo"},
+                "repeat": {"type": "integer", "description": "Times to repeat", "minimum": 1, "maximum": 10},
+            },
+            "required": ["value"],
+        },
+        "requiredScopes": ["bench:echo"],
+        "domain": "A" if index % 2 else "B",
+    }
+
+
+@dataclass
+class MockGatewayConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    payload_bytes: int = 0  # padding added to every successful tool result
+    extra_tools: int = 0
+    etag: bool = False  # send ETag on /tools and honor If-None-Match
+    error_rate: float = 0.0  # fraction of tool calls answered with UPSTREAM_ERROR
+    rpc_batch: bool = True  # False: answer /mcp arrays like the real worker (one bad request)
+
+
+def run_tool(name: str, args: Dict[str, Any]) -> Tuple[bool, Any]:
+    """Execute a tool locally; returns (ok, data-or-error-message)"""
+    try:
+        if name == "hello":
+            return True, {"message": f"Hello, {args.get('name') or 'World'}! Welcome to Domain A."}
+        if name == "list-top-customers":
+            limit = int(args.get("limit", 5))
+            if not 1 <= limit <= 50:
+                return False, "limit must be between 1 and 50"
+            return True, CUSTOMERS[:limit]
+        if name == "sum":
+            a, b = args["a"], args["b"]
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (a, b)):
+                return False, "a and b must be numbers"
+            return True, {"result": a + b, "a": a, "b": b}
+        if name == "normalize-text":
+            text, mode = args["text"], args["mode"]
+            fn = {"lower": str.lower, "upper": str.upper, "title": str.title}.get(mode)
+            if fn is None:
+                return False, f"invalid mode '{mode}'"
+            return True, {"original": text, "normalized": fn(text), "mode": mode}
+        if name.startswith("echo-"):
+            return True, {"echo": [args.get("value")] * int(args.get("repeat", 1))}
+    except (KeyError, TypeError, ValueError) as e:
+        return False, f"Invalid input: {e}"
+    return False, f"Tool '{name}' not found"
+
+
+class MockGateway:
+    """A ThreadingHTTPServer serving the gateway API on a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[MockGatewayConfig] = None):
+        self.config = config or MockGatewayConfig()
+        self.tools = BASE_TOOLS + [synthetic_tool(i) for i in range(self.config.extra_tools)]
+        self._by_name = {t["name"]: t for t in self.tools}
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockGateway":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-gateway", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockGateway":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Gateway behaviour
+    # ------------------------------------------------------------------
+
+    def _sleep(self) -> None:
+        delay = self.config.latency_ms + random.uniform(0, self.config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _call(self, name: str, args: Dict[str, Any], scopes: List[str]) -> Tuple[int, Dict[str, Any]]:
+        """Shared tools/call logic; returns (http_status, REST-style body)"""
+        tool = self._by_name.get(name)
+        if tool is None:
+            return 404, {"ok": False, "error": {"code": "TOOL_NOT_FOUND", "message": f"Tool '{name}' not found"}}
+        if not all(s in scopes for s in tool["requiredScopes"]):
+            return 403, {
+                "ok": False,
+                "error": {
+                    "code": "SCOPE_MISSING",
+                    "message": f"Missing required scopes: {', '.join(tool['requiredScopes'])}",
+                    "required": tool["requiredScopes"],
+                    "provided": scopes,
+                },
+            }
+        if self.config.error_rate and random.random() < self.config.error_rate:
+            return 200, {"ok": False, "error": {"code": "UPSTREAM_ERROR", "message": "Remote tool endpoint returned 500"}}
+        ok, data = run_tool(name, args)
+        if not ok:
+            return 200, {"ok": False, "error": {"code": "UPSTREAM_ERROR", "message": data}}
+        if self.config.payload_bytes:
+            data = {"result": data, "padding": "x" * self.config.payload_bytes}
+        return 200, {"ok": True, "data": data}
+
+    def _rpc(self, message: Dict[str, Any], scopes: List[str]) -> Tuple[int, Dict[str, Any]]:
+        """Handle one JSON-RPC message; returns (http_status, response)"""
+        method = message.get("method")
+        msg_id = message.get("id")
+        jsonrpc = message.get("jsonrpc", "2.0")
+        params = message.get("params") or {}
+
+        if method == "tools/list":
+            tools = [{"name": t["name"], "description": t["description"], "inputSchema": t["inputSchema"]} for t in self.tools]
+            return 200, {"jsonrpc": jsonrpc, "id": msg_id, "result": {"tools": tools}}
+
+        if method == "tools/call":
+            status, body = self._call(params.get("name"), params.get("arguments") or {}, scopes)
+            if body["ok"]:
+                return 200, {
+                    "jsonrpc": jsonrpc,
+                    "id": msg_id,
+                    "result": {"content": [{"type": "text", "text": json.dumps(body["data"], indent=2)}]},
+                }
+            error = body["error"]
+            rpc_code = {404: -32601, 403: -32602}.get(status, -32603)
+            return status, {
+                "jsonrpc": jsonrpc,
+                "id": msg_id,
+                "error": {"code": rpc_code, "message": error["message"], "data": {"code": error["code"]}},
+            }
+
+        return 200, {"jsonrpc": jsonrpc, "id": msg_id, "error": {"code": -32601, "message": f"Unknown method: {method}"}}
+
+    def _catalog(self) -> Tuple[bytes, str]:
+        tools = [
+            {k: t[k] for k in ("name", "description", "requiredScopes", "domain")} for t in self.tools
+        ]
+        body = json.dumps({"ok": True, "data": {"tools": tools, "count": len(tools)}}).encode()
+        return body, '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    def _handler_class(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _scopes(self) -> List[str]:
+                raw = self.headers.get("x-scopes", "")
+                return [s.strip() for s in raw.split(",") if s.strip()]
+
+            def _send(self, status: int, body: Any, extra_headers: Optional[Dict[str, str]] = None) -> None:
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (extra_headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> Any:
+                length = int(self.headers.get("Content-Length", 0) or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    return json.loads(raw) if raw else {}
+                except json.JSONDecodeError:
+                    return {}
+
+            def do_GET(self):
+                with gateway._count_lock:
+                    gateway.request_count += 1
+                gateway._sleep()
+                if self.path == "/tools":
+                    body, etag = gateway._catalog()
+                    if gateway.config.etag:
+                        if self.headers.get("If-None-Match") == etag:
+                            self.send_response(304)
+                            self.send_header("ETag", etag)
+                            self.send_header("Content-Length", "0")
+                            self.end_headers()
+                            return
+                        self._send(200, body, {"ETag": etag})
+                    else:
+                        self._send(200, body)
+                elif self.path == "/health":
+                    self._send(200, {"status": "ok", "service": "MCP Gateway", "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
+                elif self.path == "/mcp":
+                    self._send(200, {"endpoint": "/mcp", "method": "POST", "protocol": "JSON-RPC 2.0", "methods": ["tools/list", "tools/call"]})
+                else:
+                    self._send(404, {"error": "Not found"})
+
+            def do_POST(self):
+                with gateway._count_lock:
+                    gateway.request_count += 1
+                gateway._sleep()
+                body = self._body()
+                if self.path == "/mcp":
+                    if isinstance(body, list) and gateway.config.rpc_batch:
+                        responses = [gateway._rpc(m, self._scopes())[1] for m in body if isinstance(m, dict)]
+                        self._send(200, responses)
+                    else:
+                        status, response = gateway._rpc(body if isinstance(body, dict) else {}, self._scopes())
+                        self._send(status, response)
+                    return
+                parts = self.path.strip("/").split("/")
+                if len(parts) == 3 and parts[0] == "tools" and parts[2] == "call":
+                    args = body.get("arguments") or body.get("input") or {}
+                    status, response = gateway._call(parts[1], args, self._scopes())
+                    if response.get("ok"):
+                        response["context"] = {"request_id": f"{int(time.time() * 1000)}-mock"}
+                    self._send(status, response)
+                    return
+                self._send(404, {"error": "Not found"})
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local stand-in MCP gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--payload-bytes", type=int, default=0)
+    parser.add_argument("--extra-tools", type=int, default=0)
+    parser.add_argument("--etag", action="store_true")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-rpc-batch", action="store_true", help="Reject JSON-RPC batch arrays")
+    args = parser.parse_args()
+
+    config = MockGatewayConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        payload_bytes=args.payload_bytes,
+        extra_tools=args.extra_tools,
+        etag=args.etag,
+        error_rate=args.error_rate,
+        rpc_batch=not args.no_rpc_batch,
+    )
+    gateway = MockGateway(args.host, args.port, config).start()
+    print(f"Mock gateway listening on {gateway.base_url} ({len(gateway.tools)} tools)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
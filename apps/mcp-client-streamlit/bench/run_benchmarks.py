@@ -0,0 +1,462 @@
+"""Offline benchmark suite for the Streamlit client.
+
+Runs entirely against bench.mock_gateway and bench.fake_llm, so no network
+access, gateway deployment or Groq key is needed. Suites:
+
+- ``micro``: pure helpers (TOOL_CALL parsing, ``<think>`` splitting, catalog
+  JSON decoding, tool index build and per-message tool selection) across
+  input sizes
+- ``app``: full script runs through Streamlit's AppTest — cold start, rerun
+  cost versus conversation length, tool discovery versus catalog size, Call
+  Tool versus payload size and a complete agent turn (native tool calls
+  and TOOL_CALL lines), also with slow tools and speculative tool calls on
+  and off
+- ``transport``: N tool calls through REST (one request each) versus
+  JSON-RPC batches on ``/mcp``, against a gateway with added latency, with
+  and without server-side batch support
+- ``live``: a real ``streamlit run`` server driven over its websocket
+  (bench.live_app), timing what a browser interaction costs on the server:
+  typing tool arguments, calling a tool, sending an agent message and a raw
+  request, with a conversation already on screen. Unlike AppTest this sees
+  fragment-scoped reruns.
+- ``startup``: cold start in fresh processes: importing everything
+  ``app.py`` imports at module level, and spawning ``streamlit run`` until
+  the first page render has finished
+
+Usage (from apps/mcp-client-streamlit):
+
+    python -m bench.run_benchmarks --suite all --output bench-results.json
+    python -m bench.run_benchmarks --compare bench-results.json --threshold 0.25
+
+With ``--compare`` the exit status is 1 when any benchmark's median got
+slower than the baseline by more than ``--threshold``.
+"""
+
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional, Dict, Any, List, Callable
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from agent import TOOL_MODES, ThinkStreamSplitter, parse_tool_calls, split_thinking_and_reply  # noqa: E402
+from bench.fake_llm import install_fake_llm  # noqa: E402
+from batch import run_batch, run_batch_rpc  # noqa: E402
+from bench.mock_gateway import MockGateway, MockGatewayConfig, BASE_TOOLS, synthetic_tool  # noqa: E402
+from gateway_client import GatewayClient  # noqa: E402
+from mcp_transport import McpTransport  # noqa: E402
+from tool_index import DEFAULT_TOP_K, ToolIndex  # noqa: E402
+
+APP_PATH = os.path.join(APP_DIR, "app.py")
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Time ``fn`` ``repeat`` times after ``warmup`` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "repeat": repeat,
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+    }
+
+
+def result(name: str, params: Dict[str, Any], stats: Dict[str, float]) -> Dict[str, Any]:
+    row = {"name": name, "params": params, **stats}
+    print(f"  {name:<28} {json.dumps(params):<34} p50 {stats['p50_ms']:9.3f} ms", file=sys.stderr)
+    return row
+
+
+# ============================================================================
+# Micro benchmarks
+# ============================================================================
+
+
+def micro_suite(repeat: int) -> List[Dict[str, Any]]:
+    rows = []
+
+    for n in (1, 10, 100):
+        text = "Thinking out loud first.\n" + "\n".join(
+            f'TOOL_CALL: sum {{"a": {i}, "b": {i + 1}}}' for i in range(n)
+        )
+        rows.append(result("parse_tool_calls", {"lines": n}, measure(lambda: parse_tool_calls(text), repeat * 20)))
+
+    for size in (1_000, 10_000, 100_000):
+        text = "<think>" + "r" * size + "</think>" + "Final answer. " * 20
+
+        rows.append(
+            result("split_thinking_and_reply", {"think_chars": size}, measure(lambda: split_thinking_and_reply(text), repeat * 20))
+        )
+
+        chunks = [text[i:i + 4] for i in range(0, len(text), 4)]
+
+        def stream_split():
+            splitter = ThinkStreamSplitter()
+            for chunk in chunks:
+                splitter.feed(chunk)
+            splitter.finish()
+
+        rows.append(result("think_stream_splitter", {"think_chars": size, "chunk": 4}, measure(stream_split, repeat)))
+
+    for n in (4, 100, 1000):
+        tools = BASE_TOOLS + [synthetic_tool(i) for i in range(n - len(BASE_TOOLS))]
+        payload = json.dumps({"ok": True, "data": {"tools": tools, "count": len(tools)}})
+        rows.append(result("catalog_json_decode", {"tools": n}, measure(lambda: json.loads(payload), repeat * 20)))
+
+        scopes = sorted({s for t in tools for s in t["requiredScopes"]})
+        rows.append(result("tool_index_build", {"tools": n}, measure(lambda: ToolIndex(tools), repeat)))
+        index = ToolIndex(tools)
+        rows.append(
+            result(
+                "tool_index_select",
+                {"tools": n, "k": DEFAULT_TOP_K},
+                measure(lambda: index.select("add two numbers together", scopes), repeat * 20),
+            )
+        )
+
+    return rows
+
+
+# ============================================================================
+# App benchmarks (Streamlit AppTest)
+# ============================================================================
+
+
+def _app(gateway: MockGateway):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["MCP_GATEWAY_URL"] = f"{gateway.base_url}/mcp"
+    os.environ["GROQ_API_KEY"] = "bench-fake-key"
+    return AppTest.from_file(APP_PATH, default_timeout=120)
+
+
+def _history(length: int) -> List[Dict[str, str]]:
+    messages = []
+    for i in range(length // 2):
+        messages.append({"role": "user", "content": f"Please add {i} and {i + 1}"})
+        messages.append(
+            {"role": "assistant", "content": f"<think>Use the sum tool for {i}.</think>The result is {2 * i + 1}."}
+        )
+    return messages
+
+
+def app_suite(repeat: int) -> List[Dict[str, Any]]:
+    import streamlit as st
+
+    install_fake_llm()
+    st.cache_resource.clear()
+    rows = []
+
+    with MockGateway() as gateway:
+        def cold():
+            _app(gateway).run()
+
+        rows.append(result("app.first_run", {}, measure(cold, repeat)))
+
+        for length in (0, 50, 500):
+            at = _app(gateway).run()
+            at.session_state["agent_messages"] = _history(length)
+            rows.append(result("app.rerun", {"history": length}, measure(at.run, repeat)))
+
+    for n in (4, 100, 1000):
+        with MockGateway(config=MockGatewayConfig(extra_tools=n - len(BASE_TOOLS))) as gateway:
+            at = _app(gateway).run()
+            rows.append(
+                result(
+                    "app.discover_tools",
+                    {"tools": n},
+                    measure(lambda: at.button(key="fetch_tools").click().run(), repeat),
+                )
+            )
+
+    for size in (1_000, 100_000, 1_000_000):
+        with MockGateway(config=MockGatewayConfig(payload_bytes=size)) as gateway:
+            at = _app(gateway).run()
+            at.button(key="fetch_tools").click().run()
+            at.selectbox[0].select("hello").run()
+            rows.append(
+                result(
+                    "app.call_tool",
+                    {"payload_bytes": size},
+                    measure(lambda: at.button(key="call_tool").click().run(), repeat),
+                )
+            )
+
+    for calls in (1, 3):
+        install_fake_llm(tool_calls_per_turn=calls)
+        # The app caches model clients process-wide; drop them so the new fake is used
+        st.cache_resource.clear()
+        with MockGateway() as gateway:
+            for mode in TOOL_MODES:
+                at = _app(gateway).run()
+                at.radio(key="agent_tool_mode").set_value(mode).run()
+
+                def agent_turn():
+                    at.text_input(key="agent_user_input").input("add some numbers")
+                    next(b for b in at.button if b.label == "Send").click().run()
+
+                rows.append(
+                    result("app.agent_turn", {"tool_calls": calls, "mode": mode}, measure(agent_turn, repeat))
+                )
+
+    # Slow tools and a model that keeps writing after its tool calls: speculation on and off
+    install_fake_llm(tool_calls_per_turn=3, token_delay_ms=2, trailing_chars=400)
+    st.cache_resource.clear()
+    with MockGateway(config=MockGatewayConfig(latency_ms=100)) as gateway:
+        for mode in TOOL_MODES:
+            for speculative in ("sum", ""):
+                os.environ["MCP_AGENT_SPECULATIVE_TOOLS"] = speculative
+                at = _app(gateway).run()
+                at.radio(key="agent_tool_mode").set_value(mode).run()
+                next(c for c in at.checkbox if c.label == "Bypass tool result cache").check().run()
+
+                def agent_turn():
+                    at.text_input(key="agent_user_input").input("add some numbers")
+                    next(b for b in at.button if b.label == "Send").click().run()
+
+                rows.append(
+                    result(
+                        "app.agent_turn_speculative",
+                        {"mode": mode, "speculative": bool(speculative)},
+                        measure(agent_turn, repeat),
+                    )
+                )
+    os.environ.pop("MCP_AGENT_SPECULATIVE_TOOLS", None)
+
+    return rows
+
+
+# ============================================================================
+# Transport benchmarks (REST vs JSON-RPC batches)
+# ============================================================================
+
+
+def transport_suite(repeat: int) -> List[Dict[str, Any]]:
+    rows = []
+    client = GatewayClient()
+    headers = {"x-scopes": "math:execute"}
+
+    for rpc_batch in (True, False):
+        with MockGateway(config=MockGatewayConfig(latency_ms=20, rpc_batch=rpc_batch)) as gateway:
+            for n in (1, 10, 50):
+                arg_sets = [{"a": i, "b": i} for i in range(n)]
+                params = {"calls": n, "server_batch": rpc_batch}
+
+                if rpc_batch:
+                    rows.append(
+                        result(
+                            "transport.rest",
+                            {"calls": n},
+                            measure(lambda: list(run_batch(client, gateway.base_url, "sum", arg_sets, headers, concurrency=4)), repeat),
+                        )
+                    )
+                transport = McpTransport(client, gateway.base_url, headers)
+                rows.append(
+                    result(
+                        "transport.rpc_batch",
+                        params,
+                        measure(lambda: list(run_batch_rpc(transport, "sum", arg_sets, batch_size=50, concurrency=4)), repeat),
+                    )
+                )
+
+    client.close()
+    return rows
+
+
+# ============================================================================
+# Live server benchmarks (real reruns, fragments included)
+# ============================================================================
+
+
+def live_suite(repeat: int, history_turns: int = 10) -> List[Dict[str, Any]]:
+    from bench.live_app import LiveApp
+
+    rows = []
+    with MockGateway() as gateway, LiveApp(
+        {"MCP_GATEWAY_URL": f"{gateway.base_url}/mcp", "GROQ_API_KEY": "bench-fake-key"}
+    ) as app:
+        app.run()
+        app.click("📋 Fetch Tools List")
+        app.run()
+
+        def agent_send():
+            app.set_text("Ask the AI agent to do something with the tools...", "add some numbers", rerun=False)
+            return app.click("Send")
+
+        for _ in range(history_turns):
+            agent_send()
+        params = {"history_turns": history_turns}
+
+        edits = iter(range(1_000_000))
+        interactions = {
+            "live.edit_tool_args": lambda: app.set_text("Tool Arguments (JSON)", json.dumps({"name": f"n{next(edits)}"})),
+            "live.call_tool": lambda: app.click("▶️ Call Tool"),
+            "live.raw_request": lambda: app.click("Send Request"),
+            "live.agent_send": agent_send,
+        }
+        for name, interaction in interactions.items():
+            scope = "fragment" if interaction().fragment_run else "full script"
+            rows.append(result(name, params, measure(interaction, repeat)))
+            print(f"    reran: {scope}", file=sys.stderr)
+
+    return rows
+
+
+# ============================================================================
+# Startup benchmarks (fresh processes)
+# ============================================================================
+
+
+def module_level_imports(path: str) -> str:
+    """The import statements ``path`` runs at load time, as one code string"""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    statements = []
+    for node in tree.body:
+        # Count guarded imports too (``try: import x``); imports inside functions are lazy
+        for child in ast.walk(node) if isinstance(node, ast.Try) else [node]:
+            if isinstance(child, (ast.Import, ast.ImportFrom)):
+                statements.append(ast.unparse(child))
+    return "\n".join(statements)
+
+
+def _time_imports(code: str) -> float:
+    script = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {APP_DIR!r})\n"
+        "started = time.perf_counter()\n"
+        f"for statement in {code!r}.splitlines():\n"
+        "    try:\n        exec(statement)\n    except Exception:\n        pass\n"
+        "print((time.perf_counter() - started) * 1000)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", script], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _samples(values: List[float]) -> Dict[str, float]:
+    return {
+        "repeat": len(values),
+        "mean_ms": statistics.mean(values),
+        "p50_ms": statistics.median(values),
+        "min_ms": min(values),
+        "max_ms": max(values),
+    }
+
+
+def startup_suite(repeat: int) -> List[Dict[str, Any]]:
+    from bench.live_app import LiveApp
+
+    rows = []
+    code = module_level_imports(APP_PATH)
+    rows.append(result("startup.import", {}, _samples([_time_imports(code) for _ in range(repeat)])))
+
+    ready, first_render = [], []
+    with MockGateway() as gateway:
+        env = {"MCP_GATEWAY_URL": f"{gateway.base_url}/mcp", "GROQ_API_KEY": "bench-fake-key"}
+        for _ in range(repeat):
+            with LiveApp(env, fake_llm=False) as app:
+                run = app.run()
+                ready.append(app.startup_ms)
+                first_render.append(app.startup_ms + run.elapsed_ms)
+    rows.append(result("startup.server_ready", {}, _samples(ready)))
+    rows.append(result("startup.first_render", {}, _samples(first_render)))
+    return rows
+
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+
+def _key(row: Dict[str, Any]) -> str:
+    return f"{row['name']} {json.dumps(row['params'], sort_keys=True)}"
+
+
+def compare(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Return a line per benchmark whose median regressed beyond ``threshold``"""
+    previous = {_key(row): row for row in baseline}
+    regressions = []
+    for row in current:
+        old = previous.get(_key(row))
+        if not old or old["p50_ms"] <= 0:
+            continue
+        change = row["p50_ms"] / old["p50_ms"] - 1
+        if change > threshold:
+            regressions.append(f"{_key(row)}: {old['p50_ms']:.3f} -> {row['p50_ms']:.3f} ms (+{change:.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Streamlit MCP client offline")
+    parser.add_argument("--suite", choices=["micro", "app", "transport", "live", "startup", "all"], default="all")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed median slowdown (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    rows: List[Dict[str, Any]] = []
+    if args.suite in ("micro", "all"):
+        print("micro:", file=sys.stderr)
+        rows += micro_suite(args.repeat)
+    if args.suite in ("transport", "all"):
+        print("transport:", file=sys.stderr)
+        rows += transport_suite(args.repeat)
+    if args.suite in ("startup", "all"):
+        print("startup:", file=sys.stderr)
+        rows += startup_suite(args.repeat)
+    if args.suite in ("live", "all"):
+        print("live:", file=sys.stderr)
+        rows += live_suite(args.repeat)
+    if args.suite in ("app", "all"):
+        import streamlit
+
+        print("app:", file=sys.stderr)
+        rows += app_suite(args.repeat)
+    else:
+        streamlit = None
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "streamlit": getattr(streamlit, "__version__", None),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "repeat": args.repeat,
+        },
+        "results": rows,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(rows, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
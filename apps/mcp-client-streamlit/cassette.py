@@ -0,0 +1,318 @@
+"""Record and replay of gateway HTTP exchanges and LLM calls.
+
+In ``record`` mode every gateway request made through ``GatewayClient`` and
+every model call made by the agent is appended to a cassette: a JSONL file
+with one exchange per line. In ``replay`` mode the same exchanges are served
+back from the cassette without touching the network or Groq, either with the
+latency they originally had (``original``) or immediately (``zero``). A
+recorded session can then be profiled and benchmarked offline and
+deterministically.
+
+Exchanges are matched on a hash of what determines the answer: method, URL,
+the caller's ``x-*``/``Authorization`` headers and the JSON body for HTTP;
+model, bound tools and messages for the LLM. Header values are only ever
+stored hashed. JSON-RPC ids are left out of the match and the replayed
+response is rewritten to the ids of the current request, so a transport whose
+id counter started elsewhere still replays. Identical requests replay their
+recorded answers in order, and the last one repeats once they run out.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+MODES = ("record", "replay")
+LATENCIES = ("original", "zero")
+
+# Request headers that are part of the match (values are hashed)
+_HEADER_PREFIX = "x-"
+_IGNORED_HEADERS = frozenset({"x-request-id"})
+# Response headers worth keeping for replay
+_KEPT_RESPONSE_HEADERS = ("content-type", "retry-after")
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Replay found no recorded exchange for a request."""
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def _decode(body: Optional[bytes]) -> Any:
+    """Request/response body as JSON when it is JSON, else text, else None"""
+    if not body:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
+
+
+def _is_rpc(message: Any) -> bool:
+    return isinstance(message, dict) and "jsonrpc" in message
+
+
+def _without_rpc_ids(value: Any) -> Any:
+    if _is_rpc(value):
+        return {k: v for k, v in value.items() if k != "id"}
+    if isinstance(value, list) and any(_is_rpc(m) for m in value):
+        return [_without_rpc_ids(m) for m in value]
+    return value
+
+
+def _rpc_ids(value: Any) -> List[Any]:
+    messages = value if isinstance(value, list) else [value]
+    return [m.get("id") for m in messages if _is_rpc(m)]
+
+
+def _remap_rpc_ids(response: Any, recorded: Any, current: Any) -> Any:
+    """Rewrite response ids from the recorded request's ids to the current ones"""
+    mapping = dict(zip(_rpc_ids(recorded), _rpc_ids(current)))
+    if not mapping:
+        return response
+
+    def remap(message: Any) -> Any:
+        if _is_rpc(message) and message.get("id") in mapping:
+            return {**message, "id": mapping[message["id"]]}
+        return message
+
+    return [remap(m) for m in response] if isinstance(response, list) else remap(response)
+
+
+def http_key(request: requests.PreparedRequest) -> str:
+    headers = {
+        k.lower(): v
+        for k, v in request.headers.items()
+        if (k.lower().startswith(_HEADER_PREFIX) or k.lower() == "authorization")
+        and k.lower() not in _IGNORED_HEADERS
+    }
+    return _digest(["http", request.method, request.url, headers, _without_rpc_ids(_decode(request.body))])
+
+
+def _message_record(message: Any) -> Dict[str, Any]:
+    record = {"type": type(message).__name__, "content": getattr(message, "content", message)}
+    for attr in ("tool_calls", "tool_call_id"):
+        value = getattr(message, attr, None)
+        if value:
+            record[attr] = value
+    return record
+
+
+def llm_key(model: str, tools: Optional[List[Dict[str, Any]]], messages: List[Any]) -> str:
+    return _digest(["llm", model, tools or [], [_message_record(m) for m in messages]])
+
+
+class Cassette:
+    """One JSONL cassette file, recording or replaying."""
+
+    def __init__(self, path: str, mode: str = "replay", latency: str = "original"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r} (expected one of {', '.join(MODES)})")
+        if latency not in LATENCIES:
+            raise ValueError(f"Unknown cassette latency {latency!r} (expected one of {', '.join(LATENCIES)})")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], deque] = {}
+        if mode == "replay":
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """MCP_CASSETTE names the file; MCP_CASSETTE_MODE and MCP_CASSETTE_LATENCY pick the behaviour"""
+        path = os.getenv("MCP_CASSETTE", "")
+        if not path:
+            return None
+        return cls(path, os.getenv("MCP_CASSETTE_MODE", "replay"), os.getenv("MCP_CASSETTE_LATENCY", "original"))
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault((entry["kind"], entry["key"]), deque()).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            self.recorded += 1
+
+    def take(self, kind: str, key: str) -> Dict[str, Any]:
+        """Next recorded exchange for ``key``; raises CassetteMiss when there is none"""
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if not entries:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded {kind} exchange in {self.path} for this request")
+            self.replayed += 1
+            # The last answer keeps repeating once the recorded ones are used up
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def wait(self, ms: float) -> None:
+        if self.latency == "original" and ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def adapter(self, inner: BaseAdapter) -> BaseAdapter:
+        """Transport adapter that records through ``inner`` or replays from the cassette"""
+        return CassetteAdapter(self, inner)
+
+    def chat_model(self, inner: Any, model: str) -> Any:
+        """Recording wrapper around ``inner``, or a replaying model (``inner`` unused)"""
+        return CassetteChatModel(self, inner if self.mode == "record" else None, model)
+
+
+# ============================================================================
+# Gateway HTTP
+# ============================================================================
+
+
+class CassetteAdapter(BaseAdapter):
+    """Records gateway exchanges through a real adapter, or replays them."""
+
+    def __init__(self, cassette: Cassette, inner: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs: Any) -> requests.Response:
+        key = http_key(request)
+        if self.cassette.replaying:
+            return self._replay(request, key)
+
+        started = time.perf_counter()
+        resp = self.inner.send(request, stream=True, **kwargs)
+        ttfb_ms = (time.perf_counter() - started) * 1000
+        body = resp.content  # later reads (iter_content, json) are served from memory
+        entry = {
+            "kind": "http",
+            "key": key,
+            "method": request.method,
+            "url": request.url,
+            "request": _decode(request.body),
+            "status": resp.status_code,
+            "headers": {h: resp.headers[h] for h in _KEPT_RESPONSE_HEADERS if h in resp.headers},
+            "ttfb_ms": round(ttfb_ms, 3),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        try:
+            entry["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body_b64"] = base64.b64encode(body).decode("ascii")
+        self.cassette.append(entry)
+        return resp
+
+    def _replay(self, request: requests.PreparedRequest, key: str) -> requests.Response:
+        entry = self.cassette.take("http", key)
+        if "body_b64" in entry:
+            body = base64.b64decode(entry["body_b64"])
+        else:
+            body = entry.get("body", "")
+            current = _decode(request.body)
+            if _rpc_ids(current):
+                try:
+                    remapped = _remap_rpc_ids(json.loads(body), entry.get("request"), current)
+                    body = json.dumps(remapped)
+                except ValueError:
+                    pass
+            body = body.encode("utf-8")
+        self.cassette.wait(entry.get("elapsed_ms", 0))
+
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.headers = CaseInsensitiveDict(entry.get("headers", {}))
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.raw = io.BytesIO(body)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+# ============================================================================
+# LLM
+# ============================================================================
+
+
+def _chunk_record(chunk: Any) -> Dict[str, Any]:
+    record = {"content": chunk.content if isinstance(chunk.content, str) else ""}
+    tool_call_chunks = getattr(chunk, "tool_call_chunks", None)
+    if tool_call_chunks:
+        record["tool_call_chunks"] = [dict(c) for c in tool_call_chunks]
+    usage = getattr(chunk, "usage_metadata", None)
+    if usage:
+        record["usage_metadata"] = dict(usage)
+    return record
+
+
+class CassetteChatModel:
+    """Chat model stand-in that records ``stream`` calls or replays them.
+
+    Replayed chunks carry ``content``, ``tool_call_chunks`` and
+    ``usage_metadata``, which is all the agent loop reads from a chunk.
+    """
+
+    def __init__(self, cassette: Cassette, inner: Any, model: str, tools: Optional[List[Dict[str, Any]]] = None):
+        self.cassette = cassette
+        self.inner = inner
+        self.model = model
+        self.tools = tools
+
+    def bind_tools(self, tools: List[Dict[str, Any]], **kwargs: Any) -> "CassetteChatModel":
+        inner = self.inner.bind_tools(tools, **kwargs) if self.inner is not None else None
+        return CassetteChatModel(self.cassette, inner, self.model, list(tools))
+
+    def stream(self, messages: List[Any], **kwargs: Any) -> Iterator[Any]:
+        key = llm_key(self.model, self.tools, messages)
+        if self.cassette.replaying:
+            entry = self.cassette.take("llm", key)
+            elapsed = 0.0
+            for record in entry["chunks"]:
+                self.cassette.wait(record["at_ms"] - elapsed)
+                elapsed = record["at_ms"]
+                yield SimpleNamespace(
+                    content=record["content"],
+                    tool_call_chunks=record.get("tool_call_chunks", []),
+                    usage_metadata=record.get("usage_metadata"),
+                )
+            return
+
+        started = time.perf_counter()
+        chunks = []
+        for chunk in self.inner.stream(messages, **kwargs):
+            chunks.append({**_chunk_record(chunk), "at_ms": round((time.perf_counter() - started) * 1000, 3)})
+            yield chunk
+        # Only complete streams are recorded; an abandoned one would replay truncated
+        self.cassette.append(
+            {"kind": "llm", "key": key, "model": self.model, "tools": len(self.tools or []), "chunks": chunks}
+        )
@@ -0,0 +1,217 @@
+"""Process-wide cache for the gateway `/tools` catalog.
+
+Every browser session of the app asks for the same catalog, so entries are
+shared across sessions and keyed by (gateway base URL, tenant, scopes).
+
+Freshness rules for an entry of age ``a``:
+
+- ``a < ttl``: served from memory (``"hit"``)
+- ``ttl <= a < ttl + stale_ttl``: served stale immediately while one background
+  thread revalidates it (``"stale"``)
+- otherwise: fetched synchronously; concurrent callers for the same key wait
+  on a single request (``"miss"`` / ``"revalidated"``)
+
+Revalidation sends ``If-None-Match`` when the gateway returned an ETag, so a
+``304 Not Modified`` only refreshes the entry's timestamp.
+
+REST ``/tools`` does not include input schemas, so a fetched catalog is
+completed from the ``/mcp`` ``tools/list`` result. If that call fails, the
+catalog is still cached, just without schemas.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple
+
+from gateway_client import GatewayClient
+from mcp_transport import McpTransport
+
+
+DEFAULT_TTL = 60.0
+DEFAULT_STALE_TTL = 300.0
+
+CatalogKey = Tuple[str, str, Tuple[str, ...]]
+
+
+class CatalogFetchError(Exception):
+    """Raised when the gateway answers `/tools` with a non-200 status."""
+
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"Failed to fetch tools: {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+@dataclass
+class CatalogEntry:
+    """One cached `/tools` response."""
+
+    tools: List[Dict[str, Any]]
+    payload: Dict[str, Any]
+    status_code: int = 200
+    etag: Optional[str] = None
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+def normalize_scopes(scopes: Optional[str]) -> Tuple[str, ...]:
+    """Order- and whitespace-insensitive form of an x-scopes header value"""
+    if not scopes:
+        return ()
+    return tuple(sorted({s.strip() for s in scopes.replace("\n", ",").split(",") if s.strip()}))
+
+
+def catalog_key(base_url: str, headers: Optional[Dict[str, str]]) -> CatalogKey:
+    headers = headers or {}
+    return (
+        base_url.rstrip("/"),
+        headers.get("x-tenant-id", ""),
+        normalize_scopes(headers.get("x-scopes")),
+    )
+
+
+class ToolCatalogCache:
+    """TTL + stale-while-revalidate cache of `/tools` shared by all sessions."""
+
+    def __init__(
+        self,
+        client: GatewayClient,
+        ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[CatalogKey, CatalogEntry] = {}
+        self._locks: Dict[CatalogKey, threading.Lock] = {}
+        self._refreshing: set = set()
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key: CatalogKey) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def peek(self, base_url: str, headers: Optional[Dict[str, str]] = None) -> Optional[CatalogEntry]:
+        """Return the cached entry without fetching, whatever its age"""
+        return self._entries.get(catalog_key(base_url, headers))
+
+    def get(
+        self,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        force: bool = False,
+    ) -> Tuple[CatalogEntry, str]:
+        """Return ``(entry, source)`` for the catalog visible with ``headers``.
+
+        ``source`` is one of ``"hit"``, ``"stale"``, ``"miss"`` or
+        ``"revalidated"``. Raises CatalogFetchError or
+        requests.RequestException when nothing usable is cached.
+        """
+        key = catalog_key(base_url, headers)
+        entry = self._entries.get(key)
+
+        if entry is not None and not force:
+            if entry.age < self.ttl:
+                return entry, "hit"
+            if entry.age < self.ttl + self.stale_ttl:
+                self._revalidate_in_background(key, base_url, headers)
+                return entry, "stale"
+
+        with self._lock_for(key):
+            # Another session may have refreshed the entry while we waited
+            current = self._entries.get(key)
+            if current is not None and current is not entry and current.age < self.ttl:
+                return current, "hit"
+            return self._fetch(key, base_url, headers, current)
+
+    def invalidate(self, base_url: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> None:
+        """Drop one entry, every entry for a gateway, or (no args) everything"""
+        with self._guard:
+            if base_url is None:
+                self._entries.clear()
+            elif headers is not None:
+                self._entries.pop(catalog_key(base_url, headers), None)
+            else:
+                prefix = base_url.rstrip("/")
+                for key in [k for k in self._entries if k[0] == prefix]:
+                    del self._entries[key]
+
+    def _fetch(
+        self,
+        key: CatalogKey,
+        base_url: str,
+        headers: Optional[Dict[str, str]],
+        previous: Optional[CatalogEntry],
+    ) -> Tuple[CatalogEntry, str]:
+        request_headers = dict(headers or {})
+        if previous is not None and previous.etag:
+            request_headers["If-None-Match"] = previous.etag
+
+        response = self.client.list_tools(base_url, headers=request_headers)
+
+        if response.status_code == 304 and previous is not None:
+            # Unchanged: the schemas merged last time still apply, no /mcp round trip
+            previous.fetched_at = time.monotonic()
+            return previous, "revalidated"
+        if response.status_code != 200:
+            raise CatalogFetchError(response.status_code, response.text[:500])
+
+        payload = response.json()
+        listed = payload.get("data", {}).get("tools", [])
+        if previous is not None and previous.payload.get("data", {}).get("tools") == listed:
+            # Same catalog without an ETag: keep the merged list (and its identity for downstream caches)
+            tools = previous.tools
+        else:
+            tools = self._with_schemas(listed, base_url, headers)
+        entry = CatalogEntry(
+            tools=tools,
+            payload=payload,
+            status_code=response.status_code,
+            etag=response.headers.get("ETag"),
+        )
+        with self._guard:
+            self._entries[key] = entry
+        return entry, "miss"
+
+    def _with_schemas(
+        self, tools: List[Dict[str, Any]], base_url: str, headers: Optional[Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """Fill in each tool's ``inputSchema`` from ``/mcp`` tools/list"""
+        if all("inputSchema" in tool for tool in tools):
+            return tools
+        try:
+            listed = McpTransport(self.client, base_url, headers).list_tools()
+        except RuntimeError:
+            return tools
+        schemas = {tool.get("name"): tool.get("inputSchema") for tool in listed}
+        return [
+            {**tool, "inputSchema": schemas[tool.get("name")]}
+            if "inputSchema" not in tool and schemas.get(tool.get("name")) is not None
+            else tool
+            for tool in tools
+        ]
+
+    def _revalidate_in_background(
+        self, key: CatalogKey, base_url: str, headers: Optional[Dict[str, str]]
+    ) -> None:
+        with self._guard:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with self._lock_for(key):
+                    self._fetch(key, base_url, headers, self._entries.get(key))
+            except Exception:
+                # Keep serving the stale entry; the next sync fetch reports errors
+                pass
+            finally:
+                with self._guard:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name="catalog-revalidate", daemon=True).start()
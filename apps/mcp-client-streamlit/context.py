@@ -0,0 +1,240 @@
+"""Token-budgeted conversation context for the agent loop.
+
+The prompt for each model call is assembled from, in priority order:
+
+1. the system prompt
+2. the current user message
+3. this turn's scratch: model outputs and tool results so far (tool results
+   are de-duplicated and fitted to a per-result budget, JSON results by
+   summarizing their structure; the oldest entries are elided first when
+   over budget). Native tool calls keep their ids, so each tool message still
+   answers the call that asked for it after elision.
+4. earlier turns, newest first, as user/assistant pairs with ``<think>``
+   content removed
+5. a running extractive summary of turns that were compacted out of history
+
+Token counts are estimated (about four characters per token), which is close
+enough for budgeting without pulling in a tokenizer.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+
+from agent import ToolCall, split_thinking_and_reply, strip_tool_calls, tool_call_message_kwargs
+
+
+DEFAULT_BUDGET_TOKENS = 6000
+DEFAULT_TOOL_RESULT_TOKENS = 800
+DEFAULT_SUMMARY_TOKENS = 400
+CHARS_PER_TOKEN = 4
+
+# (role, content, extra message fields); role is system/user/assistant/tool,
+# extras are tool_calls on a native assistant message or tool_call_id on a tool result
+Message = Tuple[str, str, Dict[str, Any]]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to roughly ``max_tokens``, noting how much was dropped"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}… [truncated {len(text) - max_chars} chars]"
+
+
+# (items kept per list/object, chars kept per string, nesting depth), loosest first
+_SUMMARY_LEVELS = ((50, 400, 8), (20, 160, 6), (10, 80, 4), (5, 40, 3), (3, 24, 2), (1, 16, 1))
+
+
+def _shrink(value: Any, items: int, chars: int, depth: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= chars else f"{value[:chars]}… (+{len(value) - chars} chars)"
+    if isinstance(value, list):
+        if depth == 0:
+            return f"[{len(value)} items]"
+        head = [_shrink(v, items, chars, depth - 1) for v in value[:items]]
+        if len(value) > items:
+            head.append(f"… {len(value) - items} more items")
+        return head
+    if isinstance(value, dict):
+        if depth == 0:
+            return f"{{{len(value)} keys}}"
+        keys = list(value)[: items * 2]
+        out = {k: _shrink(value[k], items, chars, depth - 1) for k in keys}
+        if len(value) > len(keys):
+            out["…"] = f"{len(value) - len(keys)} more keys"
+        return out
+    return value
+
+
+def summarize_json(value: Any, max_tokens: int) -> str:
+    """Serialize ``value`` within ``max_tokens`` by keeping the head of every list,
+    object and string rather than cutting the JSON text off mid-way"""
+    text = json.dumps(value)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    size = len(text)
+    for items, chars, depth in _SUMMARY_LEVELS:
+        text = json.dumps(_shrink(value, items, chars, depth), ensure_ascii=False)
+        if estimate_tokens(text) <= max_tokens:
+            break
+    return trim_to_tokens(f"[summarized from {size} chars] {text}", max_tokens)
+
+
+def fit_tool_result(result: str, max_tokens: int) -> str:
+    """Fit one tool result to the budget, summarizing JSON structurally"""
+    if estimate_tokens(result) <= max_tokens:
+        return result
+    try:
+        return summarize_json(json.loads(result), max_tokens)
+    except ValueError:
+        return trim_to_tokens(result, max_tokens)
+
+
+def _one_line(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+
+@dataclass
+class Turn:
+    user: str
+    assistant: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.user) + estimate_tokens(self.assistant)
+
+
+class ConversationContext:
+    """Conversation history plus the per-turn scratch, under one token budget."""
+
+    def __init__(
+        self,
+        budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+        tool_result_tokens: int = DEFAULT_TOOL_RESULT_TOKENS,
+        summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+    ):
+        self.budget_tokens = budget_tokens
+        self.tool_result_tokens = tool_result_tokens
+        self.summary_tokens = summary_tokens
+        self.turns: List[Turn] = []
+        self.summary_lines: List[str] = []
+        self.scratch: List[Message] = []
+        self._seen_calls: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # History
+    # ------------------------------------------------------------------
+
+    def start_turn(self) -> None:
+        """Reset the scratch for a new user message"""
+        self.scratch = []
+        self._seen_calls = {}
+
+    def abort_turn(self) -> None:
+        """Drop the scratch of a turn that failed, leaving history as it was"""
+        self.scratch = []
+        self._seen_calls = {}
+
+    def finish_turn(self, user: str, assistant: str) -> None:
+        """Record a completed exchange and compact history to the budget"""
+        reply = split_thinking_and_reply(strip_tool_calls(assistant) or assistant)["reply"]
+        self.turns.append(Turn(user, reply))
+        self.scratch = []
+        self._seen_calls = {}
+        self._compact()
+
+    def _compact(self) -> None:
+        # History may use at most half the budget; the rest is for the live turn
+        limit = self.budget_tokens // 2
+        while len(self.turns) > 1 and sum(t.tokens for t in self.turns) > limit:
+            turn = self.turns.pop(0)
+            self.summary_lines.append(
+                f"- User asked: {_one_line(turn.user, 120)} → Assistant: {_one_line(turn.assistant, 160)}"
+            )
+        while len(self.summary_lines) > 1 and estimate_tokens("\n".join(self.summary_lines)) > self.summary_tokens:
+            self.summary_lines.pop(0)
+
+    @property
+    def summary(self) -> str:
+        if not self.summary_lines:
+            return ""
+        return "Summary of earlier conversation:\n" + "\n".join(self.summary_lines)
+
+    # ------------------------------------------------------------------
+    # Current turn
+    # ------------------------------------------------------------------
+
+    def add_model_output(self, text: str, native_calls: Optional[List[ToolCall]] = None) -> None:
+        """Record one model response (once, however many tool calls it made)"""
+        self.scratch.append(("assistant", text, tool_call_message_kwargs(native_calls) if native_calls else {}))
+
+    def add_tool_results(self, calls: List[ToolCall], results: List[str]) -> None:
+        """Record tool results, trimmed and with repeated calls collapsed.
+
+        Native calls (with an ``id``) become tool messages; text-mode results
+        are user messages naming the call.
+        """
+        for call, result in zip(calls, results):
+            key = f"{call.name} {json.dumps(call.params, sort_keys=True)}"
+            if key in self._seen_calls:
+                result = f"same as result #{self._seen_calls[key]} above"
+            else:
+                self._seen_calls[key] = len(self._seen_calls) + 1
+                result = fit_tool_result(result, self.tool_result_tokens)
+            if call.id:
+                self.scratch.append(("tool", result, {"tool_call_id": call.id}))
+            else:
+                self.scratch.append(("user", f"Tool result ({key}): {result}", {}))
+
+    # ------------------------------------------------------------------
+    # Prompt assembly
+    # ------------------------------------------------------------------
+
+    def build_messages(self, system_prompt: str, user_input: str) -> List[Message]:
+        """Assemble the prompt for the next model call within the budget"""
+        remaining = self.budget_tokens - estimate_tokens(system_prompt) - estimate_tokens(user_input)
+
+        scratch = list(self.scratch)
+        scratch_tokens = sum(estimate_tokens(c) for _, c, _ in scratch)
+        # Elide the oldest scratch entries first, always keeping the latest
+        # model output and the tool results that answered it
+        protected = max((i for i, (role, _, _) in enumerate(scratch) if role == "assistant"), default=len(scratch))
+        idx = 0
+        while scratch_tokens > remaining and idx < protected:
+            role, content, extra = scratch[idx]
+            if not content.startswith("[elided"):
+                note = f"[elided earlier {'model output' if role == 'assistant' else 'tool result'}]"
+                scratch_tokens += estimate_tokens(note) - estimate_tokens(content)
+                scratch[idx] = (role, note, extra)
+            idx += 1
+        remaining -= scratch_tokens
+
+        history: List[Message] = []
+        for turn in reversed(self.turns):
+            if turn.tokens > remaining:
+                break
+            history[:0] = [("user", turn.user, {}), ("assistant", turn.assistant, {})]
+            remaining -= turn.tokens
+
+        summary = self.summary
+        messages: List[Message] = [("system", system_prompt, {})]
+        if summary and estimate_tokens(summary) <= remaining:
+            messages[0] = ("system", f"{system_prompt}\n\n{summary}", {})
+        return messages + history + [("user", user_input, {})] + scratch
+
+    def prompt_tokens(self, messages: List[Message]) -> int:
+        return sum(estimate_tokens(c) for _, c, _ in messages)
+
+
+def latest_window(messages: List[Any], window: int) -> Tuple[int, List[Any]]:
+    """Return ``(hidden_count, visible)`` for the last ``window`` messages"""
+    if window <= 0 or len(messages) <= window:
+        return 0, messages
+    return len(messages) - window, messages[-window:]
+
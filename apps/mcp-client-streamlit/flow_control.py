@@ -0,0 +1,338 @@
+"""Process-wide admission control for gateway requests.
+
+Every Streamlit session shares one ``GatewayClient``, and through it one
+``FlowControl``, so these limits hold for the whole server process rather
+than per browser tab. A request is admitted in two steps:
+
+1. Token buckets. Rules of the form ``key=rate[:burst]`` (requests per
+   second) apply to everything (``*``), to a tenant (``tenant:acme``) or a
+   tool (``tool:sum``); ``tenant:*`` and ``tool:*`` give every tenant or tool
+   its own bucket. A request waits until each bucket that applies to it has
+   a token.
+2. Adaptive concurrency per gateway host (AIMD). The number of requests in
+   flight is capped by a limit that grows by about one per round trip while
+   responses are healthy. It is halved on a 429, a 5xx, a connection error
+   or a latency spike (well above the smoothed latency). A ``Retry-After``
+   on a 429/503 pauses the host until that time.
+
+A request that cannot be admitted within its timeout fails with
+``Throttled``, a ``requests`` exception, so callers handle it like any other
+failed request.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+import requests
+
+
+DEFAULT_INITIAL_LIMIT = 16
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 64
+DEFAULT_DECREASE = 0.5
+DEFAULT_SPIKE_FACTOR = 3.0
+DEFAULT_SPIKE_FLOOR_MS = 1000.0
+LATENCY_ALPHA = 0.2
+MAX_RETRY_AFTER = 60.0
+
+# Responses that mean "slow down"
+OVERLOAD_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class Throttled(requests.exceptions.RequestException):
+    """A request could not be admitted before its timeout."""
+
+
+@dataclass
+class RateRule:
+    """Sustained requests per second and burst size of one bucket."""
+
+    rate: float
+    burst: float
+
+
+def parse_rate_limits(spec: str) -> Dict[str, RateRule]:
+    """Parse ``"*=50:100,tenant:*=10,tool:sum=5"``; burst defaults to the rate"""
+    rules: Dict[str, RateRule] = {}
+    for item in (spec or "").split(","):
+        key, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        try:
+            rule = RateRule(float(rate), float(burst) if burst.strip() else max(1.0, float(rate)))
+        except ValueError:
+            continue
+        if key.strip() and rule.rate > 0:
+            rules[key.strip()] = rule
+    return rules
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+    """Refilling token count for one rule key."""
+
+    def __init__(self, rule: RateRule):
+        self.rule = rule
+        self.tokens = rule.burst
+        self.updated = time.monotonic()
+        self.throttled = 0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.rule.burst, self.tokens + (now - self.updated) * self.rule.rate)
+        self.updated = now
+
+    def wait_for(self, cost: int) -> float:
+        """Seconds until ``cost`` tokens are available (after ``refill``).
+
+        A cost above the burst size only needs a full bucket and leaves it in
+        debt, so a large batch is delayed rather than refused forever.
+        """
+        return max(0.0, (min(cost, self.rule.burst) - self.tokens) / self.rule.rate)
+
+
+@dataclass
+class HostState:
+    """AIMD limit, in-flight count and latency of one gateway host."""
+
+    limit: float
+    inflight: int = 0
+    ewma_ms: Optional[float] = None
+    paused_until: float = 0.0
+    last_decrease: float = 0.0
+    decreases: int = 0
+    throttled: int = 0
+
+
+class Admission:
+    """One admitted request, handed back to ``FlowControl.release``."""
+
+    __slots__ = ("host", "queued_ms")
+
+    def __init__(self, host: str, queued_ms: float):
+        self.host = host
+        self.queued_ms = queued_ms
+
+
+class FlowControl:
+    """Token-bucket rate limits plus adaptive concurrency, shared by all sessions."""
+
+    def __init__(
+        self,
+        rate_limits: Optional[Dict[str, RateRule]] = None,
+        adaptive: bool = True,
+        initial_limit: int = DEFAULT_INITIAL_LIMIT,
+        min_limit: int = DEFAULT_MIN_LIMIT,
+        max_limit: int = DEFAULT_MAX_LIMIT,
+        decrease: float = DEFAULT_DECREASE,
+        spike_factor: float = DEFAULT_SPIKE_FACTOR,
+        spike_floor_ms: float = DEFAULT_SPIKE_FLOOR_MS,
+    ):
+        self.rate_limits = rate_limits or {}
+        self.adaptive = adaptive
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.spike_floor_ms = spike_floor_ms
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._bucket_lock = threading.Lock()
+        self._hosts: Dict[str, HostState] = {}
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> "FlowControl":
+        """MCP_RATE_LIMITS sets the bucket rules; MCP_FLOW_* tune adaptive concurrency"""
+        return cls(
+            rate_limits=parse_rate_limits(os.getenv("MCP_RATE_LIMITS", "")),
+            adaptive=os.getenv("MCP_FLOW_ADAPTIVE", "true").lower() not in ("0", "false", "no", "off"),
+            initial_limit=int(os.getenv("MCP_FLOW_INITIAL_LIMIT", DEFAULT_INITIAL_LIMIT)),
+            min_limit=int(os.getenv("MCP_FLOW_MIN_LIMIT", DEFAULT_MIN_LIMIT)),
+            max_limit=int(os.getenv("MCP_FLOW_MAX_LIMIT", DEFAULT_MAX_LIMIT)),
+        )
+
+    # ------------------------------------------------------------------
+    # Token buckets
+    # ------------------------------------------------------------------
+
+    def _costs(self, tenant: str, tools: List[str]) -> List[Tuple[str, RateRule, int]]:
+        """``(bucket key, rule, tokens)`` for every rule that applies to a request"""
+        calls = max(1, len(tools))
+        costs = []
+        if "*" in self.rate_limits:
+            costs.append(("*", self.rate_limits["*"], calls))
+        rule = self.rate_limits.get(f"tenant:{tenant}") or self.rate_limits.get("tenant:*")
+        if rule is not None:
+            costs.append((f"tenant:{tenant}", rule, calls))
+        for tool, count in Counter(tools).items():
+            rule = self.rate_limits.get(f"tool:{tool}") or self.rate_limits.get("tool:*")
+            if rule is not None:
+                costs.append((f"tool:{tool}", rule, count))
+        return costs
+
+    def _take_tokens(self, tenant: str, tools: List[str], deadline: float) -> List[Tuple[TokenBucket, int]]:
+        """Take the tokens a request costs; returns what was taken, for ``_refund``"""
+        costs = self._costs(tenant, tools)
+        if not costs:
+            return []
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                buckets = [(self._buckets.setdefault(key, TokenBucket(rule)), cost) for key, rule, cost in costs]
+                for bucket, _ in buckets:
+                    bucket.refill(now)
+                # All-or-nothing, so a request waiting on one bucket holds no tokens of another
+                wait = max(bucket.wait_for(cost) for bucket, cost in buckets)
+                if wait == 0:
+                    for bucket, cost in buckets:
+                        bucket.tokens -= cost
+                    return buckets
+            if now + wait > deadline:
+                with self._bucket_lock:
+                    for bucket, cost in buckets:
+                        bucket.throttled += bucket.wait_for(cost) > 0
+                raise Throttled(f"Rate limit reached ({', '.join(key for key, _, _ in costs)})")
+            time.sleep(wait)
+
+    def _refund(self, taken: List[Tuple[TokenBucket, int]]) -> None:
+        """Give back the tokens of a request that was never sent"""
+        with self._bucket_lock:
+            for bucket, cost in taken:
+                bucket.tokens = min(bucket.rule.burst, bucket.tokens + cost)
+
+    # ------------------------------------------------------------------
+    # Adaptive concurrency
+    # ------------------------------------------------------------------
+
+    def _host(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(float(self.initial_limit))
+        return state
+
+    def _enter(self, host: str, deadline: float) -> None:
+        with self._cond:
+            state = self._host(host)
+            while True:
+                now = time.monotonic()
+                paused = state.paused_until > now
+                if not paused and state.inflight < max(1, int(state.limit)):
+                    state.inflight += 1
+                    return
+                if now >= deadline:
+                    state.throttled += 1
+                    if paused:
+                        raise Throttled(f"Gateway {host} asked to retry after {state.paused_until - now:.1f}s")
+                    raise Throttled(f"Gateway {host} is at its concurrency limit ({int(state.limit)})")
+                self._cond.wait((min(state.paused_until, deadline) if paused else deadline) - now)
+
+    def admit(
+        self,
+        host: str,
+        tenant: str = "",
+        tools: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Admission:
+        """Wait for rate and concurrency budget; raises Throttled after ``timeout`` seconds.
+
+        ``tools`` has one name per tool call the request carries (a JSON-RPC
+        batch can carry several); other requests cost one token.
+        """
+        started = time.monotonic()
+        deadline = started + timeout if timeout is not None else float("inf")
+        taken = self._take_tokens(tenant, tools or [], deadline)
+        if self.adaptive:
+            try:
+                self._enter(host, deadline)
+            except Throttled:
+                self._refund(taken)
+                raise
+        return Admission(host, (time.monotonic() - started) * 1000)
+
+    def release(
+        self,
+        admission: Admission,
+        status_code: Optional[int] = None,
+        latency_ms: Optional[float] = None,
+        retry_after: Optional[str] = None,
+    ) -> None:
+        """Record how an admitted request went (no status: it failed to get a response)"""
+        if not self.adaptive:
+            return
+        with self._cond:
+            state = self._host(admission.host)
+            state.inflight -= 1
+            now = time.monotonic()
+            overloaded = status_code is None or status_code in OVERLOAD_STATUSES
+            if not overloaded and latency_ms is not None and state.ewma_ms is not None:
+                overloaded = latency_ms > max(self.spike_factor * state.ewma_ms, self.spike_floor_ms)
+            if status_code in (429, 503):
+                pause = parse_retry_after(retry_after)
+                if pause:
+                    state.paused_until = max(state.paused_until, now + pause)
+            if overloaded:
+                # One cut per round trip, so a burst of failures from one window counts once
+                if now - state.last_decrease >= (state.ewma_ms or 0) / 1000:
+                    state.limit = max(float(self.min_limit), state.limit * self.decrease)
+                    state.last_decrease = now
+                    state.decreases += 1
+            else:
+                state.limit = min(float(self.max_limit), state.limit + 1 / state.limit)
+            # Spikes count too, so a gateway that has become slower for good stops reading as spiking
+            if status_code is not None and latency_ms is not None:
+                state.ewma_ms = latency_ms if state.ewma_ms is None else (
+                    (1 - LATENCY_ALPHA) * state.ewma_ms + LATENCY_ALPHA * latency_ms
+                )
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Live state
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Per-host limits and per-bucket tokens, for the sidebar"""
+        now = time.monotonic()
+        with self._cond:
+            hosts = [
+                {
+                    "gateway": host,
+                    "limit": round(s.limit, 1),
+                    "in_flight": s.inflight,
+                    "ewma_ms": round(s.ewma_ms, 1) if s.ewma_ms is not None else None,
+                    "paused_s": round(max(0.0, s.paused_until - now), 1),
+                    "backoffs": s.decreases,
+                    "throttled": s.throttled,
+                }
+                for host, s in sorted(self._hosts.items())
+            ]
+        with self._bucket_lock:
+            buckets = []
+            for key, bucket in sorted(self._buckets.items()):
+                bucket.refill(now)
+                buckets.append(
+                    {
+                        "bucket": key,
+                        "rate": bucket.rule.rate,
+                        "burst": bucket.rule.burst,
+                        "tokens": round(bucket.tokens, 1),
+                        "throttled": bucket.throttled,
+                    }
+                )
+        return {"gateways": hosts, "buckets": buckets}
@@ -0,0 +1,490 @@
+"""Pooled HTTP client for talking to the MCP Gateway.
+
+One instance is shared by every Streamlit session in the server process, so
+connections to the gateway are kept alive and reused instead of paying a new
+TCP+TLS handshake for every tool list fetch or tool call.
+
+Every request carries a fresh ``x-request-id``. Inside an active trace (see
+telemetry.py) each request is also recorded as an ``http`` span with its
+connect, time-to-first-byte, body and JSON decode times, plus the gateway's
+own ``request_id`` when the response includes one.
+
+Tool results can be arbitrarily large, so callers that may receive one pass
+``stream=True`` and read the body with ``read_body()``. It reads in chunks
+under a byte cap and either stops at the cap or spills the rest to a temp
+file, so a huge payload never has to sit in memory in full. Spilling has its
+own ceiling, past which the file is dropped, so disk use is bounded too. Those files live
+in their own directory (``SPILL_DIR``) so ``sweep_spilled_responses()`` can
+remove the ones nobody deleted.
+
+With a ``Cassette`` (see cassette.py) every exchange is recorded to, or
+replayed from, a local file instead of only going over the network.
+
+With a ``FlowControl`` (see flow_control.py) every request first waits for
+its tenant's and tool's rate budget and a concurrency slot on its gateway;
+the response status, latency and ``Retry-After`` then tune that gateway's
+concurrency limit. A streamed response holds its slot until it is closed
+(``read_body()`` closes it), so body transfer counts as in flight and as
+latency.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from http import cookiejar
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from cassette import Cassette
+from flow_control import Admission, FlowControl
+from telemetry import current_span, span
+
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_SIZE = 20
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.3
+DEFAULT_MAX_RESPONSE_BYTES = 10_000_000
+DEFAULT_MAX_SPILL_BYTES = 100_000_000
+READ_CHUNK_BYTES = 64 * 1024
+PREVIEW_BYTES = 64 * 1024
+SPILL_DIR = os.path.join(tempfile.gettempdir(), "mcp-client-responses")
+
+# Only idempotent requests are retried on a bad status; POST /tools/:name/call
+# may have side effects upstream, so it is retried on connect errors only.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUSES = (502, 503, 504)
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Connect time of the request running on this thread (0 when a pooled
+# connection was reused); set by the connection classes below
+_connect_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_timing.ms = (time.perf_counter() - started) * 1000
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()  # includes the TLS handshake
+        _connect_timing.ms = (time.perf_counter() - started) * 1000
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class _NoCookies(cookiejar.DefaultCookiePolicy):
+    """Never store cookies: the session is shared between users."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+def _timed_json(decode, s):
+    """Wrap ``Response.json`` to record decode time and the gateway's request_id"""
+
+    def json(**kwargs: Any) -> Any:
+        started = time.perf_counter()
+        data = decode(**kwargs)
+        s.set(**{"json.decode_ms": round((time.perf_counter() - started) * 1000, 3)})
+        if isinstance(data, dict) and isinstance(data.get("context"), dict):
+            gateway_id = data["context"].get("request_id")
+            if gateway_id:
+                s.set(**{"gateway.request_id": gateway_id})
+        return data
+
+    return json
+
+
+@dataclass
+class ResponseBody:
+    """A response body read under a byte cap.
+
+    ``content`` holds the whole body when it fit under the cap and is None
+    otherwise. An oversized body was either spilled in full to the temp file
+    at ``path`` or cut off (``complete`` False, no file): at the cap when not
+    spilling, or at the spill ceiling.
+    """
+
+    content: Optional[bytes]
+    size: int
+    preview: bytes = b""
+    path: Optional[str] = None
+    complete: bool = True
+    _span: Any = field(default=None, repr=False)
+
+    @property
+    def truncated(self) -> bool:
+        return self.content is None
+
+    def json(self) -> Any:
+        """Decode the body; raises ValueError when it was over the cap or not JSON"""
+        if self.content is None:
+            raise ValueError(f"Response body over the size cap ({self.size} bytes read)")
+        decode = lambda **kwargs: json.loads(self.content, **kwargs)  # noqa: E731
+        return _timed_json(decode, self._span)() if self._span is not None else decode()
+
+    def text(self, limit: int = PREVIEW_BYTES) -> str:
+        """The first ``limit`` bytes as text"""
+        head = self.content[:limit] if self.content is not None else self.preview[:limit]
+        return head.decode("utf-8", errors="replace")
+
+    def save(self) -> str:
+        """Path of a file holding the full body, writing one if needed"""
+        if self.path is None:
+            with _spill_file() as f:
+                f.write(self.content or b"")
+            self.path = f.name
+        return self.path
+
+
+def _spill_file() -> Any:
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    return tempfile.NamedTemporaryFile("wb", prefix="mcp-response-", suffix=".json", dir=SPILL_DIR, delete=False)
+
+
+def sweep_spilled_responses(max_age: float) -> int:
+    """Delete spilled response files older than ``max_age`` seconds; returns how many"""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        names = os.listdir(SPILL_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(SPILL_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue  # already gone
+    return removed
+
+
+def read_body(
+    resp: requests.Response,
+    max_bytes: int,
+    spill: bool = False,
+    max_spill_bytes: int = DEFAULT_MAX_SPILL_BYTES,
+) -> ResponseBody:
+    """Read ``resp`` in chunks, keeping at most ``max_bytes`` in memory.
+
+    Past the cap, reading stops (``spill`` False) or the body is written to a
+    temp file (``spill`` True) until it passes ``max_spill_bytes``, where
+    reading stops and the file is deleted. The response is closed either way.
+    """
+    s = getattr(resp, "trace_span", None)
+    started = time.perf_counter()
+    buffer = bytearray()
+    size = 0
+    spool = None
+    preview = b""
+    complete = True
+    try:
+        for chunk in resp.iter_content(READ_CHUNK_BYTES):
+            size += len(chunk)
+            if spool is not None:
+                if size > max_spill_bytes:
+                    complete = False
+                    break
+                spool.write(chunk)
+                continue
+            buffer += chunk
+            if size > max_bytes:
+                preview = bytes(buffer[:PREVIEW_BYTES])
+                if not spill:
+                    complete = False
+                    break
+                spool = _spill_file()
+                spool.write(buffer)
+                buffer = bytearray()
+    finally:
+        resp.close()
+        if spool is not None:
+            spool.close()
+            if not complete:
+                os.remove(spool.name)
+                spool = None
+    if s is not None:
+        s.set(
+            **{
+                "http.body_ms": round((time.perf_counter() - started) * 1000, 3),
+                "http.response_bytes": size,
+                "http.body_truncated": size > max_bytes,
+            }
+        )
+    if size > max_bytes:
+        return ResponseBody(None, size, preview, spool.name if spool is not None else None, complete)
+    return ResponseBody(bytes(buffer), size, _span=s)
+
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _called_tools(url: str, payload: Any) -> List[str]:
+    """Name of each tool a request calls, via REST or JSON-RPC (batches carry several)"""
+    path = urlsplit(url).path
+    if path.endswith("/call") and "/tools/" in path:
+        return [path.rsplit("/", 2)[-2]]
+    messages = payload if isinstance(payload, list) else [payload]
+    return [
+        (m.get("params") or {}).get("name", "")
+        for m in messages
+        if isinstance(m, dict) and m.get("method") == "tools/call"
+    ]
+
+
+class GatewayClient:
+    """Keep-alive, connection-pooled wrapper around the gateway REST endpoints."""
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+        max_spill_bytes: int = DEFAULT_MAX_SPILL_BYTES,
+        cassette: Optional[Cassette] = None,
+        flow: Optional[FlowControl] = None,
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_response_bytes = max_response_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.cassette = cassette
+        self.flow = flow
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _TimedAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+        if cassette is not None:
+            adapter = cassette.adapter(adapter)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.cookies.set_policy(_NoCookies())
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    @classmethod
+    def from_env(cls, cassette: Optional[Cassette] = None, flow: Optional[FlowControl] = None) -> "GatewayClient":
+        """Build a client from MCP_HTTP_* environment variables."""
+        return cls(
+            pool_size=_env_number("MCP_HTTP_POOL_SIZE", DEFAULT_POOL_SIZE),
+            retries=_env_number("MCP_HTTP_RETRIES", DEFAULT_RETRIES),
+            backoff_factor=_env_number("MCP_HTTP_BACKOFF", DEFAULT_BACKOFF, float),
+            timeout=_env_number("MCP_HTTP_TIMEOUT", DEFAULT_TIMEOUT, float),
+            max_response_bytes=_env_number("MCP_HTTP_MAX_RESPONSE_BYTES", DEFAULT_MAX_RESPONSE_BYTES),
+            max_spill_bytes=_env_number("MCP_HTTP_MAX_SPILL_BYTES", DEFAULT_MAX_SPILL_BYTES),
+            cassette=cassette,
+            flow=flow,
+        )
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """Send a request through the shared pool.
+
+        With ``stream=True`` the body is left unread; use ``read_body()``.
+        ``throttle=False`` skips flow control (health probes, load tests).
+        Raises ``Throttled`` when flow control cannot admit the request
+        within ``timeout``.
+        """
+        request_id = uuid.uuid4().hex
+        headers = {**(headers or {}), REQUEST_ID_HEADER: request_id}
+        timeout = timeout if timeout is not None else self.timeout
+        stream = kwargs.pop("stream", False)
+        throttle = kwargs.pop("throttle", True)
+        if self.flow is None or not throttle:
+            return self._send(method, url, headers, timeout, stream, None, **kwargs)
+
+        admission = self.flow.admit(
+            urlsplit(url).netloc, headers.get("x-tenant-id", ""), _called_tools(url, kwargs.get("json")), timeout
+        )
+        started = time.perf_counter()
+        try:
+            resp = self._send(method, url, headers, timeout, stream, admission, **kwargs)
+        except requests.exceptions.RequestException:
+            self.flow.release(admission)
+            raise
+        if stream:
+            self._release_on_close(resp, admission, started)
+        else:
+            self.flow.release(
+                admission, resp.status_code, (time.perf_counter() - started) * 1000, resp.headers.get("Retry-After")
+            )
+        return resp
+
+    def _release_on_close(self, resp: requests.Response, admission: Admission, started: float) -> None:
+        """Hold a streamed response's flow-control slot until its body has been read and closed"""
+        flow = self.flow
+        status_code, retry_after = resp.status_code, resp.headers.get("Retry-After")
+        lock = threading.Lock()
+        released = []
+
+        def release() -> None:
+            with lock:
+                if released:
+                    return
+                released.append(True)
+            flow.release(admission, status_code, (time.perf_counter() - started) * 1000, retry_after)
+
+        close = resp.close
+
+        def close_and_release() -> None:
+            try:
+                close()
+            finally:
+                release()
+
+        resp.close = close_and_release
+        # A response dropped without being closed still gives its slot back
+        weakref.finalize(resp, release)
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        timeout: float,
+        stream: bool,
+        admission: Optional[Admission],
+        **kwargs: Any,
+    ) -> requests.Response:
+        if current_span() is None:
+            return self.session.request(method, url, headers=headers, timeout=timeout, stream=stream, **kwargs)
+
+        attributes = {"http.method": method, "http.url": url, "http.request_id": headers[REQUEST_ID_HEADER]}
+        if admission is not None:
+            attributes["http.queued_ms"] = round(admission.queued_ms, 3)
+        with span(f"http {method} {urlsplit(url).path}", **attributes) as s:
+            _connect_timing.ms = 0.0
+            started = time.perf_counter()
+            # stream=True returns at the headers, so TTFB and body read can be timed apart
+            resp = self.session.request(method, url, headers=headers, timeout=timeout, stream=True, **kwargs)
+            headers_at = time.perf_counter()
+            s.set(
+                **{
+                    "http.status_code": resp.status_code,
+                    "http.connect_ms": round(_connect_timing.ms, 3),
+                    "http.connection_reused": _connect_timing.ms == 0.0,
+                    "http.ttfb_ms": round((headers_at - started) * 1000, 3),
+                }
+            )
+            if not stream:
+                body = resp.content  # read now, so the body time lands on this span
+                s.set(
+                    **{
+                        "http.body_ms": round((time.perf_counter() - headers_at) * 1000, 3),
+                        "http.response_bytes": len(body),
+                    }
+                )
+        if stream:
+            # read_body() records the body timing on this span
+            resp.trace_span = s
+        resp.json = _timed_json(resp.json, s)
+        return resp
+
+    def read_body(self, resp: requests.Response, spill: bool = False) -> ResponseBody:
+        """``read_body`` under this client's ``max_response_bytes`` and ``max_spill_bytes``"""
+        return read_body(resp, self.max_response_bytes, spill, self.max_spill_bytes)
+
+    def list_tools(
+        self, base_url: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any
+    ) -> requests.Response:
+        """GET /tools"""
+        return self.request("GET", f"{base_url}/tools", headers=headers, **kwargs)
+
+    def call_tool(
+        self,
+        base_url: str,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """POST /tools/{name}/call"""
+        return self.request(
+            "POST",
+            f"{base_url}/tools/{tool_name}/call",
+            json={"arguments": arguments},
+            headers=headers,
+            **kwargs,
+        )
+
+    def mcp(
+        self,
+        base_url: str,
+        payload: Any,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """POST /mcp (a JSON-RPC request object or batch array)"""
+        return self.request("POST", f"{base_url}/mcp", json=payload, headers=headers, **kwargs)
+
+    def health(
+        self, base_url: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any
+    ) -> requests.Response:
+        """GET /health"""
+        return self.request("GET", f"{base_url}/health", headers=headers, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
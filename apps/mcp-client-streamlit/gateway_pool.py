@@ -0,0 +1,390 @@
+"""Latency-aware routing across several gateway deployments.
+
+A ``GatewayPool`` holds the base URLs of gateways that serve the same tools
+(regions, tenants). A background thread probes each one's ``/health`` and
+keeps a smoothed latency score (an EWMA, also fed by real tool calls) and a
+healthy flag. Their ``/tools`` catalogs are merged into one, remembering which
+endpoint exposes which tool.
+
+``call_tool`` has the same signature as ``GatewayClient.call_tool`` and sends
+the call to the fastest healthy endpoint that exposes the tool, moving on to
+the next one when a connection fails. For tools that are safe to run twice
+(``hedge_tools``), a call that has not answered by the endpoint's usual
+latency plus four deviations is also sent to the runner-up, and whichever
+answers first wins. Other calls run on the caller's thread; hedgeable ones
+run on a separate ``hedge_workers`` pool, so probes and catalog fetches never
+queue behind tool calls, and the hedge delay counts from when a call starts
+rather than from when it was queued.
+"""
+
+import contextvars
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple, FrozenSet
+
+import requests
+
+from catalog_cache import CatalogEntry, ToolCatalogCache
+from flow_control import Throttled
+from gateway_client import GatewayClient, ResponseBody
+from telemetry import current_span
+
+
+DEFAULT_PROBE_INTERVAL = 10.0
+DEFAULT_PROBE_TIMEOUT = 3.0
+DEFAULT_ALPHA = 0.3
+DEFAULT_HEDGE_MIN_MS = 50.0
+DEFAULT_HEDGE_WORKERS = 32
+# Merged catalogs kept (one per distinct set of endpoint catalogs: tenants, scopes)
+MERGED_CATALOGS = 16
+
+
+@dataclass
+class Endpoint:
+    """Health and latency score of one gateway deployment."""
+
+    base_url: str
+    healthy: Optional[bool] = None  # None until the first probe or call
+    ewma_ms: Optional[float] = None
+    dev_ms: float = 0.0
+    last_error: Optional[str] = None
+    probed_at: Optional[float] = None
+    tools: FrozenSet[str] = frozenset()
+    calls: int = 0
+    hedges: int = 0
+
+    def observe(self, ms: float, alpha: float) -> None:
+        if self.ewma_ms is None:
+            self.ewma_ms, self.dev_ms = ms, ms / 2
+        else:
+            self.dev_ms = (1 - alpha) * self.dev_ms + alpha * abs(ms - self.ewma_ms)
+            self.ewma_ms = (1 - alpha) * self.ewma_ms + alpha * ms
+
+    @property
+    def score(self) -> float:
+        return self.ewma_ms if self.ewma_ms is not None else math.inf
+
+    def hedge_after_ms(self, minimum: float) -> Optional[float]:
+        """How long to wait before hedging a call (None before any latency is known)"""
+        if self.ewma_ms is None:
+            return None
+        return max(minimum, self.ewma_ms + 4 * self.dev_ms)
+
+
+def parse_hedge_tools(value: str) -> FrozenSet[str]:
+    """``"sum,normalize-text"`` -> tool names; ``"*"`` hedges every tool"""
+    return frozenset(name.strip() for name in value.split(",") if name.strip())
+
+
+def _probe_loop(ref: "weakref.ref[GatewayPool]", stopped: threading.Event, interval: float) -> None:
+    # Only a weak reference, so a pool dropped from the app's resource cache ends its thread
+    while not stopped.is_set():
+        pool = ref()
+        if pool is None:
+            return
+        try:
+            pool.probe()
+        except RuntimeError:  # executor shut down (interpreter exit)
+            return
+        del pool
+        stopped.wait(interval)
+
+
+class GatewayPool:
+    """Routes tool calls across gateways; a drop-in for ``GatewayClient`` tool calls."""
+
+    def __init__(
+        self,
+        client: GatewayClient,
+        base_urls: List[str],
+        probe_interval: float = DEFAULT_PROBE_INTERVAL,
+        probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+        alpha: float = DEFAULT_ALPHA,
+        hedge_tools: FrozenSet[str] = frozenset(),
+        hedge_min_ms: float = DEFAULT_HEDGE_MIN_MS,
+        hedge_workers: int = DEFAULT_HEDGE_WORKERS,
+    ):
+        urls = list(dict.fromkeys(u.rstrip("/") for u in base_urls if u.strip()))
+        if not urls:
+            raise ValueError("GatewayPool needs at least one base URL")
+        self.client = client
+        self.primary = urls[0]
+        self.endpoints: Dict[str, Endpoint] = {u: Endpoint(u) for u in urls}
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.alpha = alpha
+        self.hedge_tools = hedge_tools
+        self.hedge_min_ms = hedge_min_ms
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._merged: "OrderedDict[Tuple[Tuple[str, int], ...], Tuple[List[Any], List[Dict[str, Any]]]]" = OrderedDict()
+        # Probes and catalog fetches; tool calls never queue here
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(urls)), thread_name_prefix="gateway-pool")
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max(2, hedge_workers), thread_name_prefix="gateway-hedge")
+
+    # ------------------------------------------------------------------
+    # GatewayClient surface used by callers of call_tool
+    # ------------------------------------------------------------------
+
+    @property
+    def timeout(self) -> float:
+        return self.client.timeout
+
+    @property
+    def max_response_bytes(self) -> int:
+        return self.client.max_response_bytes
+
+    def read_body(self, resp: requests.Response, spill: bool = False) -> ResponseBody:
+        return self.client.read_body(resp, spill)
+
+    # ------------------------------------------------------------------
+    # Health and scoring
+    # ------------------------------------------------------------------
+
+    def start(self) -> "GatewayPool":
+        """Start background ``/health`` probing"""
+        threading.Thread(
+            target=_probe_loop,
+            args=(weakref.ref(self), self._stopped, self.probe_interval),
+            name="gateway-probe",
+            daemon=True,
+        ).start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._executor.shutdown(wait=False)
+        self._hedge_executor.shutdown(wait=False)
+
+    def _record(self, base_url: str, ms: Optional[float], error: Optional[str] = None) -> None:
+        with self._lock:
+            endpoint = self.endpoints[base_url]
+            endpoint.healthy = error is None
+            endpoint.last_error = error
+            if ms is not None:
+                endpoint.observe(ms, self.alpha)
+
+    def _probe_one(self, base_url: str) -> None:
+        started = time.perf_counter()
+        try:
+            resp = self.client.health(base_url, timeout=self.probe_timeout, throttle=False)
+            resp.close()
+        except requests.exceptions.RequestException as e:
+            self._record(base_url, None, str(e))
+            return
+        finally:
+            self.endpoints[base_url].probed_at = time.time()
+        ms = (time.perf_counter() - started) * 1000
+        self._record(base_url, ms, None if resp.status_code == 200 else f"/health returned {resp.status_code}")
+
+    def probe(self) -> None:
+        """Probe every endpoint once, concurrently"""
+        list(self._executor.map(self._probe_one, list(self.endpoints)))
+
+    def ranked(self, tool_name: Optional[str] = None) -> List[Endpoint]:
+        """Endpoints to try for ``tool_name``, fastest healthy first.
+
+        Endpoints known to expose the tool are preferred, then endpoints whose
+        catalog has not been fetched; unhealthy ones are tried only when no
+        endpoint is healthy.
+        """
+        endpoints = list(self.endpoints.values())
+        if tool_name is not None:
+            exposing = [e for e in endpoints if tool_name in e.tools]
+            endpoints = exposing or [e for e in endpoints if not e.tools] or endpoints
+        healthy = [e for e in endpoints if e.healthy is not False]
+        return sorted(healthy or endpoints, key=lambda e: e.score)
+
+    def route(self, tool_names: List[str]) -> str:
+        """Fastest healthy endpoint exposing all of ``tool_names`` (for one batched request)"""
+        candidates = [e for e in self.ranked() if all(n in e.tools for n in tool_names)]
+        return (candidates or self.ranked(tool_names[0] if tool_names else None))[0].base_url
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """One row per endpoint for the sidebar"""
+        return [
+            {
+                "endpoint": e.base_url,
+                "healthy": {True: "yes", False: "no", None: "?"}[e.healthy],
+                "ewma_ms": round(e.ewma_ms, 1) if e.ewma_ms is not None else None,
+                "tools": len(e.tools),
+                "calls": e.calls,
+                "hedges": e.hedges,
+                "error": e.last_error or "",
+            }
+            for e in sorted(self.endpoints.values(), key=lambda e: (e.healthy is False, e.score))
+        ]
+
+    # ------------------------------------------------------------------
+    # Catalog
+    # ------------------------------------------------------------------
+
+    def catalog(
+        self, cache: ToolCatalogCache, headers: Optional[Dict[str, str]] = None, force: bool = False
+    ) -> Tuple[CatalogEntry, str]:
+        """Merged catalog of every endpoint, in ``ToolCatalogCache.get`` form.
+
+        A tool exposed by several endpoints is described by the one that was
+        fastest when the merge was built. The merged list is rebuilt only when
+        an endpoint's cached catalog changes, so caches keyed by its identity
+        (catalog hashes, validators) keep hitting. Raises the first endpoint's
+        error when no endpoint answers.
+        """
+
+        def fetch(base_url: str) -> Tuple[str, Any]:
+            try:
+                return base_url, cache.get(base_url, headers, force=force)
+            except Exception as e:
+                return base_url, e
+
+        context = contextvars.copy_context()
+        futures = [self._executor.submit(context.copy().run, fetch, u) for u in self.endpoints]
+        outcomes = dict(f.result() for f in futures)
+        fetched = {u: o for u, o in outcomes.items() if not isinstance(o, Exception)}
+        if not fetched:
+            raise next(iter(outcomes.values()))
+
+        ranked = [e for e in self.ranked() if e.base_url in fetched]
+        sources = []
+        for endpoint in ranked:
+            entry, source = fetched[endpoint.base_url]
+            endpoint.tools = frozenset(t["name"] for t in entry.tools)
+            sources.append(source)
+        merged = CatalogEntry(
+            tools=self._merge_tools([(e.base_url, fetched[e.base_url][0].tools) for e in ranked]),
+            payload={"endpoints": {u: len(o[0].tools) for u, o in fetched.items()}},
+            fetched_at=min(o[0].fetched_at for o in fetched.values()),
+        )
+        summary = ", ".join(f"{sources.count(s)} {s}" for s in dict.fromkeys(sources))
+        return merged, summary
+
+    def _merge_tools(self, catalogs: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """One list of the tools in ``(url, tools)`` catalogs (fastest first), reused while they are unchanged"""
+        key = tuple(sorted((url, id(tools)) for url, tools in catalogs))
+        with self._lock:
+            hit = self._merged.get(key)
+            if hit is not None:
+                self._merged.move_to_end(key)
+                return hit[1]
+        tools: Dict[str, Dict[str, Any]] = {}
+        for _, catalog in catalogs:
+            for tool in catalog:
+                tools.setdefault(tool["name"], tool)
+        merged = list(tools.values())
+        with self._lock:
+            # The source lists are held too, so their ids cannot be reused while keyed
+            _, merged = self._merged.setdefault(key, (catalogs, merged))
+            while len(self._merged) > MERGED_CATALOGS:
+                self._merged.popitem(last=False)
+        return merged
+
+    # ------------------------------------------------------------------
+    # Tool calls
+    # ------------------------------------------------------------------
+
+    def _send(self, base_url: str, tool_name: str, arguments: Dict[str, Any], headers, kwargs) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            resp = self.client.call_tool(base_url, tool_name, arguments, headers=headers, **kwargs)
+        except Throttled:
+            # Our own rate limit or concurrency cap, not a gateway failure
+            raise
+        except requests.exceptions.Timeout as e:
+            # A hung gateway must drop in the ranking: count the wait it cost
+            self._record(base_url, (kwargs.get("timeout") or self.client.timeout) * 1000, str(e))
+            raise
+        except requests.exceptions.RequestException as e:
+            self._record(base_url, None, str(e))
+            raise
+        ms = (time.perf_counter() - started) * 1000
+        self._record(base_url, ms, None if resp.status_code < 500 else f"HTTP {resp.status_code}")
+        with self._lock:
+            self.endpoints[base_url].calls += 1
+        resp.gateway_endpoint = base_url
+        return resp
+
+    def _call_direct(self, queue: List[str], tool_name: str, arguments: Dict[str, Any], headers, kwargs) -> requests.Response:
+        """Try the endpoints in order on the caller's thread, failing over when a connection fails"""
+        while True:
+            url = queue.pop(0)
+            try:
+                resp = self._send(url, tool_name, arguments, headers, kwargs)
+            except requests.exceptions.ConnectionError:
+                if not queue:
+                    raise
+                continue
+            s = current_span()
+            if s is not None:
+                s.set(**{"gateway.endpoint": url, "gateway.hedged": False})
+            return resp
+
+    def call_tool(
+        self,
+        base_url: str,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """POST /tools/{name}/call on the best endpoint (``base_url`` is not used)"""
+        queue = [e.base_url for e in self.ranked(tool_name)]
+        hedge = "*" in self.hedge_tools or tool_name in self.hedge_tools
+        if not hedge or len(queue) < 2:
+            return self._call_direct(queue, tool_name, arguments, headers, kwargs)
+
+        context = contextvars.copy_context()
+        pending = set()
+        hedged = False
+        last_error: Optional[Exception] = None
+
+        def launch() -> Tuple[str, threading.Event, List[float]]:
+            url = queue.pop(0)
+            started = threading.Event()
+            started_at: List[float] = []
+
+            def send() -> requests.Response:
+                started_at.append(time.perf_counter())
+                started.set()
+                return self._send(url, tool_name, arguments, headers, kwargs)
+
+            pending.add(self._hedge_executor.submit(context.copy().run, send))
+            return url, started, started_at
+
+        url, started, started_at = launch()
+        while pending:
+            timeout = None
+            delay = self.endpoints[url].hedge_after_ms(self.hedge_min_ms) if not hedged and queue else None
+            if delay is not None:
+                # The hedge delay runs from when the call started, not from when it was queued
+                started.wait()
+                timeout = max(0.0, delay / 1000 - (time.perf_counter() - started_at[0]))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Tail latency: send the same call to the runner-up and take whichever answers first
+                hedged = True
+                url, started, started_at = launch()
+                with self._lock:
+                    self.endpoints[url].hedges += 1
+                continue
+            for future in done:
+                pending.discard(future)
+                error = future.exception()
+                if error is None:
+                    winner = future.result()
+                    for loser in pending:
+                        loser.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                    s = current_span()
+                    if s is not None:
+                        s.set(**{"gateway.endpoint": winner.gateway_endpoint, "gateway.hedged": hedged})
+                    return winner
+                if not isinstance(error, requests.exceptions.ConnectionError):
+                    raise error
+                last_error = error
+            if not pending and queue:
+                url, started, started_at = launch()  # could not connect: fail over to the next endpoint
+        raise last_error
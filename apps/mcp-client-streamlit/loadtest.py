@@ -0,0 +1,302 @@
+"""Load generation and latency profiling for the gateway tool endpoints.
+
+A run drives ``POST /tools/{name}/call`` and/or ``POST /mcp`` (JSON-RPC
+``tools/call``) either open-loop at a target request rate or closed-loop with
+a fixed number of concurrent workers, for a set duration. Every request is
+recorded in LoadTestStats, which the UI polls for live numbers and which can
+be exported as JSON for regression tracking.
+
+In open-loop mode a request's latency runs from its scheduled send time, not
+from when a worker picked it up. Once the target rate exceeds what the gateway
+(or the in-flight cap) can take, the queueing delay therefore shows up in the
+percentiles instead of being hidden (coordinated omission). Requests still
+queued when the run ends are counted as unsent.
+
+Load test requests bypass the client's flow control (flow_control.py): the
+point is to drive the gateway at the configured rate and see how it copes.
+"""
+
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, List, Tuple
+
+import requests
+
+from gateway_client import GatewayClient
+
+
+ENDPOINT_REST = "rest"
+ENDPOINT_MCP = "mcp"
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass
+class LoadTarget:
+    """A tool, its arguments and the endpoint to drive it through."""
+
+    tool: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    endpoint: str = ENDPOINT_REST
+
+    @property
+    def label(self) -> str:
+        return f"{self.tool} ({self.endpoint})"
+
+
+@dataclass
+class LoadTestConfig:
+    targets: List[LoadTarget]
+    duration: float = 10.0
+    rps: float = 0.0  # > 0: open loop at this rate; 0: closed loop
+    concurrency: int = 4
+    timeout: float = 10.0
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def classify_response(endpoint: str, resp: requests.Response) -> str:
+    """Reduce a response to an outcome code: OK, a gateway error code, or HTTP_<status>"""
+    try:
+        body = resp.json()
+    except ValueError:
+        body = None
+
+    if endpoint == ENDPOINT_MCP and isinstance(body, dict):
+        error = body.get("error")
+        if error:
+            data = error.get("data") or {}
+            return data.get("code") or f"RPC_{error.get('code')}"
+        if resp.status_code == 200:
+            return "OK"
+    elif isinstance(body, dict):
+        if resp.status_code == 200 and body.get("ok"):
+            return "OK"
+        error = body.get("error") or {}
+        if error.get("code"):
+            return error["code"]
+
+    return "OK" if resp.status_code == 200 else f"HTTP_{resp.status_code}"
+
+
+def _summarize(latencies: List[float], count: int, errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "throughput_rps": count / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(ordered, 50),
+        "p90_ms": percentile(ordered, 90),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1] if ordered else 0.0,
+        "mean_ms": sum(ordered) / len(ordered) if ordered else 0.0,
+    }
+
+
+class LoadTestStats:
+    """Thread-safe collector of per-request samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: List[Tuple[float, str, str, float]] = []  # (t, target, outcome, ms)
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.target_rps = 0.0
+        self.scheduled = 0  # open loop: requests due to be sent
+        self.unsent = 0  # open loop: still queued when the run ended
+
+    def record(self, target: str, outcome: str, latency_ms: float) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), target, outcome, latency_ms))
+
+    def snapshot(self, window: Optional[float] = None) -> Dict[str, Any]:
+        """Aggregate stats; ``window`` limits throughput to the last N seconds"""
+        with self._lock:
+            samples = list(self._samples)
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at
+
+        latencies = [s[3] for s in samples]
+        outcomes: Dict[str, int] = {}
+        per_target: Dict[str, List[Tuple[str, float]]] = {}
+        for _, target, outcome, ms in samples:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            per_target.setdefault(target, []).append((outcome, ms))
+
+        errors = sum(n for code, n in outcomes.items() if code != "OK")
+        summary = _summarize(latencies, len(samples), errors, elapsed)
+        if self.target_rps > 0:
+            summary["target_rps"] = self.target_rps
+            summary["scheduled"] = self.scheduled
+            summary["unsent"] = self.unsent
+        if window:
+            recent = [s for s in samples if s[0] >= end - window]
+            summary["current_rps"] = len(recent) / min(window, elapsed) if elapsed > 0 else 0.0
+
+        histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for ms in latencies:
+            for i, upper in enumerate(HISTOGRAM_BUCKETS_MS):
+                if ms <= upper:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[-1] += 1
+        labels = [f"≤{b}ms" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+
+        return {
+            "elapsed_s": elapsed,
+            "summary": summary,
+            "outcomes": outcomes,
+            "histogram": dict(zip(labels, histogram)),
+            "per_target": {
+                target: _summarize(
+                    [ms for _, ms in rows],
+                    len(rows),
+                    sum(1 for outcome, _ in rows if outcome != "OK"),
+                    elapsed,
+                )
+                for target, rows in per_target.items()
+            },
+        }
+
+
+class LoadTestRun:
+    """A load test running on background threads."""
+
+    def __init__(
+        self,
+        client: GatewayClient,
+        base_url: str,
+        headers: Dict[str, str],
+        config: LoadTestConfig,
+    ):
+        self.client = client
+        self.base_url = base_url
+        self.headers = headers
+        self.config = config
+        self.stats = LoadTestStats()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    def start(self) -> "LoadTestRun":
+        self.stats = LoadTestStats()
+        self._thread = threading.Thread(target=self._run, name="loadtest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next_target(self) -> LoadTarget:
+        with self._counter_lock:
+            target = self.config.targets[self._counter % len(self.config.targets)]
+            self._counter += 1
+        return target
+
+    def _fire(self, target: LoadTarget, scheduled_at: Optional[float] = None) -> None:
+        # Open loop: time from when the request was due, so queueing counts as latency
+        started = scheduled_at if scheduled_at is not None else time.monotonic()
+        try:
+            if target.endpoint == ENDPOINT_MCP:
+                resp = self.client.mcp(
+                    self.base_url,
+                    {
+                        "jsonrpc": "2.0",
+                        "id": 1,
+                        "method": "tools/call",
+                        "params": {"name": target.tool, "arguments": target.arguments},
+                    },
+                    headers=self.headers,
+                    timeout=self.config.timeout,
+                    throttle=False,
+                )
+            else:
+                resp = self.client.call_tool(
+                    self.base_url,
+                    target.tool,
+                    target.arguments,
+                    headers=self.headers,
+                    timeout=self.config.timeout,
+                    throttle=False,
+                )
+            outcome = classify_response(target.endpoint, resp)
+        except requests.exceptions.Timeout:
+            outcome = "TIMEOUT"
+        except requests.exceptions.RequestException:
+            outcome = "CONNECTION_ERROR"
+        self.stats.record(target.label, outcome, (time.monotonic() - started) * 1000)
+
+    def _closed_loop_worker(self, deadline: float) -> None:
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            self._fire(self._next_target())
+
+    def _run(self) -> None:
+        config = self.config
+        deadline = time.monotonic() + config.duration
+        workers = max(1, config.concurrency)
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loadtest-worker")
+        futures = []
+        try:
+            if config.rps > 0:
+                # Open loop: schedule starts at fixed intervals; the pool
+                # size caps in-flight requests so a slow gateway shows up
+                # as queueing delay instead of unbounded threads.
+                self.stats.target_rps = config.rps
+                interval = 1.0 / config.rps
+                next_at = time.monotonic()
+                while not self._stop.is_set() and next_at < deadline:
+                    delay = next_at - time.monotonic()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                    futures.append(pool.submit(self._fire, self._next_target(), next_at))
+                    self.stats.scheduled += 1
+                    next_at += interval
+            else:
+                for _ in range(workers):
+                    pool.submit(self._closed_loop_worker, deadline)
+        finally:
+            # Requests still queued when the run ends are dropped, not sent late
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.stats.unsent = sum(f.cancelled() for f in futures)
+            self.stats.finished_at = time.monotonic()
+
+    def report(self) -> Dict[str, Any]:
+        """Full JSON-serializable report for export"""
+        return {
+            "config": {
+                "base_url": self.base_url,
+                "duration_s": self.config.duration,
+                "target_rps": self.config.rps,
+                "concurrency": self.config.concurrency,
+                "timeout_s": self.config.timeout,
+                "targets": [asdict(t) for t in self.config.targets],
+                "headers": {k: v for k, v in self.headers.items() if k.startswith("x-")},
+            },
+            "results": self.stats.snapshot(),
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
+    def report_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
@@ -0,0 +1,232 @@
+"""Native MCP JSON-RPC 2.0 transport over ``POST /mcp``.
+
+Supports ``tools/list`` and ``tools/call``, including JSON-RPC batches: many
+calls go out as one array in a single HTTP round trip and responses are
+matched back to requests by ``id``. If the gateway rejects the array itself
+(the current gateway worker treats an array body as one unknown request and
+answers 200 with a JSON-RPC error), the transport remembers that for the base
+URL and sends the calls as concurrent single requests instead. Only that
+reply, or a 400/404/405/501, counts as "no batch support"; a connection
+error, timeout, auth failure, 429, 5xx or unreadable body fails that batch's
+requests without changing what is remembered.
+
+Responses are read under the client's response size cap; a reply over the
+cap becomes a ``RESPONSE_TOO_LARGE`` error for the requests it answered.
+"""
+
+import contextvars
+import itertools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+
+import requests
+
+from gateway_client import GatewayClient, ResponseBody
+
+
+JSONRPC_VERSION = "2.0"
+DEFAULT_FALLBACK_CONCURRENCY = 8
+# Statuses that say the server does not take a JSON-RPC array (others say nothing about batching)
+BATCH_UNSUPPORTED_STATUSES = frozenset({400, 404, 405, 501})
+
+
+@dataclass
+class RpcResult:
+    """Response to one JSON-RPC request."""
+
+    id: Any
+    result: Any = None
+    error: Optional[Dict[str, Any]] = None
+    status_code: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def error_code(self) -> Optional[str]:
+        """Gateway error code (e.g. SCOPE_MISSING) or the JSON-RPC numeric code"""
+        if self.error is None:
+            return None
+        data = self.error.get("data") or {}
+        return data.get("code") or str(self.error.get("code"))
+
+    def tool_data(self) -> Any:
+        """Decode a tools/call result: the JSON inside its text content, when present"""
+        content = (self.result or {}).get("content") or []
+        texts = [c.get("text", "") for c in content if c.get("type") == "text"]
+        if len(texts) == 1:
+            try:
+                return json.loads(texts[0])
+            except json.JSONDecodeError:
+                return texts[0]
+        return self.result
+
+
+class McpTransport:
+    """JSON-RPC client for one gateway, shared across threads."""
+
+    _batch_support: Dict[str, bool] = {}
+    _support_lock = threading.Lock()
+
+    def __init__(
+        self,
+        client: GatewayClient,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        fallback_concurrency: int = DEFAULT_FALLBACK_CONCURRENCY,
+    ):
+        self.client = client
+        self.base_url = base_url.rstrip("/")
+        self.headers = headers
+        self.timeout = timeout
+        self.fallback_concurrency = fallback_concurrency
+        self._ids = itertools.count(1)
+        self._id_lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            return next(self._ids)
+
+    def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build a JSON-RPC request object with a fresh id"""
+        message = {"jsonrpc": JSONRPC_VERSION, "id": self._next_id(), "method": method}
+        if params is not None:
+            message["params"] = params
+        return message
+
+    @property
+    def batch_supported(self) -> Optional[bool]:
+        """True/False once probed for this gateway, None before the first batch"""
+        return self._batch_support.get(self.base_url)
+
+    def _post(self, payload: Any) -> Tuple[requests.Response, ResponseBody]:
+        resp = self.client.mcp(self.base_url, payload, headers=self.headers, timeout=self.timeout, stream=True)
+        return resp, self.client.read_body(resp)
+
+    def _too_large(self, message: Dict[str, Any], status_code: int) -> RpcResult:
+        return RpcResult(
+            message["id"],
+            error={
+                "code": -32000,
+                "message": f"Response larger than {self.client.max_response_bytes} bytes",
+                "data": {"code": "RESPONSE_TOO_LARGE"},
+            },
+            status_code=status_code,
+        )
+
+    @staticmethod
+    def _to_result(message: Dict[str, Any], status_code: Optional[int]) -> RpcResult:
+        return RpcResult(
+            id=message.get("id"),
+            result=message.get("result"),
+            error=message.get("error"),
+            status_code=status_code,
+        )
+
+    def send(self, message: Dict[str, Any]) -> RpcResult:
+        """Send one request"""
+        try:
+            resp, raw = self._post(message)
+        except requests.exceptions.RequestException as e:
+            return RpcResult(message["id"], error={"code": -32000, "message": str(e), "data": {"code": "CONNECTION_ERROR"}})
+        if raw.truncated:
+            return self._too_large(message, resp.status_code)
+        try:
+            body = raw.json()
+        except ValueError:
+            return RpcResult(
+                message["id"],
+                error={"code": -32700, "message": f"HTTP {resp.status_code}: {raw.text(200)}"},
+                status_code=resp.status_code,
+            )
+        if not isinstance(body, dict):
+            return RpcResult(message["id"], error={"code": -32603, "message": "Unexpected response"}, status_code=resp.status_code)
+        return self._to_result(body, resp.status_code)
+
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[RpcResult]:
+        """Send many requests, in one round trip when the server supports batches.
+
+        Results come back in the order of ``messages`` regardless of the order
+        the server answered in.
+        """
+        if not messages:
+            return []
+        if len(messages) == 1 or self.batch_supported is False:
+            return self._send_concurrently(messages)
+
+        try:
+            resp, raw = self._post(messages)
+        except requests.exceptions.RequestException as e:
+            # Transient: the calls may or may not have run, so they are not resent
+            return self._batch_failed(messages, {"code": -32000, "message": str(e), "data": {"code": "CONNECTION_ERROR"}})
+        if raw.truncated:
+            return [self._too_large(m, resp.status_code) for m in messages]
+        try:
+            body = raw.json()
+        except ValueError:
+            return self._batch_failed(
+                messages, {"code": -32700, "message": f"HTTP {resp.status_code}: {raw.text(200)}"}, resp.status_code
+            )
+        if not isinstance(body, list):
+            error = body.get("error") if isinstance(body, dict) else None
+            if resp.status_code in BATCH_UNSUPPORTED_STATUSES or (resp.status_code == 200 and isinstance(error, dict)):
+                # The server rejected the array itself: remember and fall back
+                with self._support_lock:
+                    self._batch_support[self.base_url] = False
+                return self._send_concurrently(messages)
+            return self._batch_failed(
+                messages,
+                error if isinstance(error, dict) else {"code": -32603, "message": f"HTTP {resp.status_code}"},
+                resp.status_code,
+            )
+
+        with self._support_lock:
+            self._batch_support[self.base_url] = True
+        by_id = {m.get("id"): m for m in body if isinstance(m, dict)}
+        results = []
+        for message in messages:
+            reply = by_id.get(message["id"])
+            if reply is None:
+                results.append(
+                    RpcResult(message["id"], error={"code": -32603, "message": "No response for request in batch"}, status_code=resp.status_code)
+                )
+            else:
+                results.append(self._to_result(reply, resp.status_code))
+        return results
+
+    @staticmethod
+    def _batch_failed(messages: List[Dict[str, Any]], error: Dict[str, Any], status_code: Optional[int] = None) -> List[RpcResult]:
+        return [RpcResult(m["id"], error=dict(error), status_code=status_code) for m in messages]
+
+    def _send_concurrently(self, messages: List[Dict[str, Any]]) -> List[RpcResult]:
+        if len(messages) == 1:
+            return [self.send(messages[0])]
+        workers = max(1, min(self.fallback_concurrency, len(messages)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcp-rpc") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self.send, m) for m in messages]
+            return [f.result() for f in futures]
+
+    # ------------------------------------------------------------------
+    # MCP methods
+    # ------------------------------------------------------------------
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        """tools/list; raises RuntimeError on a JSON-RPC error"""
+        result = self.send(self.request("tools/list"))
+        if not result.ok:
+            raise RuntimeError(result.error.get("message", "tools/list failed"))
+        return (result.result or {}).get("tools", [])
+
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> RpcResult:
+        return self.send(self.request("tools/call", {"name": name, "arguments": arguments}))
+
+    def call_tools(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[RpcResult]:
+        """tools/call for every ``(name, arguments)`` pair, batched"""
+        return self.send_batch(
+            [self.request("tools/call", {"name": name, "arguments": args}) for name, args in calls]
+        )
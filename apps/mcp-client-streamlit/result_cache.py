@@ -0,0 +1,150 @@
+"""Memoization of deterministic tool results.
+
+Tools opt in: a tool is cacheable when it has an explicit TTL rule (e.g. from
+``MCP_TOOL_CACHE_RULES="sum=3600,normalize-text=3600"``) or when its catalog
+entry marks it as such (``cacheable``/``cacheTtl``, or MCP
+``annotations.readOnlyHint`` + ``idempotentHint``). Entries are keyed by
+gateway, tool name, canonical JSON arguments, tenant and normalized scopes,
+evicted LRU beyond ``max_entries`` and expire after their TTL. Only
+successful results are stored, and only up to ``max_entry_bytes`` each, so
+a handful of large results cannot pin hundreds of megabytes.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from catalog_cache import normalize_scopes
+
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_ENTRY_BYTES = 64 * 1024
+
+MISS = object()  # returned by get() when there is no usable entry
+
+
+def parse_cache_rules(spec: str) -> Dict[str, float]:
+    """Parse ``"tool=ttl,tool=ttl"``; a TTL of 0 disables caching for that tool"""
+    rules: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        name, _, ttl = item.partition("=")
+        if not name.strip():
+            continue
+        try:
+            rules[name.strip()] = float(ttl) if ttl.strip() else DEFAULT_TTL
+        except ValueError:
+            continue
+    return rules
+
+
+def canonical_args(arguments: Any) -> str:
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+class ToolResultCache:
+    """Thread-safe LRU/TTL cache of tool results shared by all sessions."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        default_ttl: float = DEFAULT_TTL,
+        rules: Optional[Dict[str, float]] = None,
+        max_entry_bytes: int = DEFAULT_MAX_ENTRY_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.default_ttl = default_ttl
+        self.rules = dict(rules or {})
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def ttl_for(self, tool_name: str, tool_meta: Optional[Dict[str, Any]] = None) -> Optional[float]:
+        """TTL in seconds if ``tool_name`` is cacheable, else None"""
+        if tool_name in self.rules:
+            return self.rules[tool_name] or None
+        if tool_meta:
+            if tool_meta.get("cacheable"):
+                return float(tool_meta.get("cacheTtl") or self.default_ttl)
+            hints = tool_meta.get("annotations") or {}
+            if hints.get("readOnlyHint") and hints.get("idempotentHint"):
+                return self.default_ttl
+        return None
+
+    @staticmethod
+    def key(base_url: str, tool_name: str, arguments: Any, headers: Optional[Dict[str, str]]) -> Tuple:
+        headers = headers or {}
+        return (
+            base_url.rstrip("/"),
+            tool_name,
+            canonical_args(arguments),
+            headers.get("x-tenant-id", ""),
+            normalize_scopes(headers.get("x-scopes")),
+        )
+
+    def _count(self, tool_name: str, field: str) -> None:
+        counts = self.counters.setdefault(tool_name, {"hits": 0, "misses": 0, "stores": 0, "too_large": 0})
+        counts[field] += 1
+
+    def get(
+        self,
+        base_url: str,
+        tool_name: str,
+        arguments: Any,
+        headers: Optional[Dict[str, str]] = None,
+        tool_meta: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """Return the cached result, or ``MISS`` (also for uncacheable tools)"""
+        if self.ttl_for(tool_name, tool_meta) is None:
+            return MISS
+        key = self.key(base_url, tool_name, arguments, headers)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count(tool_name, "hits")
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            self._count(tool_name, "misses")
+        return MISS
+
+    def put(
+        self,
+        base_url: str,
+        tool_name: str,
+        arguments: Any,
+        headers: Optional[Dict[str, str]],
+        data: Any,
+        tool_meta: Optional[Dict[str, Any]] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        """Store ``data``; ``size`` is its body size in bytes when known (else measured)"""
+        ttl = self.ttl_for(tool_name, tool_meta)
+        if ttl is None:
+            return
+        if size is None:
+            size = len(canonical_args(data))
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self._count(tool_name, "too_large")
+            return
+        key = self.key(base_url, tool_name, arguments, headers)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, data)
+            self._entries.move_to_end(key)
+            self._count(tool_name, "stores")
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.counters.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
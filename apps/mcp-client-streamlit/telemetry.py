@@ -0,0 +1,217 @@
+"""Lightweight timing spans for gateway calls and LLM invocations.
+
+A trace is opened around one user action (an agent turn, a tool call, a tool
+list fetch) with ``Tracer.trace()``. Code underneath opens child spans with
+``span()``; when no trace is active ``span()`` is a cheap no-op, so batch runs
+and load tests are not instrumented. The active span lives in a ``ContextVar``,
+so work handed to a thread pool keeps its parent when submitted through
+``contextvars.copy_context().run``.
+
+Finished traces can be appended to a local file, either as one structured JSON
+record per span (``json``) or as OTLP/JSON ``resourceSpans`` documents
+(``otlp``) that OpenTelemetry tooling can ingest.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Iterator
+
+
+SERVICE_NAME = "mcp-client-streamlit"
+EXPORT_FORMATS = ("json", "otlp")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """One timed operation; ``children`` are nested spans."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    children: List["Span"] = field(default_factory=list)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def child(self, name: str, **attributes: Any) -> "Span":
+        child = Span(name, self.trace_id, secrets.token_hex(8), self.span_id, time.time_ns(), attributes=attributes)
+        self.children.append(child)
+        return child
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat structured-log record (no children)"""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being traced."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Time a block as a child of the active span (no-op without one)"""
+    parent = _current.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = parent.child(name, **attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current.reset(token)
+
+
+# ============================================================================
+# Export
+# ============================================================================
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value if isinstance(value, str) else json.dumps(value)}
+
+
+def to_otlp(root: Span) -> Dict[str, Any]:
+    """One trace as an OTLP/JSON ``ExportTraceServiceRequest``"""
+    spans = []
+    for s in root.walk():
+        record = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 3 if s.name.startswith("http ") else 1,  # CLIENT for HTTP calls, else INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            record["parentSpanId"] = s.parent_id
+        spans.append(record)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "telemetry"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class FileExporter:
+    """Appends finished traces to a local file, one JSON document per line."""
+
+    def __init__(self, path: str, fmt: str = "json"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown trace format {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+        self.path = path
+        self.fmt = fmt
+        self._lock = threading.Lock()
+
+    def export(self, root: Span) -> None:
+        if self.fmt == "otlp":
+            lines = [json.dumps(to_otlp(root))]
+        else:
+            lines = [json.dumps(s.to_dict()) for s in root.walk()]
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class Tracer:
+    """Opens root spans and hands finished traces to an optional exporter."""
+
+    def __init__(self, exporter: Optional[FileExporter] = None):
+        self.exporter = exporter
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """MCP_TRACE_FILE enables file export; MCP_TRACE_FORMAT is json (default) or otlp"""
+        path = os.getenv("MCP_TRACE_FILE", "")
+        if not path:
+            return cls()
+        return cls(FileExporter(path, os.getenv("MCP_TRACE_FORMAT", "json")))
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Span]:
+        root = Span(name, secrets.token_hex(16), secrets.token_hex(8), None, time.time_ns(), attributes=attributes)
+        token = _current.set(root)
+        try:
+            yield root
+        except Exception as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            root.end_ns = time.time_ns()
+            _current.reset(token)
+            if self.exporter is not None:
+                try:
+                    self.exporter.export(root)
+                except OSError:
+                    pass
+
+
+def phase_breakdown(root: Span) -> Dict[str, float]:
+    """Total milliseconds per phase across a trace, for the performance panel"""
+    totals = {"llm": 0.0, "gateway": 0.0, "connect": 0.0, "ttfb": 0.0, "body": 0.0, "json_decode": 0.0}
+    for s in root.walk():
+        if s.name.startswith("llm"):
+            totals["llm"] += s.duration_ms
+        elif s.name.startswith("http "):
+            totals["gateway"] += s.duration_ms
+            totals["connect"] += s.attributes.get("http.connect_ms", 0.0)
+            totals["ttfb"] += s.attributes.get("http.ttfb_ms", 0.0)
+            totals["body"] += s.attributes.get("http.body_ms", 0.0)
+            totals["json_decode"] += s.attributes.get("json.decode_ms", 0.0)
+    return totals
@@ -0,0 +1,38 @@
+import pytest
+
+from agent import ThinkStreamSplitter, split_thinking_and_reply
+
+
+def run(chunks):
+    splitter = ThinkStreamSplitter()
+    out = []
+    for chunk in chunks:
+        out.extend(splitter.feed(chunk))
+    out.extend(splitter.finish())
+    return splitter, out
+
+
+def test_routes_think_blocks_and_reply():
+    splitter, out = run(["<think>plan</think>Answer"])
+    assert out == [("thinking", "plan"), ("reply", "Answer")]
+    assert (splitter.thinking, splitter.reply) == ("plan", "Answer")
+
+
+@pytest.mark.parametrize("cut", range(1, len("<think>a</think>b")))
+def test_tags_split_across_chunks(cut):
+    text = "<think>a</think>b"
+    splitter, _ = run([text[:cut], text[cut:]])
+    assert (splitter.thinking, splitter.reply) == ("a", "b")
+
+
+def test_matches_the_batch_splitter():
+    text = "Hi <b>x</b> <THINK>one</Think> mid <think>two</think> end </think>"
+    splitter, _ = run(list(text))
+    expected = split_thinking_and_reply(text)
+    assert (splitter.thinking, splitter.reply) == (expected["thinking"], expected["reply"])
+
+
+def test_partial_tag_at_end_is_flushed_as_text():
+    splitter, out = run(["a < b", " <thi"])
+    assert splitter.reply == "a < b <thi"
+    assert out[-1] == ("reply", "<thi")
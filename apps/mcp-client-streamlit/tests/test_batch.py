@@ -0,0 +1,33 @@
+import pytest
+
+from batch import BatchInputError, parse_batch_input
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "zip": {"type": "string"},
+        "code": {"type": ["string", "null"]},
+        "order": {"enum": ["1", "2"]},
+        "count": {"type": "integer"},
+        "flag": {"type": "boolean"},
+    },
+}
+
+
+def test_csv_keeps_numeric_looking_strings_for_string_properties():
+    rows = parse_batch_input("zip,code,order,count,flag\n01234,null,1,5,true\n", "csv", SCHEMA)
+    assert rows == [{"zip": "01234", "code": "null", "order": "1", "count": 5, "flag": True}]
+
+
+def test_csv_decodes_untyped_columns_as_json():
+    rows = parse_batch_input('a,b,c\n1,"[1, 2]",text\n', "csv")
+    assert rows == [{"a": 1, "b": [1, 2], "c": "text"}]
+
+
+def test_csv_skips_empty_cells():
+    assert parse_batch_input("zip,count\n,3\n", "csv", SCHEMA) == [{"count": 3}]
+
+
+def test_jsonl_reports_the_bad_line():
+    with pytest.raises(BatchInputError, match="Line 2: expected a JSON object"):
+        parse_batch_input('{"a": 1}\n[1]\n')
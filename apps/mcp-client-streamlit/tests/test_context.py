@@ -0,0 +1,63 @@
+import json
+
+from agent import ToolCall
+from context import ConversationContext, estimate_tokens, fit_tool_result
+
+
+def test_history_is_compacted_into_summary_lines():
+    context = ConversationContext(budget_tokens=100, summary_tokens=1000)
+    for i in range(4):
+        context.finish_turn(f"question {i} " + "x" * 60, f"<think>hmm</think>answer {i} " + "y" * 60)
+    assert [t.user.split()[1] for t in context.turns] == ["3"]
+    assert len(context.summary_lines) == 3
+    assert context.summary_lines[0].startswith("- User asked: question 0")
+    assert "hmm" not in context.turns[0].assistant
+
+
+def test_summary_is_capped_at_its_budget():
+    context = ConversationContext(budget_tokens=40, summary_tokens=30)
+    for i in range(10):
+        context.finish_turn(f"q{i} " + "x" * 40, "a" * 40)
+    assert len(context.summary_lines) == 1
+    assert "q8" in context.summary_lines[0]
+
+
+def test_build_messages_keeps_system_user_and_latest_scratch():
+    context = ConversationContext(budget_tokens=120, tool_result_tokens=1000)
+    context.start_turn()
+    call = ToolCall("sum", {"a": 1})
+    context.add_model_output("first")
+    context.add_tool_results([call], ["r" * 1000])
+    context.add_model_output("second")
+    context.add_tool_results([ToolCall("sum", {"a": 2})], ["ok"])
+    messages = context.build_messages("system", "question")
+    assert messages[0] == ("system", "system", {})
+    assert messages[1] == ("user", "question", {})
+    assert "[elided earlier tool result]" in [m[1] for m in messages]
+    assert messages[-2:] == [("assistant", "second", {}), ("user", 'Tool result (sum {"a": 2}): ok', {})]
+
+
+def test_repeated_calls_are_collapsed():
+    context = ConversationContext()
+    context.start_turn()
+    call = ToolCall("sum", {"b": 1, "a": 2})
+    context.add_tool_results([call, ToolCall("sum", {"a": 2, "b": 1})], ["3", "3"])
+    assert context.scratch[1][1].endswith("same as result #1 above")
+
+
+def test_json_results_are_summarized_to_budget():
+    result = json.dumps({"rows": [{"id": i, "name": "n" * 50} for i in range(200)]})
+    fitted = fit_tool_result(result, 100)
+    assert estimate_tokens(fitted) <= 100
+    assert fitted.startswith(f"[summarized from {len(result)} chars]")
+
+
+
+def test_abort_turn_keeps_history():
+    context = ConversationContext()
+    context.finish_turn("q", "a")
+    context.start_turn()
+    context.add_model_output("partial")
+    context.abort_turn()
+    assert context.scratch == []
+    assert [(t.user, t.assistant) for t in context.turns] == [("q", "a")]
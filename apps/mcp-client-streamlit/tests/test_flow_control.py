@@ -0,0 +1,194 @@
+from email.utils import formatdate
+from types import SimpleNamespace
+import time
+
+import pytest
+
+import flow_control
+from flow_control import Admission, FlowControl, RateRule, Throttled, parse_rate_limits, parse_retry_after
+
+
+class FakeClock:
+    """Stands in for flow_control's ``time`` module; ``sleep`` just advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(
+        flow_control, "time", SimpleNamespace(monotonic=fake.monotonic, sleep=fake.sleep, time=time.time)
+    )
+    return fake
+
+
+def bucket(flow, key):
+    return next(b for b in flow.snapshot()["buckets"] if b["bucket"] == key)
+
+
+def gateway(flow, host="gw"):
+    return next(g for g in flow.snapshot()["gateways"] if g["gateway"] == host)
+
+
+# ----------------------------------------------------------------------
+# Parsing
+# ----------------------------------------------------------------------
+
+
+def test_parse_rate_limits():
+    rules = parse_rate_limits("*=50:100, tenant:*=10,tool:sum=0.5,bad,tool:x=abc,tool:y=0")
+    assert rules == {
+        "*": RateRule(50.0, 100.0),
+        "tenant:*": RateRule(10.0, 10.0),
+        "tool:sum": RateRule(0.5, 1.0),  # burst never below one request
+    }
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after("3600") == flow_control.MAX_RETRY_AFTER
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+
+# ----------------------------------------------------------------------
+# Token buckets
+# ----------------------------------------------------------------------
+
+
+def test_bucket_allows_burst_then_waits_for_refill(clock):
+    flow = FlowControl(parse_rate_limits("tool:sum=2:2"), adaptive=False)
+    flow.admit("gw", tools=["sum"])
+    flow.admit("gw", tools=["sum"])
+    assert clock.slept == 0
+    flow.admit("gw", tools=["sum"])
+    assert clock.slept == pytest.approx(0.5)
+
+
+def test_other_tools_are_not_limited_by_a_tool_rule(clock):
+    flow = FlowControl(parse_rate_limits("tool:sum=1:1"), adaptive=False)
+    flow.admit("gw", tools=["sum"])
+    flow.admit("gw", tools=["echo"])
+    flow.admit("gw")
+    assert clock.slept == 0
+
+
+def test_throttled_when_wait_exceeds_timeout(clock):
+    flow = FlowControl(parse_rate_limits("tenant:*=1:1"), adaptive=False)
+    flow.admit("gw", tenant="acme", timeout=1)
+    flow.admit("gw", tenant="other", timeout=1)  # tenant:* gives each tenant its own bucket
+    with pytest.raises(Throttled):
+        flow.admit("gw", tenant="acme", timeout=0.5)
+    assert bucket(flow, "tenant:acme")["throttled"] == 1
+    assert bucket(flow, "tenant:other")["throttled"] == 0
+
+
+def test_tokens_are_taken_all_or_nothing(clock):
+    flow = FlowControl(parse_rate_limits("*=100:100,tool:sum=1:1"), adaptive=False)
+    flow.admit("gw", tools=["sum"])
+    with pytest.raises(Throttled):
+        flow.admit("gw", tools=["sum"], timeout=0)
+    # The refused request took nothing from the global bucket
+    assert bucket(flow, "*")["tokens"] == 99
+
+
+def test_batch_larger_than_burst_is_delayed_not_refused(clock):
+    flow = FlowControl(parse_rate_limits("tool:sum=2:2"), adaptive=False)
+    flow.admit("gw", tools=["sum"] * 5, timeout=1)
+    assert clock.slept == 0
+    assert bucket(flow, "tool:sum")["tokens"] == -3  # in debt
+    flow.admit("gw", tools=["sum"])
+    assert clock.slept == pytest.approx(2.0)
+
+
+# ----------------------------------------------------------------------
+# Adaptive concurrency (AIMD)
+# ----------------------------------------------------------------------
+
+
+def test_concurrency_limit_caps_in_flight_requests(clock):
+    flow = FlowControl(initial_limit=1)
+    first = flow.admit("gw", timeout=0)
+    with pytest.raises(Throttled, match="concurrency limit"):
+        flow.admit("gw", timeout=0)
+    assert gateway(flow)["throttled"] == 1
+    flow.release(first, 200, 10)
+    flow.release(flow.admit("gw", timeout=0), 200, 10)
+    assert gateway(flow)["in_flight"] == 0
+
+
+def test_healthy_responses_grow_the_limit_additively(clock):
+    flow = FlowControl(initial_limit=4, max_limit=5)
+    flow.release(flow.admit("gw"), 200, 50)
+    assert gateway(flow)["limit"] == 4.2  # 4 + 1/4, rounded for display
+    for _ in range(20):
+        flow.release(flow.admit("gw"), 200, 50)
+    assert gateway(flow)["limit"] == 5
+
+
+def test_overload_halves_the_limit_once_per_round_trip(clock):
+    flow = FlowControl(initial_limit=16, min_limit=2)
+    flow.release(flow.admit("gw"), 200, 100)  # ewma 100 ms
+    flow.release(flow.admit("gw"), 503, 100)
+    assert gateway(flow)["limit"] == 8.0
+    flow.release(flow.admit("gw"), 500, 100)  # same round trip: no second cut
+    assert gateway(flow)["limit"] == 8.0
+    clock.advance(0.2)
+    flow.release(flow.admit("gw"), None)  # no response at all
+    assert gateway(flow)["limit"] == 4.0
+    for _ in range(5):
+        clock.advance(1)
+        flow.release(flow.admit("gw"), 429, 100)
+    assert gateway(flow)["limit"] == 2  # floor
+    assert gateway(flow)["backoffs"] == 7
+
+
+def test_latency_spike_counts_as_overload(clock):
+    flow = FlowControl(initial_limit=10)
+    flow.release(flow.admit("gw"), 200, 100)
+    flow.release(flow.admit("gw"), 200, 500)  # slower, but under the 1 s floor
+    assert gateway(flow)["backoffs"] == 0
+    clock.advance(1)
+    flow.release(flow.admit("gw"), 200, 5000)
+    assert gateway(flow)["backoffs"] == 1
+
+
+def test_retry_after_pauses_the_gateway(clock):
+    flow = FlowControl()
+    flow.release(flow.admit("gw"), 429, 10, retry_after="2")
+    assert gateway(flow)["paused_s"] == 2.0
+    with pytest.raises(Throttled, match="retry after"):
+        flow.admit("gw", timeout=0)
+    clock.advance(2)
+    flow.release(flow.admit("gw", timeout=0), 200, 10)
+
+
+def test_non_adaptive_flow_ignores_release(clock):
+    flow = FlowControl(adaptive=False)
+    flow.release(Admission("gw", 0.0), 503, 10)
+    assert flow.snapshot()["gateways"] == []
+
+
+def test_tokens_are_refunded_when_concurrency_throttles(clock):
+    flow = FlowControl(parse_rate_limits("tool:sum=1:2"), initial_limit=1)
+    first = flow.admit("gw", tools=["sum"])
+    with pytest.raises(Throttled, match="concurrency limit"):
+        flow.admit("gw", tools=["sum"], timeout=0)
+    assert bucket(flow, "tool:sum")["tokens"] == 1  # only the admitted request paid
+    flow.release(first, 200, 10)
+    flow.admit("gw", tools=["sum"], timeout=0)
@@ -0,0 +1,54 @@
+import os
+
+import requests
+
+from gateway_client import read_body
+
+
+class FakeResponse(requests.Response):
+    """A response whose body arrives in fixed-size chunks."""
+
+    def __init__(self, size: int, chunk: int = 1024):
+        super().__init__()
+        self.status_code = 200
+        self._size = size
+        self._chunk = chunk
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        sent = 0
+        while sent < self._size:
+            n = min(self._chunk, self._size - sent)
+            sent += n
+            yield b"x" * n
+
+    def close(self):
+        pass
+
+
+def test_small_body_is_kept_in_memory():
+    body = read_body(FakeResponse(100), max_bytes=1000, spill=True)
+    assert body.content == b"x" * 100 and body.path is None and body.complete
+
+
+def test_oversized_body_stops_at_the_cap_without_spill():
+    body = read_body(FakeResponse(10_000), max_bytes=2000)
+    assert body.truncated and not body.complete and body.path is None
+    assert body.size < 10_000
+
+
+def test_oversized_body_spills_in_full():
+    body = read_body(FakeResponse(10_000), max_bytes=2000, spill=True, max_spill_bytes=50_000)
+    try:
+        assert body.complete and body.size == 10_000
+        assert os.path.getsize(body.path) == 10_000
+    finally:
+        os.remove(body.path)
+
+
+def test_spill_stops_and_drops_the_file_past_the_ceiling(monkeypatch, tmp_path):
+    monkeypatch.setattr("gateway_client.SPILL_DIR", str(tmp_path))
+    body = read_body(FakeResponse(100_000), max_bytes=2000, spill=True, max_spill_bytes=20_000)
+    assert body.truncated and not body.complete and body.path is None
+    assert 20_000 < body.size < 100_000
+    assert body.preview == b"x" * len(body.preview) and body.preview
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,48 @@
+import pytest
+
+from bench.mock_gateway import MockGateway, MockGatewayConfig
+from catalog_cache import ToolCatalogCache
+from flow_control import FlowControl, Throttled, parse_rate_limits
+from gateway_client import GatewayClient
+from gateway_pool import GatewayPool
+
+HEADERS = {"x-scopes": "math:execute", "x-tenant-id": "acme"}
+
+
+@pytest.fixture
+def gateways():
+    first = MockGateway().start()
+    second = MockGateway(config=MockGatewayConfig(extra_tools=3)).start()
+    yield first, second
+    first.stop()
+    second.stop()
+
+
+def test_client_throttling_does_not_mark_gateways_unhealthy(gateways):
+    flow = FlowControl(parse_rate_limits("tenant:*=1:1"), adaptive=False)
+    pool = GatewayPool(GatewayClient(flow=flow), [g.base_url for g in gateways])
+    try:
+        assert pool.call_tool("", "sum", {"a": 1, "b": 2}, headers=HEADERS, timeout=0.1).status_code == 200
+        with pytest.raises(Throttled):
+            pool.call_tool("", "sum", {"a": 1, "b": 2}, headers=HEADERS, timeout=0.1)
+        assert all(e.healthy is not False for e in pool.endpoints.values())
+        assert all(e.last_error is None for e in pool.endpoints.values())
+    finally:
+        pool.stop()
+
+
+def test_merged_catalog_is_reused_while_endpoint_catalogs_are_unchanged(gateways):
+    client = GatewayClient()
+    pool = GatewayPool(client, [g.base_url for g in gateways])
+    cache = ToolCatalogCache(client)
+    try:
+        first, _ = pool.catalog(cache, HEADERS)
+        assert len(first.tools) == len(gateways[1].tools)
+        assert pool.catalog(cache, HEADERS)[0].tools is first.tools
+        # A revalidation that finds the same tools keeps the same list
+        assert pool.catalog(cache, HEADERS, force=True)[0].tools is first.tools
+        # Another tenant's catalogs merge separately
+        other, _ = pool.catalog(cache, {**HEADERS, "x-tenant-id": "other"})
+        assert other.tools is not first.tools and other.tools == first.tools
+    finally:
+        pool.stop()
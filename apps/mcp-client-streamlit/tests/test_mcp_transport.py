@@ -0,0 +1,80 @@
+import json
+
+import pytest
+import requests
+
+from bench.mock_gateway import MockGateway, MockGatewayConfig
+from gateway_client import GatewayClient
+from mcp_transport import McpTransport
+
+HEADERS = {"x-scopes": "math:execute"}
+
+
+class ScriptedClient(GatewayClient):
+    """Answers a batch with a fixed status and body, and single requests with a result."""
+
+    def __init__(self, batch_status, batch_body):
+        super().__init__()
+        self.batch_status = batch_status
+        self.batch_body = batch_body
+        self.singles = 0
+
+    def mcp(self, base_url, payload, headers=None, **kwargs):
+        if isinstance(payload, list):
+            status, body = self.batch_status, self.batch_body
+        else:
+            self.singles += 1
+            status, body = 200, {"jsonrpc": "2.0", "id": payload["id"], "result": {"ok": True}}
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = json.dumps(body).encode()
+        resp._content_consumed = True
+        return resp
+
+
+def calls(transport, n=3):
+    return [transport.request("tools/call", {"name": "sum", "arguments": {"a": i, "b": 1}}) for i in range(n)]
+
+
+@pytest.mark.parametrize(
+    "status, body",
+    [
+        (401, {"error": "missing token"}),
+        (403, {"jsonrpc": "2.0", "id": None, "error": {"code": -32602, "message": "forbidden"}}),
+        (429, {"error": {"code": -32000, "message": "slow down"}}),
+        (503, {}),
+        (200, {"jsonrpc": "2.0", "id": 1, "result": {}}),
+    ],
+)
+def test_failures_that_say_nothing_about_batching_are_not_remembered(status, body):
+    client = ScriptedClient(status, body)
+    transport = McpTransport(client, f"http://status-{status}-{len(body)}.test")
+    results = transport.send_batch(calls(transport))
+    assert all(r.error and r.status_code == status for r in results)
+    assert transport.batch_supported is None
+    assert client.singles == 0  # not resent one by one
+
+
+@pytest.mark.parametrize("status", [400, 404, 405, 501])
+def test_rejecting_statuses_turn_batching_off(status):
+    client = ScriptedClient(status, {"error": "arrays not supported"})
+    transport = McpTransport(client, f"http://reject-{status}.test")
+    results = transport.send_batch(calls(transport))
+    assert transport.batch_supported is False
+    assert client.singles == 3 and all(r.error is None for r in results)
+
+
+def test_worker_style_rejection_falls_back_to_single_requests():
+    with MockGateway(config=MockGatewayConfig(rpc_batch=False)) as gateway:
+        transport = McpTransport(GatewayClient(), gateway.base_url, headers=HEADERS)
+        results = transport.send_batch(calls(transport))
+        assert transport.batch_supported is False
+        assert [r.tool_data()["result"] for r in results] == [1, 2, 3]
+
+
+def test_batch_capable_gateway_is_remembered():
+    with MockGateway() as gateway:
+        transport = McpTransport(GatewayClient(), gateway.base_url, headers=HEADERS)
+        results = transport.send_batch(calls(transport))
+        assert transport.batch_supported is True
+        assert [r.tool_data()["result"] for r in results] == [1, 2, 3]
@@ -0,0 +1,101 @@
+from validation import CatalogValidators, ValidatorCache, compile_schema, format_issues, schema_defaults
+
+
+SUM_SCHEMA = {
+    "type": "object",
+    "properties": {"a": {"type": "number"}, "b": {"type": "number"}},
+    "required": ["a", "b"],
+    "additionalProperties": False,
+}
+
+
+def issues(schema, value):
+    return [(i.path, i.message) for i in compile_schema(schema)(value)]
+
+
+def test_valid_arguments_have_no_issues():
+    assert issues(SUM_SCHEMA, {"a": 1, "b": 2.5}) == []
+
+
+def test_type_required_and_additional_properties():
+    assert issues(SUM_SCHEMA, {"a": "1", "c": 3}) == [
+        ("$.b", "is required"),
+        ("$.a", "expected number, got string"),
+        ("$.c", "is not an allowed property"),
+    ]
+
+
+def test_integer_accepts_whole_floats_but_not_booleans():
+    assert issues({"type": "integer"}, 2.0) == []
+    assert issues({"type": "integer"}, 2.5) == [("$", "expected integer, got number")]
+    assert issues({"type": "integer"}, True) == [("$", "expected integer, got boolean")]
+
+
+def test_numeric_and_string_bounds():
+    assert issues({"type": "number", "minimum": 1, "exclusiveMaximum": 10}, 10) == [("$", "must be < 10")]
+    assert issues({"type": "number", "multipleOf": 0.5}, 1.25) == [("$", "must be a multiple of 0.5")]
+    assert issues({"type": "string", "minLength": 2, "pattern": "^[a-z]+$"}, "A") == [
+        ("$", "must be at least 2 characters"),
+        ("$", "does not match pattern '^[a-z]+$'"),
+    ]
+
+
+def test_enum_and_const():
+    assert issues({"enum": ["asc", "desc"]}, "up") == [("$", "must be one of 'asc', 'desc'")]
+    assert issues({"const": 3}, 3) == []
+
+
+def test_nested_paths_and_array_items():
+    schema = {
+        "type": "object",
+        "properties": {"rows": {"type": "array", "items": {"type": "object", "required": ["id"]}, "maxItems": 2}},
+    }
+    assert issues(schema, {"rows": [{"id": 1}, {}, {"id": 3}]}) == [
+        ("$.rows", "must have at most 2 items"),
+        ("$.rows[1].id", "is required"),
+    ]
+
+
+def test_any_of_and_one_of():
+    assert issues({"anyOf": [{"type": "string"}, {"type": "number"}]}, None) == [
+        ("$", "does not match any of the allowed schemas")
+    ]
+    assert issues({"oneOf": [{"type": "number"}, {"type": "integer"}]}, 3) == [
+        ("$", "must match exactly one schema (matched 2)")
+    ]
+
+
+def test_uncompilable_pattern_is_left_to_the_gateway():
+    assert issues({"type": "string", "pattern": "(?<=a+)b"}, "zzz") == []
+
+
+def test_catalog_validators_check():
+    validators = CatalogValidators([{"name": "sum", "inputSchema": SUM_SCHEMA}, {"name": "free"}])
+    assert validators.check("sum", {"a": 1, "b": 2}) is None
+    assert validators.check("sum", {"a": 1}) == "invalid arguments: $.b: is required"
+    assert validators.check("free", {"anything": True}) is None
+    assert validators.check("nope", {}) == "invalid arguments: $: unknown tool 'nope'"
+    assert validators.check("sum", [1, 2]) == "invalid arguments: $: expected object, got array"
+    assert format_issues(validators.validate("sum", {})).count("is required") == 2
+
+
+def test_validator_cache_reuses_by_identity_and_by_hash():
+    cache = ValidatorCache(max_catalogs=2)
+    tools = [{"name": "sum", "inputSchema": SUM_SCHEMA}]
+    first = cache.for_catalog(tools)
+    assert cache.for_catalog(tools) is first
+    assert cache.for_catalog([dict(tools[0])]) is first  # equal catalog, new list
+    assert len(cache) == 1
+
+
+def test_schema_defaults():
+    schema = {
+        "type": "object",
+        "properties": {
+            "a": {"type": "number", "minimum": 5},
+            "order": {"enum": ["asc", "desc"]},
+            "name": {"type": ["null", "string"]},
+            "limit": {"type": "integer", "default": 10},
+        },
+    }
+    assert schema_defaults(schema) == {"a": 5, "order": "asc", "name": "", "limit": 10}
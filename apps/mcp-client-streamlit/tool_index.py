@@ -0,0 +1,128 @@
+"""Scope filtering and relevance ranking of tools for the agent prompt.
+
+The gateway lists every tool, but calls one only when the caller's
+``x-scopes`` include all of its ``requiredScopes``. A ``ToolIndex`` is built
+once per catalog: it remembers each tool's required scopes and holds a small
+BM25 index over the tool's name, description and input schema (property
+names, their descriptions and enum values). For each agent message,
+``select`` drops the tools the current scopes do not allow and returns the
+``k`` most relevant of the rest, so the prompt stays the same size however
+many tools the gateway registry holds.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterable, Tuple, FrozenSet
+
+
+DEFAULT_TOP_K = 8
+
+# BM25 parameters and how many times a name token counts against description text
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME_WEIGHT = 3
+
+_WORD = re.compile(r"[A-Za-z0-9]+")
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it me my of on or please the this to "
+    "what with you your".split()
+)
+
+
+def _stem(token: str) -> str:
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word stems, with camelCase and kebab-case split apart"""
+    words = _WORD.findall(_CAMEL.sub(" ", text))
+    return [_stem(w) for w in (w.lower() for w in words) if w not in _STOPWORDS]
+
+
+def _schema_text(schema: Any) -> List[str]:
+    """Property names, descriptions and enum values of a JSON Schema"""
+    if not isinstance(schema, dict):
+        return []
+    parts = [str(v) for v in schema.get("enum", []) if isinstance(v, (str, int, float))]
+    if isinstance(schema.get("description"), str):
+        parts.append(schema["description"])
+    for name, sub in (schema.get("properties") or {}).items():
+        parts.append(name)
+        parts.extend(_schema_text(sub))
+    if isinstance(schema.get("items"), dict):
+        parts.extend(_schema_text(schema["items"]))
+    return parts
+
+
+def missing_scopes(tool: Dict[str, Any], scopes: Iterable[str]) -> List[str]:
+    """Required scopes of ``tool`` that ``scopes`` lacks (the gateway's exact-match rule)"""
+    granted = set(scopes)
+    return [s for s in tool.get("requiredScopes") or [] if s not in granted]
+
+
+class ToolIndex:
+    """BM25 index and scope requirements of one tool catalog."""
+
+    def __init__(self, tools: List[Dict[str, Any]]):
+        self.tools = sorted(tools, key=lambda t: t.get("name", ""))
+        self.by_name = {t.get("name"): t for t in self.tools}
+        self._required: List[FrozenSet[str]] = [frozenset(t.get("requiredScopes") or []) for t in self.tools]
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        for idx, tool in enumerate(self.tools):
+            terms = tokenize(tool.get("name", "")) * NAME_WEIGHT
+            terms += tokenize(tool.get("description", ""))
+            terms += tokenize(" ".join(_schema_text(tool.get("inputSchema") or tool.get("parameters"))))
+            self._lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self._postings.setdefault(term, []).append((idx, count))
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        n = len(self.tools)
+        self._idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def allowed(self, scopes: Iterable[str]) -> List[int]:
+        """Positions of the tools ``scopes`` allow calling"""
+        granted = frozenset(scopes)
+        return [idx for idx, required in enumerate(self._required) if required <= granted]
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score per tool position, for tools matching at least one query term"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for idx, count in self._postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[idx] / (self._avg_length or 1))
+                scores[idx] = scores.get(idx, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        return scores
+
+    def select(self, query: str, scopes: Iterable[str], k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """The ``k`` allowed tools most relevant to ``query`` (every allowed tool when ``k`` <= 0)"""
+        allowed = self.allowed(scopes)
+        if k <= 0 or len(allowed) <= k:
+            return [self.tools[idx] for idx in allowed]
+        scores = self.scores(query)
+        # Ties (including tools matching nothing) keep catalog name order
+        ranked = sorted(allowed, key=lambda idx: -scores.get(idx, 0.0))
+        return [self.tools[idx] for idx in ranked[:k]]
+
+    def scope_error(self, tool_name: str, scopes: Iterable[str]) -> Optional[str]:
+        """Error for a call the gateway would reject with SCOPE_MISSING, else None"""
+        tool = self.by_name.get(tool_name)
+        missing = missing_scopes(tool, scopes) if tool is not None else []
+        return f"missing required scopes: {', '.join(missing)}" if missing else None
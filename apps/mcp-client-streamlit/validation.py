@@ -0,0 +1,402 @@
+"""Client-side validation of tool arguments against catalog input schemas.
+
+Each tool's ``inputSchema`` is compiled once into a tree of small check
+functions. A compiled validator walks the arguments and reports every problem
+with a JSON path (``$.items[2].name``), so a bad call is rejected before it
+costs a gateway round trip. Validators live in a ``CatalogValidators`` built
+once per catalog and shared by every session through ``ValidatorCache``.
+
+Only the JSON Schema subset that tool registries use is understood: ``type``,
+``enum``, ``const``, numeric and string bounds, ``pattern``, ``properties``,
+``required``, ``additionalProperties``, ``items`` and ``anyOf``/``oneOf``/
+``allOf``. Other keywords (``$ref``, ``format``, ...) are ignored, so the
+gateway stays the final authority; the client never rejects what it does not
+understand.
+
+The same schemas also generate the starting arguments shown in the editors
+(``schema_defaults``).
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Callable
+
+from agent import catalog_hash
+
+
+DEFAULT_MAX_CATALOGS = 16
+
+Check = Callable[[Any, str, List["ValidationIssue"]], None]
+
+
+@dataclass
+class ValidationIssue:
+    """One problem with the arguments, at a JSON path."""
+
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}"
+
+
+def format_issues(issues: List[ValidationIssue]) -> str:
+    """One-line summary of validation issues, for the model or an error message"""
+    return "invalid arguments: " + "; ".join(str(issue) for issue in issues)
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer()),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+
+def _json_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    return "object"
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _child_path(path: str, key: str) -> str:
+    return f"{path}.{key}" if key.isidentifier() else f"{path}[{key!r}]"
+
+
+def _accept(value: Any, path: str, issues: List[ValidationIssue]) -> None:
+    pass
+
+
+def _reject(value: Any, path: str, issues: List[ValidationIssue]) -> None:
+    issues.append(ValidationIssue(path, "no value is allowed here"))
+
+
+def _compile(schema: Any) -> Check:
+    if schema is False:
+        return _reject
+    if not isinstance(schema, dict):
+        return _accept
+
+    checks: List[Check] = []
+
+    types = schema.get("type")
+    if types:
+        names = [types] if isinstance(types, str) else list(types)
+        known = [_TYPE_CHECKS[t] for t in names if t in _TYPE_CHECKS]
+        if known:
+            def check_type(value, path, issues, known=known, names=names):
+                if not any(test(value) for test in known):
+                    issues.append(ValidationIssue(path, f"expected {' or '.join(names)}, got {_json_type(value)}"))
+
+            checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(value, path, issues):
+            if value not in allowed:
+                issues.append(ValidationIssue(path, f"must be one of {', '.join(repr(a) for a in allowed)}"))
+
+        checks.append(check_enum)
+
+    if "const" in schema:
+        const = schema["const"]
+
+        def check_const(value, path, issues):
+            if value != const:
+                issues.append(ValidationIssue(path, f"must be {const!r}"))
+
+        checks.append(check_const)
+
+    checks.extend(_numeric_checks(schema))
+    checks.extend(_string_checks(schema))
+    checks.extend(_object_checks(schema))
+    checks.extend(_array_checks(schema))
+    checks.extend(_combinator_checks(schema))
+
+    if not checks:
+        return _accept
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value, path, issues):
+        for check in checks:
+            check(value, path, issues)
+
+    return check_all
+
+
+def _numeric_checks(schema: Dict[str, Any]) -> List[Check]:
+    checks: List[Check] = []
+    bounds = []
+    for keyword, exclusive_keyword, op, word in (
+        ("minimum", "exclusiveMinimum", lambda v, b: v >= b, ">="),
+        ("maximum", "exclusiveMaximum", lambda v, b: v <= b, "<="),
+    ):
+        if _is_number(schema.get(keyword)):
+            if schema.get(exclusive_keyword) is True:  # draft-04 boolean form
+                bounds.append((schema[keyword], lambda v, b, op=op: op(v, b) and v != b, word.rstrip("=")))
+            else:
+                bounds.append((schema[keyword], op, word))
+        if _is_number(schema.get(exclusive_keyword)):
+            bounds.append((schema[exclusive_keyword], lambda v, b, op=op: op(v, b) and v != b, word.rstrip("=")))
+    if bounds:
+        def check_bounds(value, path, issues):
+            if _is_number(value):
+                for bound, ok, word in bounds:
+                    if not ok(value, bound):
+                        issues.append(ValidationIssue(path, f"must be {word} {bound}"))
+
+        checks.append(check_bounds)
+
+    step = schema.get("multipleOf")
+    if _is_number(step) and step > 0:
+        def check_multiple(value, path, issues):
+            if _is_number(value) and abs(value / step - round(value / step)) > 1e-9:
+                issues.append(ValidationIssue(path, f"must be a multiple of {step}"))
+
+        checks.append(check_multiple)
+    return checks
+
+
+def _string_checks(schema: Dict[str, Any]) -> List[Check]:
+    checks: List[Check] = []
+    min_length, max_length = schema.get("minLength"), schema.get("maxLength")
+    if isinstance(min_length, int) or isinstance(max_length, int):
+        def check_length(value, path, issues):
+            if not isinstance(value, str):
+                return
+            if isinstance(min_length, int) and len(value) < min_length:
+                issues.append(ValidationIssue(path, f"must be at least {min_length} characters"))
+            if isinstance(max_length, int) and len(value) > max_length:
+                issues.append(ValidationIssue(path, f"must be at most {max_length} characters"))
+
+        checks.append(check_length)
+
+    if isinstance(schema.get("pattern"), str):
+        try:
+            pattern = re.compile(schema["pattern"])
+        except re.error:
+            pattern = None  # a pattern Python cannot compile is left to the gateway
+        if pattern is not None:
+            def check_pattern(value, path, issues):
+                if isinstance(value, str) and not pattern.search(value):
+                    issues.append(ValidationIssue(path, f"does not match pattern {pattern.pattern!r}"))
+
+            checks.append(check_pattern)
+    return checks
+
+
+def _object_checks(schema: Dict[str, Any]) -> List[Check]:
+    properties = schema.get("properties") if isinstance(schema.get("properties"), dict) else {}
+    required = [r for r in schema.get("required", []) if isinstance(r, str)]
+    additional = schema.get("additionalProperties", True)
+    if not properties and not required and additional is True:
+        return []
+
+    compiled = {name: _compile(sub) for name, sub in properties.items()}
+    extra = None if additional is True else _compile(additional)
+
+    def check_object(value, path, issues):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                issues.append(ValidationIssue(_child_path(path, name), "is required"))
+        for name, item in value.items():
+            check = compiled.get(name)
+            if check is not None:
+                check(item, _child_path(path, name), issues)
+            elif additional is False:
+                issues.append(ValidationIssue(_child_path(path, name), "is not an allowed property"))
+            elif extra is not None:
+                extra(item, _child_path(path, name), issues)
+
+    return [check_object]
+
+
+def _array_checks(schema: Dict[str, Any]) -> List[Check]:
+    items = schema.get("items")
+    min_items, max_items = schema.get("minItems"), schema.get("maxItems")
+    unique = schema.get("uniqueItems") is True
+    if items is None and not isinstance(min_items, int) and not isinstance(max_items, int) and not unique:
+        return []
+
+    if isinstance(items, list):  # tuple form: one schema per position
+        positional = [_compile(sub) for sub in items]
+        each = None
+    else:
+        positional = []
+        each = _compile(items) if items is not None else None
+
+    def check_array(value, path, issues):
+        if not isinstance(value, list):
+            return
+        if isinstance(min_items, int) and len(value) < min_items:
+            issues.append(ValidationIssue(path, f"must have at least {min_items} items"))
+        if isinstance(max_items, int) and len(value) > max_items:
+            issues.append(ValidationIssue(path, f"must have at most {max_items} items"))
+        if unique and len({repr(v) for v in value}) != len(value):
+            issues.append(ValidationIssue(path, "items must be unique"))
+        for idx, item in enumerate(value):
+            check = positional[idx] if idx < len(positional) else each
+            if check is not None:
+                check(item, f"{path}[{idx}]", issues)
+
+    return [check_array]
+
+
+def _combinator_checks(schema: Dict[str, Any]) -> List[Check]:
+    checks: List[Check] = []
+    for sub in schema.get("allOf", []) if isinstance(schema.get("allOf"), list) else []:
+        checks.append(_compile(sub))
+
+    for keyword in ("anyOf", "oneOf"):
+        options = schema.get(keyword)
+        if not isinstance(options, list) or not options:
+            continue
+        compiled = [_compile(sub) for sub in options]
+
+        def check_options(value, path, issues, compiled=compiled, keyword=keyword):
+            matches = 0
+            for check in compiled:
+                found: List[ValidationIssue] = []
+                check(value, path, found)
+                matches += not found
+            if keyword == "anyOf" and not matches:
+                issues.append(ValidationIssue(path, "does not match any of the allowed schemas"))
+            elif keyword == "oneOf" and matches != 1:
+                issues.append(ValidationIssue(path, f"must match exactly one schema (matched {matches})"))
+
+        checks.append(check_options)
+    return checks
+
+
+def compile_schema(schema: Any) -> Callable[[Any], List[ValidationIssue]]:
+    """Compile ``schema`` once; the result returns the issues for a value"""
+    check = _compile(schema)
+
+    def validate(value: Any) -> List[ValidationIssue]:
+        issues: List[ValidationIssue] = []
+        check(value, "$", issues)
+        return issues
+
+    return validate
+
+
+def schema_defaults(schema: Any) -> Any:
+    """Starting arguments for a schema: declared defaults, else a placeholder per property"""
+    if not isinstance(schema, dict):
+        return {}
+    if "default" in schema:
+        return schema["default"]
+    if "const" in schema:
+        return schema["const"]
+    if isinstance(schema.get("enum"), list) and schema["enum"]:
+        return schema["enum"][0]
+    types = schema.get("type")
+    kind = types if isinstance(types, str) else next((t for t in types or [] if t != "null"), None)
+    if kind == "object" or (kind is None and isinstance(schema.get("properties"), dict)):
+        return {name: schema_defaults(sub) for name, sub in (schema.get("properties") or {}).items()}
+    if kind in ("integer", "number"):
+        minimum = schema.get("minimum")
+        return minimum if _is_number(minimum) and minimum > 0 else 0
+    if kind == "string":
+        return ""
+    if kind == "boolean":
+        return False
+    if kind == "array":
+        return []
+    return None
+
+
+class CatalogValidators:
+    """Validators for one tool catalog, compiled lazily once per tool."""
+
+    def __init__(self, tools: List[Dict[str, Any]]):
+        self.tools = {tool["name"]: tool for tool in tools if tool.get("name")}
+        self._compiled: Dict[str, Callable[[Any], List[ValidationIssue]]] = {}
+
+    def __contains__(self, tool_name: str) -> bool:
+        return isinstance(tool_name, str) and tool_name in self.tools
+
+    def schema(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        schema = (self.tools.get(tool_name) or {}).get("inputSchema")
+        return schema if isinstance(schema, dict) else None
+
+    def validate(self, tool_name: str, arguments: Any) -> List[ValidationIssue]:
+        """Issues with ``arguments`` for ``tool_name`` (empty when valid or no schema is known)"""
+        if tool_name not in self:
+            return [ValidationIssue("$", f"unknown tool {tool_name!r}")]
+        if not isinstance(arguments, dict):
+            return [ValidationIssue("$", f"expected object, got {_json_type(arguments)}")]
+        validator = self._compiled.get(tool_name)
+        if validator is None:
+            validator = self._compiled.setdefault(tool_name, compile_schema(self.schema(tool_name)))
+        return validator(arguments)
+
+    def check(self, tool_name: str, arguments: Any) -> Optional[str]:
+        """``validate`` as one error message, or None when the arguments are valid"""
+        issues = self.validate(tool_name, arguments)
+        return format_issues(issues) if issues else None
+
+    def defaults(self, tool_name: str) -> Dict[str, Any]:
+        """Schema-generated starting arguments for ``tool_name``"""
+        defaults = schema_defaults(self.schema(tool_name))
+        return defaults if isinstance(defaults, dict) else {}
+
+
+class ValidatorCache:
+    """Process-wide ``CatalogValidators`` per catalog, shared by all sessions.
+
+    A catalog list seen before (the catalog cache hands every session the
+    same list object) is found by identity; otherwise by catalog hash, so an
+    equal catalog fetched again reuses its compiled validators.
+    """
+
+    def __init__(self, max_catalogs: int = DEFAULT_MAX_CATALOGS):
+        self.max_catalogs = max_catalogs
+        self._by_hash: "OrderedDict[str, CatalogValidators]" = OrderedDict()
+        self._by_identity: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def for_catalog(self, tools: List[Dict[str, Any]]) -> CatalogValidators:
+        with self._lock:
+            seen = self._by_identity.get(id(tools))
+            if seen is not None and seen[0] is tools:
+                return seen[1]
+        key = catalog_hash(tools)
+        with self._lock:
+            validators = self._by_hash.get(key)
+            if validators is None:
+                validators = self._by_hash[key] = CatalogValidators(tools)
+            self._by_hash.move_to_end(key)
+            # Keep a reference to the list so its id cannot be reused while cached
+            self._by_identity[id(tools)] = (tools, validators)
+            while len(self._by_hash) > self.max_catalogs:
+                self._by_hash.popitem(last=False)
+            while len(self._by_identity) > self.max_catalogs:
+                self._by_identity.popitem(last=False)
+        return validators
+
+    def __len__(self) -> int:
+        return len(self._by_hash)